@@ -3,14 +3,17 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.urls import path
-from v1_app.consumers import AnalysisConsumer 
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 django_asgi_app = get_asgi_application()
 
+# Consumers import the models, so they are loaded once the app registry is ready
+from v1_app.consumers import AnalysisConsumer, PujasConsumer  # noqa: E402
+
 websocket_urlpatterns = [
     path('ws/analysis/', AnalysisConsumer.as_asgi()),
+    path('ws/pujas/', PujasConsumer.as_asgi()),
 ]
 
 application = ProtocolTypeRouter({
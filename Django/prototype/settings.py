@@ -9,7 +9,11 @@ env = environ.Env()
 environ.Env.read_env(env_file='credentials.env')
 
 SECRET_KEY = env('SECRET_KEY')
+PRIVATE_KEY = env('PRIVATE_KEY', default=None)  # Server signing key, read once at start-up
+FIRMANTE_PROCESOS = env.int('FIRMANTE_PROCESOS', default=0)  # Signing pool size; 0 signs in the calling thread
+FOTOS_HILOS = env.int('FOTOS_HILOS', default=2)  # Threads building photo thumbnails and medium renditions
 DEBUG = env.bool('DEBUG', default=True)
+# PostgreSQL with PostGIS is required: the models use geography columns and full-text search (tsvector, GIN)
 DATABASES = {
     'default': env.db(),
 }
@@ -42,15 +46,40 @@ INSTALLED_APPS = [
     "channels",
 ]
 
+REDIS_HOST = ('127.0.0.1', 6379)  # Ajusta esta línea si Redis se ejecuta en un host o puerto diferente
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],  # Ajusta esta línea si Redis se ejecuta en un host o puerto diferente
+            "hosts": [REDIS_HOST],
         },
     },
 }
 
+# Ranking cache: 'locmem' keeps an LRU per worker process, 'redis' shares it between workers
+RANKING_CACHE_BACKEND = env('RANKING_CACHE_BACKEND', default='locmem')
+RANKING_CACHE_TOP_N = 1000  # Best results kept per tenant
+
+# Spatial search backend: 'db' uses the PostGIS index, 'memoria' an in-process NumPy grid (PostGIS still hosts the data)
+SPATIAL_INDEX_BACKEND = env('SPATIAL_INDEX_BACKEND', default='db')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ranking': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ranking',
+        'TIMEOUT': 600,  # Seconds a ranking stays cached even without invalidation
+        'OPTIONS': {'MAX_ENTRIES': 5000},  # About 12 KB per tenant at RANKING_CACHE_TOP_N = 1000
+    } if RANKING_CACHE_BACKEND == 'locmem' else {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST[0]}:{REDIS_HOST[1]}/1',
+        'TIMEOUT': 600,
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',  
@@ -67,6 +96,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    # First, so the latency and query counts cover the whole middleware stack
+    "v1_app.metricas.MiddlewareMetricas",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -79,6 +110,10 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Clients allowed to scrape /metrics/, and whether a view over its query budget fails the request (enable in tests)
+METRICAS_IPS_PERMITIDAS = env.list('METRICAS_IPS_PERMITIDAS', default=['127.0.0.1', '::1'])
+METRICAS_PRESUPUESTO_ESTRICTO = env.bool('METRICAS_PRESUPUESTO_ESTRICTO', default=False)
+
 ROOT_URLCONF = "prototype.urls"
 
 TEMPLATES = [
@@ -158,4 +193,26 @@ SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 
-AVALANCHE_RPC_URL = 'https://api.avax-test.network/ext/bc/C/rpc'
+AVALANCHE_RPC_URL = env('AVALANCHE_RPC_URL', default='https://api.avax-test.network/ext/bc/C/rpc')
+WEB3_TIMEOUT = env.float('WEB3_TIMEOUT', default=10)  # Seconds per RPC call
+WEB3_REINTENTOS = 3  # Retries of read-only RPC calls on connection errors
+WEB3_BACKOFF = 0.25  # Base delay of the exponential backoff, in seconds
+WEB3_POOL_CONEXIONES = 10  # Keep-alive connections kept open to the RPC node
+WEB3_POOL_CONEXIONES_ASYNC = 100  # Connection pool of the async client used by the async views
+BLOCKCHAIN_CHAIN_ID = env.int('BLOCKCHAIN_CHAIN_ID', default=43113)  # 43113 is Fuji; the local Hardhat node uses 43112
+PUJAS_LOTE_MAXIMO = 100  # Bids per registrarPujas transaction
+PUJAS_VENTANA_SEGUNDOS = 2  # Longest time a bid waits for its batch to fill
+PUJAS_LOTES_POR_PASADA = 4  # Batches a worker pass submits back to back under a backlog
+PUJAS_MAX_INTENTOS = 5  # Submissions of a bid that may fail transiently (timeouts, nonce races) before it is marked failed
+PUJAS_CONTRACT_ADDRESS = env('PUJAS_CONTRACT_ADDRESS', default='0x2039049ee43995AfcD86A8442610Cb70d8F860de')
+PUJAS_CONTRACT_BLOQUE_INICIAL = env.int('PUJAS_CONTRACT_BLOQUE_INICIAL', default=0)  # Deployment block; the event sync starts here
+
+# Exchange rates: source class, seconds a rate is cached, and whether a background thread keeps it warm
+TASA_CAMBIO_FUENTE = env('TASA_CAMBIO_FUENTE', default='v1_app.tasas.FuenteCoinGecko')
+TASA_CAMBIO_TTL = 60
+TASA_CAMBIO_REFRESCO = env.bool('TASA_CAMBIO_REFRESCO', default=True)
+# Rates returned by v1_app.tasas.FuenteFija (local stub)
+TASAS_CAMBIO_FIJAS = {
+    'USD': {'AVAX': 25.0, 'USDT': 1.0},
+    'COP': {'AVAX': 100000.0, 'USDT': 4000.0},
+}
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from v1_app.views import register, login
+from v1_app.views import register, login, calcular_score, buscar_inmuebles_rankeados, buscar_inmuebles_cercanos, importar_inmuebles, guardar_criterios_arrendatario, nueva_subasta
 from django.conf import settings
+from v1_app.metricas import vista_metricas
+from v1_app import vistas_async
 from rest_framework.authtoken.views import obtain_auth_token 
 
 router = DefaultRouter()
@@ -10,8 +12,19 @@ router = DefaultRouter()
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/', include(router.urls)), 
+    path('metrics/', vista_metricas, name='metricas'),
     path('api-token-auth/', obtain_auth_token, name='api_token_auth'),
     path('register/', register, name='register'),
     path('login/', login, name='login'),
+    path('inmuebles/score/', calcular_score, name='calcular_score'),
+    path('criterios/', guardar_criterios_arrendatario, name='guardar_criterios'),
+    path('inmuebles/rankeados/', buscar_inmuebles_rankeados, name='buscar_inmuebles_rankeados'),
+    path('inmuebles/cercanos/', buscar_inmuebles_cercanos, name='buscar_inmuebles_cercanos'),
+    path('inmuebles/importar/', importar_inmuebles, name='importar_inmuebles'),
+    path('subastas/nueva/', nueva_subasta, name='nueva_subasta'),
+    # Async endpoints, served on the event loop under ASGI
+    path('async/pujas/', vistas_async.crear_puja, name='crear_puja_async'),
+    path('async/arrendar-ahora/', vistas_async.arrendar_ahora, name='arrendar_ahora_async'),
+    path('async/pagos/', vistas_async.procesar_pago, name='procesar_pago_async'),
 ]
 
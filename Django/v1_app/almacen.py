@@ -0,0 +1,216 @@
+import threading
+import time
+from datetime import timedelta
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from .models import InmuebleCaracteristicas
+from .caracteristicas import NUM_CARACTERISTICAS, vector_caracteristicas, empaquetar, desempaquetar
+
+# Rows written slightly before the last refresh may commit after it; re-read this window to catch them
+MARGEN_REFRESCO = timedelta(seconds=5)
+
+# Seconds between two checks of the feature table by the in-process copies, so a request triggers at most one
+INTERVALO_VERIFICACION_S = 1.0
+
+# Seconds between two full reloads of an in-process copy. A row can commit long after its timestamp (a slow
+# transaction); inserts and deletions like that change the live row count and are caught on the next check,
+# but an edit is only picked up by the next full reload.
+RECARGA_COMPLETA_S = 300
+
+
+def actualizar_caracteristicas(inmuebles):
+    """
+    Computes and upserts the feature rows of the given properties in a single statement.
+    """
+    if not inmuebles:
+        return
+    ahora = timezone.now()
+    filas = [
+        InmuebleCaracteristicas(
+            inmueble_id=inmueble.pk,
+            vector=empaquetar(vector_caracteristicas(inmueble)),
+            longitud=inmueble.ubicacion.x if inmueble.ubicacion else None,
+            latitud=inmueble.ubicacion.y if inmueble.ubicacion else None,
+            eliminado=False,
+            actualizado=ahora,
+        )
+        for inmueble in inmuebles
+    ]
+    InmuebleCaracteristicas.objects.bulk_create(
+        filas,
+        update_conflicts=True,
+        unique_fields=['inmueble_id'],
+        update_fields=['vector', 'longitud', 'latitud', 'eliminado', 'actualizado'],
+    )
+    # Update this process's copy once the write is committed
+    ids = np.array([fila.inmueble_id for fila in filas], dtype=np.int64)
+    vectores = desempaquetar(b''.join(fila.vector for fila in filas))
+    transaction.on_commit(lambda: almacen.aplicar(ids, vectores))
+
+
+def recalcular_caracteristicas(inmuebles, tamano_lote=2000):
+    """
+    Recomputes the feature rows of a whole queryset in batches, for writes that bypass the model signals
+    (queryset.update, bulk_create).
+    """
+    lote = []
+    for inmueble in inmuebles.order_by('pk').iterator(chunk_size=tamano_lote):
+        lote.append(inmueble)
+        if len(lote) == tamano_lote:
+            actualizar_caracteristicas(lote)
+            lote = []
+    actualizar_caracteristicas(lote)
+
+
+def huella_caracteristicas():
+    """
+    Cheap fingerprint of the feature table, (live rows, latest change), checked by the in-process copies.
+    """
+    return tuple(
+        InmuebleCaracteristicas.objects.aggregate(Count('pk', filter=Q(eliminado=False)), Max('actualizado')).values()
+    )
+
+
+def eliminar_caracteristicas(inmueble_ids):
+    """
+    Marks the feature rows of deleted properties so every process drops them on its next refresh.
+    """
+    InmuebleCaracteristicas.objects.filter(inmueble_id__in=inmueble_ids).update(
+        eliminado=True, actualizado=timezone.now()
+    )
+    ids = np.array(inmueble_ids, dtype=np.int64)
+    transaction.on_commit(lambda: almacen.quitar(ids))
+
+
+class AlmacenCaracteristicas:
+    """
+    In-process copy of the feature table as a contiguous float32 matrix, with rows sorted by property id.
+    The first read loads the whole table. Afterwards `refrescar`, called once per request by the ranking,
+    checks the table's fingerprint at most once per `intervalo_verificacion` and only fetches the rows changed
+    since the last refresh.
+    """
+
+    def __init__(self, intervalo_verificacion=INTERVALO_VERIFICACION_S):
+        self.intervalo_verificacion = intervalo_verificacion
+        self._lock = threading.Lock()
+        self._lock_refresco = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matriz = np.empty((0, NUM_CARACTERISTICAS), dtype=np.float32)
+        self._marca = None
+        self._cargado = None
+        self._verificado = None
+
+    def _localizar(self, ids):
+        # Row position of each id in the sorted id array, and whether the id is actually present
+        posiciones = np.searchsorted(self._ids, ids)
+        if len(self._ids) == 0:
+            return posiciones, np.zeros(len(ids), dtype=bool)
+        encontrados = (posiciones < len(self._ids)) & (self._ids[np.minimum(posiciones, len(self._ids) - 1)] == ids)
+        return posiciones, encontrados
+
+    def refrescar(self):
+        """
+        Pulls new, edited and deleted rows from the feature table, at most once per intervalo_verificacion.
+        The whole table is reloaded instead when its live row count no longer matches this copy (a row
+        committed after a later refresh) or the last full load is older than RECARGA_COMPLETA_S.
+        """
+        if self._verificado is not None and time.monotonic() - self._verificado < self.intervalo_verificacion:
+            return
+        with self._lock_refresco:
+            ahora = time.monotonic()
+            if self._verificado is not None and ahora - self._verificado < self.intervalo_verificacion:
+                return  # Another thread refreshed while this one waited
+            marca = timezone.now()
+            if self._cargado is None or ahora - self._cargado >= RECARGA_COMPLETA_S:
+                self._recargar()
+                self._cargado = ahora
+            else:
+                vivas, ultimo = huella_caracteristicas()
+                if vivas != len(self._ids):
+                    self._recargar()
+                    self._cargado = ahora
+                elif ultimo is not None and ultimo >= self._marca - MARGEN_REFRESCO:
+                    self._aplicar_cambios(self._marca - MARGEN_REFRESCO)
+            self._marca = marca
+            self._verificado = ahora
+
+    def _cargar_si_vacio(self):
+        # A read before any refresh still sees the table
+        if self._verificado is None:
+            self.refrescar()
+
+    def _recargar(self):
+        filas = list(InmuebleCaracteristicas.objects.filter(eliminado=False).values_list('inmueble_id', 'vector'))
+        ids = np.fromiter((fila[0] for fila in filas), dtype=np.int64, count=len(filas))
+        vectores = desempaquetar(b''.join(bytes(fila[1]) for fila in filas))
+        orden = np.argsort(ids, kind='stable')
+        with self._lock:
+            self._ids, self._matriz = ids[orden], np.ascontiguousarray(vectores[orden])
+
+    def _aplicar_cambios(self, desde):
+        filas = list(
+            InmuebleCaracteristicas.objects.filter(actualizado__gte=desde).values_list('inmueble_id', 'vector', 'eliminado')
+        )
+        vivas = [fila for fila in filas if not fila[2]]
+        if vivas:
+            self.aplicar(
+                np.fromiter((fila[0] for fila in vivas), dtype=np.int64, count=len(vivas)),
+                desempaquetar(b''.join(bytes(fila[1]) for fila in vivas)),
+            )
+        eliminadas = [fila[0] for fila in filas if fila[2]]
+        if eliminadas:
+            self.quitar(np.array(eliminadas, dtype=np.int64))
+
+    def aplicar(self, ids, vectores):
+        """
+        Inserts or overwrites the rows of the given property ids.
+        """
+        with self._lock:
+            posiciones, existentes = self._localizar(ids)
+            matriz = self._matriz.copy()
+            matriz[posiciones[existentes]] = vectores[existentes]
+
+            nuevos = ~existentes
+            if nuevos.any():
+                todos_ids = np.concatenate([self._ids, ids[nuevos]])
+                matriz = np.concatenate([matriz, vectores[nuevos]])
+                orden = np.argsort(todos_ids, kind='stable')
+                self._ids, self._matriz = todos_ids[orden], np.ascontiguousarray(matriz[orden])
+            else:
+                self._matriz = matriz
+
+    def quitar(self, ids):
+        """
+        Drops the rows of the given property ids.
+        """
+        with self._lock:
+            conservar = ~np.isin(self._ids, ids)
+            self._ids, self._matriz = self._ids[conservar], self._matriz[conservar]
+
+    def todos(self):
+        """
+        Returns the ids (ascending) and feature matrix of the whole catalog.
+        Writers replace the arrays instead of mutating them, so the returned ones are a consistent snapshot.
+        Reads do not check the table; callers refresh once per request with `refrescar`.
+        """
+        self._cargar_si_vacio()
+        with self._lock:
+            return self._ids, self._matriz
+
+    def obtener(self, ids):
+        """
+        Returns the feature rows for the given property ids; unknown ids get an all-zero row.
+        """
+        self._cargar_si_vacio()
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            resultado = np.zeros((len(ids), NUM_CARACTERISTICAS), dtype=np.float32)
+            posiciones, encontrados = self._localizar(ids)
+            resultado[encontrados] = self._matriz[posiciones[encontrados]]
+            return resultado
+
+
+# Shared store for this worker process
+almacen = AlmacenCaracteristicas()
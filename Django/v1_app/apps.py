@@ -8,3 +8,7 @@ class V1AppConfig(AppConfig):
     
     # Set the name of the application as 'v1_app'
     name = "v1_app"
+
+    # Register the model signals once the app registry is ready
+    def ready(self):
+        from . import signals  # noqa: F401
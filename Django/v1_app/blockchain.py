@@ -0,0 +1,612 @@
+import asyncio
+import logging
+import threading
+import weakref
+from datetime import timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from web3 import Web3
+from web3.exceptions import ContractLogicError, TransactionNotFound, Web3ValidationError
+from .models import Puja, PujaCadena, SincronizacionCadena
+from .cliente_web3 import obtener_w3, obtener_w3_async, por_bucle
+from .firmante import obtener_firmante
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# ABI of the deployed contract
+contract_abi = [
+    {
+      "inputs": [],
+      "name": "numeroDePujas",
+      "outputs": [
+        {
+          "internalType": "uint256",
+          "name": "",
+          "type": "uint256"
+        }
+      ],
+      "stateMutability": "view",
+      "type": "function"
+    },
+    {
+      "inputs": [
+        {
+          "internalType": "uint256",
+          "name": "index",
+          "type": "uint256"
+        }
+      ],
+      "name": "obtenerPuja",
+      "outputs": [
+        {
+          "internalType": "address",
+          "name": "",
+          "type": "address"
+        },
+        {
+          "internalType": "uint256",
+          "name": "",
+          "type": "uint256"
+        },
+        {
+          "internalType": "string",
+          "name": "",
+          "type": "string"
+        }
+      ],
+      "stateMutability": "view",
+      "type": "function"
+    },
+    {
+      "inputs": [
+        {
+          "internalType": "uint256",
+          "name": "",
+          "type": "uint256"
+        }
+      ],
+      "name": "pujas",
+      "outputs": [
+        {
+          "internalType": "address",
+          "name": "arrendatario",
+          "type": "address"
+        },
+        {
+          "internalType": "uint256",
+          "name": "monto",
+          "type": "uint256"
+        },
+        {
+          "internalType": "string",
+          "name": "moneda",
+          "type": "string"
+        }
+      ],
+      "stateMutability": "view",
+      "type": "function"
+    },
+    {
+      "inputs": [
+        {
+          "internalType": "address",
+          "name": "_arrendatario",
+          "type": "address"
+        },
+        {
+          "internalType": "uint256",
+          "name": "_monto",
+          "type": "uint256"
+        },
+        {
+          "internalType": "string",
+          "name": "_moneda",
+          "type": "string"
+        }
+      ],
+      "name": "registrarPuja",
+      "outputs": [],
+      "stateMutability": "nonpayable",
+      "type": "function"
+    },
+    {
+      "inputs": [
+        {
+          "internalType": "address[]",
+          "name": "_arrendatarios",
+          "type": "address[]"
+        },
+        {
+          "internalType": "uint256[]",
+          "name": "_montos",
+          "type": "uint256[]"
+        },
+        {
+          "internalType": "string[]",
+          "name": "_monedas",
+          "type": "string[]"
+        }
+      ],
+      "name": "registrarPujas",
+      "outputs": [],
+      "stateMutability": "nonpayable",
+      "type": "function"
+    },
+    {
+      "anonymous": False,
+      "inputs": [
+        {
+          "indexed": True,
+          "internalType": "uint256",
+          "name": "indice",
+          "type": "uint256"
+        },
+        {
+          "indexed": True,
+          "internalType": "address",
+          "name": "arrendatario",
+          "type": "address"
+        },
+        {
+          "indexed": False,
+          "internalType": "uint256",
+          "name": "monto",
+          "type": "uint256"
+        },
+        {
+          "indexed": False,
+          "internalType": "string",
+          "name": "moneda",
+          "type": "string"
+        }
+      ],
+      "name": "PujaRegistrada",
+      "type": "event"
+    }
+]
+contract_address = settings.PUJAS_CONTRACT_ADDRESS
+
+
+@lru_cache(maxsize=1)
+def obtener_contrato():
+    # Contract bound to the shared client; built on first use, not at import time
+    return obtener_w3().eth.contract(address=contract_address, abi=contract_abi)
+
+# Transaction parameters
+CHAIN_ID = settings.BLOCKCHAIN_CHAIN_ID
+GAS = 2000000
+GAS_PRICE_GWEI = '50'
+
+# Gas of a batched registration: fixed overhead plus the storage writes of each bid
+GAS_LOTE_BASE = 60000
+GAS_POR_PUJA = 120000
+
+# Event sync: blocks scanned per eth_getLogs call, and blocks left behind the head to avoid reorgs
+BLOQUES_POR_CONSULTA = 2000
+CONFIRMACIONES = 3
+
+# Bids are registered together once the batch is full or its oldest bid has waited this long
+LOTE_MAXIMO = getattr(settings, 'PUJAS_LOTE_MAXIMO', 100)
+VENTANA_LOTE = timedelta(seconds=getattr(settings, 'PUJAS_VENTANA_SEGUNDOS', 2))
+
+# Under a backlog, a worker pass submits up to this many batches back to back through the transaction pipeline
+LOTES_POR_PASADA = getattr(settings, 'PUJAS_LOTES_POR_PASADA', 4)
+
+# Bids claimed by a worker that never got a transaction hash are released after this time
+TIEMPO_RECLAMO = timedelta(minutes=10)
+
+# Submitted batches still unmined after this time are checked for having been dropped or replaced
+TIEMPO_CONFIRMACION = timedelta(minutes=15)
+
+# A bid whose submission failed transiently is retried after this delay, up to PUJAS_MAX_INTENTOS times
+MAX_INTENTOS = getattr(settings, 'PUJAS_MAX_INTENTOS', 5)
+ESPERA_REINTENTO = timedelta(seconds=30)
+
+
+def reclamar_pujas_pendientes(limite):
+    """
+    Atomically claims up to `limite` pending bids for this worker; rows locked by another worker are skipped.
+    """
+    liberar_reclamos_vencidos()
+    with transaction.atomic():
+        ids = list(
+            Puja.objects
+            .select_for_update(skip_locked=True)
+            .filter(pendientes_listas())
+            .order_by('id')
+            .values_list('id', flat=True)[:limite]
+        )
+        Puja.objects.filter(id__in=ids).update(estado='enviando', actualizado=timezone.now())
+    return list(Puja.objects.filter(id__in=ids).order_by('id'))
+
+
+def pendientes_listas():
+    """
+    Pending bids that may be submitted now: new ones, and retried ones whose backoff has elapsed.
+    """
+    return Q(estado='pendiente') & (Q(intentos=0) | Q(actualizado__lte=timezone.now() - ESPERA_REINTENTO))
+
+
+def liberar_reclamos_vencidos():
+    """
+    Returns to the queue the bids whose worker died before sending their transaction.
+    """
+    Puja.objects.filter(
+        estado='enviando',
+        tx_hash__isnull=True,
+        actualizado__lt=timezone.now() - TIEMPO_RECLAMO,
+    ).update(estado='pendiente', actualizado=timezone.now())
+
+
+# Node errors meaning the nonce we used is out of sync with the chain (the last one is py-evm's, used by eth-tester)
+ERRORES_NONCE = (
+    'nonce too low', 'nonce too high', 'already known', 'replacement transaction underpriced', 'invalid nonce',
+    'invalid transaction nonce',
+)
+
+
+class GestorTransacciones:
+    """
+    Hands out nonces per sender from an in-process counter instead of asking the node for every transaction,
+    so concurrent submissions never reuse a nonce. Transactions can be queued and submitted back to back
+    without waiting for each receipt; receipts are checked later with `estado_recibos`.
+    """
+
+    def __init__(self, web3=None):
+        self._w3 = web3
+        self._lock = threading.Lock()
+        self._nonces = {}
+        self._cola = []
+
+    @property
+    def w3(self):
+        # Defaults to the shared client, resolved lazily
+        return self._w3 or obtener_w3()
+
+    def resincronizar(self, direccion):
+        """
+        Forgets the local nonce of a sender; the next transaction reads it again from the node.
+        """
+        with self._lock:
+            self._nonces.pop(direccion, None)
+
+    def _siguiente_nonce(self, direccion):
+        # Must be called with the lock held
+        if direccion not in self._nonces:
+            self._nonces[direccion] = self.w3.eth.get_transaction_count(direccion, 'pending')
+        nonce = self._nonces[direccion]
+        self._nonces[direccion] = nonce + 1
+        return nonce
+
+    def enviar(self, firmante, tx):
+        """
+        Assigns the next nonce of the signer, signs and sends the transaction. Returns its hash as a 0x string.
+        On a nonce error the local counter is resynced from the node and the transaction is retried once.
+        """
+        for intento in range(2):
+            # Nonce assignment and submission stay ordered per sender
+            with self._lock:
+                nonce = self._siguiente_nonce(firmante.address)
+                firmada = firmante.firmar({**tx, 'nonce': nonce, 'from': firmante.address})
+                try:
+                    return self.w3.eth.send_raw_transaction(firmada.raw_transaction).to_0x_hex()
+                except Exception as e:
+                    # The nonce was not consumed on chain, so the local counter is no longer trustworthy
+                    self._nonces.pop(firmante.address, None)
+                    if intento == 0 and any(error in str(e).lower() for error in ERRORES_NONCE):
+                        logger.warning("Nonce %s of %s out of sync, resyncing: %s", nonce, firmante.address, e)
+                        continue
+                    raise
+
+    def encolar(self, firmante, tx, referencia=None):
+        """
+        Queues a transaction for the next `enviar_cola` call.
+        """
+        with self._lock:
+            self._cola.append((firmante, tx, referencia))
+
+    def enviar_cola(self):
+        """
+        Submits every queued transaction back to back, without waiting for receipts.
+        Consecutive transactions of the same signer get their nonces in order and are signed as one batch.
+        Returns (referencia, tx_hash, error) for each one; tx_hash is None when it failed.
+        """
+        with self._lock:
+            cola, self._cola = self._cola, []
+        resultados = []
+        inicio = 0
+        while inicio < len(cola):
+            firmante = cola[inicio][0]
+            fin = inicio
+            while fin < len(cola) and cola[fin][0] is firmante:
+                fin += 1
+            grupo, reintentar = cola[inicio:fin], []
+
+            with self._lock:
+                txs = [
+                    {**tx, 'nonce': self._siguiente_nonce(firmante.address), 'from': firmante.address}
+                    for _, tx, _ in grupo
+                ]
+                firmadas = firmante.firmar_lote(txs)
+                for posicion, ((_, _, referencia), firmada) in enumerate(zip(grupo, firmadas)):
+                    try:
+                        resultados.append((referencia, self.w3.eth.send_raw_transaction(firmada.raw_transaction).to_0x_hex(), None))
+                    except Exception:
+                        # Later nonces of the batch are now out of order; resync and send the rest one by one
+                        self._nonces.pop(firmante.address, None)
+                        reintentar = grupo[posicion:]
+                        break
+
+            for _, tx, referencia in reintentar:
+                try:
+                    resultados.append((referencia, self.enviar(firmante, tx), None))
+                except Exception as e:
+                    resultados.append((referencia, None, e))
+            inicio = fin
+        return resultados
+
+    def estado_recibos(self, tx_hashes):
+        """
+        Returns {tx_hash: True/False} for the mined transactions (True when successful); unmined ones are left out.
+        """
+        estados = {}
+        for tx_hash in tx_hashes:
+            try:
+                recibo = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+            estados[tx_hash] = recibo['status'] == 1
+        return estados
+
+    def transacciones_desconocidas(self, tx_hashes):
+        """
+        Returns the hashes the node knows nothing about, neither mined nor in its mempool (dropped or replaced).
+        """
+        desconocidas = []
+        for tx_hash in tx_hashes:
+            try:
+                self.w3.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                desconocidas.append(tx_hash)
+        return desconocidas
+
+
+# Shared transaction manager for this process
+gestor = GestorTransacciones()
+
+
+class GestorTransaccionesAsync:
+    """
+    Async counterpart of GestorTransacciones for the async views: nonces are handed out under an asyncio lock
+    and the transaction is sent with AsyncWeb3, so waiting on the node never blocks a thread.
+    Each event loop gets its own lock and nonce counters; if the sync manager or another loop sends from
+    the same account in this process, the resulting nonce errors are resolved by the resync-and-retry below.
+    """
+
+    def __init__(self):
+        self._estado = weakref.WeakKeyDictionary()  # event loop -> (lock, {address: next nonce})
+
+    async def _siguiente_nonce(self, w3, nonces, direccion):
+        # Must be called with the loop's lock held
+        if direccion not in nonces:
+            nonces[direccion] = await w3.eth.get_transaction_count(direccion, 'pending')
+        nonce = nonces[direccion]
+        nonces[direccion] = nonce + 1
+        return nonce
+
+    async def enviar(self, firmante, tx):
+        """
+        Assigns the next nonce of the signer, signs and sends the transaction. Returns its hash as a 0x string.
+        On a nonce error the local counter is resynced from the node and the transaction is retried once.
+        """
+        w3 = await obtener_w3_async()
+        lock, nonces = por_bucle(self._estado, lambda: (asyncio.Lock(), {}))
+        for intento in range(2):
+            async with lock:
+                nonce = await self._siguiente_nonce(w3, nonces, firmante.address)
+                firmada = firmante.firmar({**tx, 'nonce': nonce, 'from': firmante.address})
+                try:
+                    return (await w3.eth.send_raw_transaction(firmada.raw_transaction)).to_0x_hex()
+                except Exception as e:
+                    nonces.pop(firmante.address, None)
+                    if intento == 0 and any(error in str(e).lower() for error in ERRORES_NONCE):
+                        logger.warning("Nonce %s of %s out of sync, resyncing: %s", nonce, firmante.address, e)
+                        continue
+                    raise
+
+
+# Shared async transaction manager for this process
+gestor_async = GestorTransaccionesAsync()
+
+
+def parametros_tx():
+    """
+    Common fields of every transaction sent by the server account (the nonce is added by the manager).
+    """
+    return {
+        'chainId': CHAIN_ID,
+        'gas': GAS,
+        'gasPrice': Web3.to_wei(GAS_PRICE_GWEI, 'gwei'),
+    }
+
+
+def lote_listo(limite):
+    """
+    True when enough bids are pending to fill a batch, or the oldest one has waited the whole window.
+    """
+    pendientes = Puja.objects.filter(pendientes_listas())
+    if pendientes.count() >= limite:
+        return True
+    return pendientes.filter(fecha_puja__lte=timezone.now() - VENTANA_LOTE).exists()
+
+
+def marcar_fallidas(ids, error):
+    """
+    Fails bids permanently after an error that retrying cannot fix (revert, malformed batch).
+    """
+    Puja.objects.filter(id__in=ids).update(estado='fallida', error=str(error), actualizado=timezone.now())
+
+
+def reintentar_pujas(ids, error, **campos):
+    """
+    Returns bids to the queue after a transient error (timeout, nonce race, node unavailable), counting the attempt;
+    bids that reached MAX_INTENTOS are failed instead. Returns how many were failed.
+    """
+    with transaction.atomic():
+        agotadas = Puja.objects.filter(id__in=ids, intentos__gte=MAX_INTENTOS - 1).count()
+        # Every SET expression reads the values from before the update, so the Case sees the old attempt count
+        Puja.objects.filter(id__in=ids).update(
+            estado=Case(When(intentos__gte=MAX_INTENTOS - 1, then=Value('fallida')), default=Value('pendiente')),
+            intentos=F('intentos') + 1,
+            error=str(error),
+            actualizado=timezone.now(),
+            **campos,
+        )
+    return agotadas
+
+
+def construir_registro(pujas, firmante):
+    """
+    Builds the registrarPujas transaction of a batch. Returns None, failing the bids, when it cannot be built.
+    """
+    try:
+        # Every field is given explicitly so building the transaction makes no RPC call; the real nonce is set on send
+        return obtener_contrato().functions.registrarPujas(
+            [Web3.to_checksum_address(puja.wallet_arrendatario) for puja in pujas],
+            [int(puja.monto) for puja in pujas],
+            [puja.moneda for puja in pujas],
+        ).build_transaction({
+            **parametros_tx(),
+            'gas': GAS_LOTE_BASE + GAS_POR_PUJA * len(pujas),
+            'from': firmante.address,
+            'nonce': 0,
+        })
+    except (TypeError, ValueError, Web3ValidationError) as e:
+        logger.error("Could not build the registration of %s bids: %s", len(pujas), e)
+        marcar_fallidas([puja.id for puja in pujas], e)
+        return None
+
+
+def enviar_pujas(lotes):
+    """
+    Registers each batch of bids in its own registrarPujas transaction. The transactions are queued and submitted
+    back to back through the manager's pipeline, signed together, without waiting for any receipt.
+    All the bids of a batch share its transaction hash; receipts are tracked by `confirmar_pujas_enviadas`.
+    """
+    firmante = obtener_firmante()
+    for pujas in lotes:
+        tx = construir_registro(pujas, firmante) if pujas else None
+        if tx is not None:
+            gestor.encolar(firmante, tx, referencia=[puja.id for puja in pujas])
+
+    for ids, tx_hash, error in gestor.enviar_cola():
+        if isinstance(error, ContractLogicError):
+            # The node rejected the call itself; the same batch would revert again
+            logger.error("Registration of %s bids reverted: %s", len(ids), error)
+            marcar_fallidas(ids, error)
+        elif error is not None:
+            agotadas = reintentar_pujas(ids, error)
+            logger.warning("Could not submit batch of %s bids, %s out of attempts: %s", len(ids), agotadas, error)
+        else:
+            Puja.objects.filter(id__in=ids).update(
+                estado='enviada', tx_hash=tx_hash, actualizado=timezone.now()
+            )
+
+
+def confirmar_pujas_enviadas(limite):
+    """
+    Checks the receipts of submitted batches and records the confirmation state of their bids.
+    Batches unmined after TIEMPO_CONFIRMACION that the node no longer knows were dropped or replaced;
+    their bids go back to the queue as a failed attempt.
+    """
+    tx_hashes = list(
+        Puja.objects.filter(estado='enviada').order_by('tx_hash').values_list('tx_hash', flat=True).distinct()[:limite]
+    )
+    for tx_hash, exitosa in gestor.estado_recibos(tx_hashes).items():
+        Puja.objects.filter(estado='enviada', tx_hash=tx_hash).update(
+            estado='confirmada' if exitosa else 'fallida', actualizado=timezone.now()
+        )
+
+    vencidas = list(
+        Puja.objects
+        .filter(estado='enviada', actualizado__lt=timezone.now() - TIEMPO_CONFIRMACION)
+        .order_by('tx_hash')
+        .values_list('tx_hash', flat=True)
+        .distinct()[:limite]
+    )
+    perdidas = gestor.transacciones_desconocidas(vencidas)
+    if not perdidas:
+        return
+    # The dropped transaction's nonce is free again, so later ones would wait behind the gap
+    gestor.resincronizar(obtener_firmante().address)
+    for tx_hash in perdidas:
+        ids = list(Puja.objects.filter(estado='enviada', tx_hash=tx_hash).values_list('id', flat=True))
+        logger.warning("Transaction %s was dropped, re-queueing %s bids", tx_hash, len(ids))
+        reintentar_pujas(ids, f'Transaction {tx_hash} was dropped or replaced', tx_hash=None)
+
+
+def procesar_pujas(limite=LOTE_MAXIMO, lotes=LOTES_POR_PASADA):
+    """
+    One pass of the bid worker: once the size or time window is reached, claims up to `lotes` batches of `limite`
+    bids and submits them together, then updates the submitted ones. Returns the number of bids submitted.
+    """
+    pujas = reclamar_pujas_pendientes(limite * lotes) if lote_listo(limite) else []
+    enviar_pujas([pujas[inicio:inicio + limite] for inicio in range(0, len(pujas), limite)])
+    confirmar_pujas_enviadas(limite * lotes)
+    return len(pujas)
+
+
+def sincronizar_eventos(bloques_por_consulta=BLOQUES_POR_CONSULTA, confirmaciones=CONFIRMACIONES, contrato=None,
+                        bloque_inicial=None):
+    """
+    Copies the PujaRegistrada events emitted since the stored checkpoint into the local PujaCadena table,
+    scanning block ranges with eth_getLogs. Each range and its checkpoint are saved in one transaction,
+    so an interrupted sync resumes where it stopped. Returns the number of events stored.
+    `contrato` defaults to the configured Pujas contract; the mirror and the checkpoint are kept per contract address.
+    """
+    contrato = contrato or obtener_contrato()
+    if bloque_inicial is None:
+        bloque_inicial = settings.PUJAS_CONTRACT_BLOQUE_INICIAL
+    checkpoint, _ = SincronizacionCadena.objects.get_or_create(
+        contrato=contrato.address,
+        defaults={'ultimo_bloque': bloque_inicial - 1},
+    )
+    hasta = contrato.w3.eth.block_number - confirmaciones
+    total = 0
+    desde = checkpoint.ultimo_bloque + 1
+    while desde <= hasta:
+        fin = min(desde + bloques_por_consulta - 1, hasta)
+        eventos = contrato.events.PujaRegistrada.get_logs(from_block=desde, to_block=fin)
+        filas = [
+            PujaCadena(
+                contrato=contrato.address,
+                indice=evento['args']['indice'],
+                arrendatario=evento['args']['arrendatario'],
+                monto=evento['args']['monto'],
+                moneda=evento['args']['moneda'],
+                tx_hash=evento['transactionHash'].to_0x_hex(),
+                bloque=evento['blockNumber'],
+                indice_log=evento['logIndex'],
+            )
+            for evento in eventos
+        ]
+        with transaction.atomic():
+            PujaCadena.objects.bulk_create(filas, ignore_conflicts=True)
+            checkpoint.ultimo_bloque = fin
+            checkpoint.save(update_fields=['ultimo_bloque', 'actualizado'])
+        total += len(filas)
+        desde = fin + 1
+    return total
+
+
+def pujas_sin_registro():
+    """
+    Confirmed bids whose transaction has no PujaCadena event in the local mirror (reconciliation, local reads only).
+    """
+    return Puja.objects.filter(estado='confirmada').exclude(
+        tx_hash__in=PujaCadena.objects.values('tx_hash')
+    )
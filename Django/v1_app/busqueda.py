@@ -0,0 +1,99 @@
+from decimal import Decimal, InvalidOperation
+import numpy as np
+# Full-text search relies on PostgreSQL (tsvector column, GIN index, websearch queries); like the
+# PostGIS location columns, this makes PostgreSQL with PostGIS a hard requirement of the project
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.utils.dateparse import parse_date, parse_datetime
+
+# Text search configuration of the listings
+CONFIGURACION_TEXTO = 'spanish'
+
+# The name weighs more than the amenities, and the amenities more than the free description
+VECTOR_BUSQUEDA = (
+    SearchVector('nombre', weight='A', config=CONFIGURACION_TEXTO)
+    + SearchVector('amenidades', weight='B', config=CONFIGURACION_TEXTO)
+    + SearchVector('descripcion', weight='C', config=CONFIGURACION_TEXTO)
+)
+
+# Longest text query accepted by the API
+LONGITUD_MAXIMA_TEXTO = 200
+
+# Query parameter -> (ORM lookup, parser) for the structured search filters
+FILTROS = {
+    'precio_min': ('precio_base__gte', 'decimal'),
+    'precio_max': ('precio_base__lte', 'decimal'),
+    'habitaciones': ('habitaciones', 'entero'),
+    'habitaciones_min': ('habitaciones__gte', 'entero'),
+    'baños': ('baños', 'entero'),
+    'baños_min': ('baños__gte', 'entero'),
+    'metros_min': ('metros_cuadrados__gte', 'decimal'),
+    'metros_max': ('metros_cuadrados__lte', 'decimal'),
+    'publicado_desde': ('fecha_publicacion__gte', 'fecha'),
+    'publicado_hasta': ('fecha_publicacion__lte', 'fecha'),
+}
+
+
+def _convertir(valor, tipo):
+    if tipo == 'entero':
+        numero = int(valor)
+        if numero < 0:
+            raise ValueError
+        return numero
+    if tipo == 'decimal':
+        try:
+            return Decimal(valor)
+        except InvalidOperation:
+            raise ValueError
+    fecha = parse_datetime(valor) or parse_date(valor)
+    if fecha is None:
+        raise ValueError
+    return fecha
+
+
+def leer_filtros(params):
+    """
+    Parses the structured filters of a request into ORM lookups. Unknown parameters are ignored.
+    Raises ValueError naming the first malformed parameter.
+    """
+    filtros = {}
+    for parametro, (lookup, tipo) in FILTROS.items():
+        valor = params.get(parametro)
+        if valor in (None, ''):
+            continue
+        try:
+            filtros[lookup] = _convertir(valor, tipo)
+        except ValueError:
+            raise ValueError(f"Invalid value for {parametro}.")
+    return filtros
+
+
+def actualizar_vector_busqueda(inmuebles):
+    """
+    Recomputes the stored search vector of a property queryset in the database, in one UPDATE.
+    """
+    inmuebles.update(vector_busqueda=VECTOR_BUSQUEDA)
+
+
+def buscar_texto(inmuebles, texto):
+    """
+    Restricts a property queryset to the listings matching a web-style text query, using the GIN index.
+    Returns the filtered queryset and a function giving the text relevance of an array of property ids,
+    so the rank is only computed for the candidates the tenant actually scores, not for every match.
+    """
+    if len(texto) > LONGITUD_MAXIMA_TEXTO:
+        raise ValueError(f"q must be at most {LONGITUD_MAXIMA_TEXTO} characters.")
+    consulta = SearchQuery(texto, config=CONFIGURACION_TEXTO, search_type='websearch')
+    coincidencias = inmuebles.filter(vector_busqueda=consulta)
+
+    def relevancia(ids):
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.float32)
+        rangos = dict(
+            coincidencias
+            .filter(id__in=ids.tolist())
+            .annotate(relevancia=SearchRank('vector_busqueda', consulta))
+            .values_list('id', 'relevancia')
+        )
+        return np.fromiter((rangos.get(int(i), 0.0) for i in ids), dtype=np.float32, count=len(ids))
+
+    return coincidencias, relevancia
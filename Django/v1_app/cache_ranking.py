@@ -0,0 +1,79 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+# Cache alias configured in settings.CACHES
+ALIAS = 'ranking'
+
+# Only the best results of each tenant are kept, which bounds the size of an entry
+TOP_N = getattr(settings, 'RANKING_CACHE_TOP_N', 1000)
+
+CLAVE_VERSION_CATALOGO = 'ranking:v:catalogo'
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def _clave_version_arrendatario(arrendatario_id):
+    return f'ranking:v:arrendatario:{arrendatario_id}'
+
+
+def _version(clave_version):
+    # A missing version (never set or evicted) gets a fresh timestamp, so evicting it can never revive old entries
+    return _cache().get_or_set(clave_version, time.time_ns(), timeout=None)
+
+
+def version_catalogo():
+    """
+    Returns the current catalog version; it changes whenever a property is added, edited or removed.
+    """
+    return _version(CLAVE_VERSION_CATALOGO)
+
+
+def clave(arrendatario_id):
+    """
+    Builds the cache key of a tenant's ranking from the current catalog and tenant versions.
+    Read it before computing the ranking so a change made during the computation is not hidden.
+    """
+    version_arrendatario = _version(_clave_version_arrendatario(arrendatario_id))
+    return f'ranking:{arrendatario_id}:{version_catalogo()}:{version_arrendatario}'
+
+
+def obtener(clave_ranking):
+    """
+    Returns the cached (ids, scores, completo) of a ranking, or None on a miss.
+    `completo` is True when the cached rows are the tenant's whole ranking, not just its top N.
+    """
+    entrada = _cache().get(clave_ranking)
+    if entrada is None:
+        return None
+    ids, scores, completo = entrada
+    return np.frombuffer(ids, dtype=np.int64), np.frombuffer(scores, dtype=np.float32), completo
+
+
+def guardar(clave_ranking, ids, scores, completo):
+    """
+    Stores the best rows of a ranking, already sorted by (score desc, id asc).
+    """
+    entrada = (
+        np.asarray(ids, dtype=np.int64).tobytes(),
+        np.asarray(scores, dtype=np.float32).tobytes(),
+        completo,
+    )
+    _cache().set(clave_ranking, entrada)
+
+
+def invalidar_catalogo():
+    """
+    Invalidates every tenant's ranking after a property is added, edited or removed.
+    """
+    _cache().set(CLAVE_VERSION_CATALOGO, time.time_ns(), timeout=None)
+
+
+def invalidar_arrendatario(arrendatario_id):
+    """
+    Invalidates a tenant's ranking after their criteria change.
+    """
+    _cache().set(_clave_version_arrendatario(arrendatario_id), time.time_ns(), timeout=None)
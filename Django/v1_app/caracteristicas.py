@@ -0,0 +1,81 @@
+import numpy as np
+
+# Property attributes in the same order as the Likert columns of ArrendatarioCriterios,
+# so a tenant's weights and a property's features line up position by position
+CARACTERISTICAS = (
+    'metros_cuadrados',
+    'habitaciones',
+    'baños',
+    'estado_conservacion',
+    'amenidades',
+    'atractivos_turisticos',
+    'espacios_publicos',
+    'paradas_transporte_publico',
+    'establecimientos_comerciales',
+    'establecimientos_educativos',
+)
+NUM_CARACTERISTICAS = len(CARACTERISTICAS)
+
+# Reference values: a property reaching them gets the full feature value (1.0)
+REFERENCIA_METROS = 200.0
+REFERENCIA_HABITACIONES = 5.0
+REFERENCIA_BAÑOS = 4.0
+REFERENCIA_AMENIDADES = 10.0
+
+# Free-text conservation states mapped to [0, 1]; unknown values fall back to the middle of the scale
+ESTADOS_CONSERVACION = {
+    'nuevo': 1.0,
+    'excelente': 1.0,
+    'muy bueno': 0.85,
+    'bueno': 0.7,
+    'regular': 0.45,
+    'malo': 0.2,
+}
+ESTADO_POR_DEFECTO = 0.5
+
+
+def _saturar(valor, referencia):
+    # Linear up to the reference value, capped at 1.0
+    return min(float(valor or 0) / referencia, 1.0)
+
+
+def _normalizar_estado(estado):
+    return ESTADOS_CONSERVACION.get((estado or '').strip().lower(), ESTADO_POR_DEFECTO)
+
+
+def _contar_amenidades(amenidades):
+    # Amenities are stored as free text, one per comma or line
+    partes = (amenidades or '').replace('\n', ',').split(',')
+    return sum(1 for parte in partes if parte.strip())
+
+
+def vector_caracteristicas(inmueble):
+    """
+    Normalizes the numeric and boolean attributes of a property into a float32 vector in [0, 1].
+    """
+    return np.array([
+        _saturar(inmueble.metros_cuadrados, REFERENCIA_METROS),
+        _saturar(inmueble.habitaciones, REFERENCIA_HABITACIONES),
+        _saturar(inmueble.baños, REFERENCIA_BAÑOS),
+        _normalizar_estado(inmueble.estado_conservacion),
+        _saturar(_contar_amenidades(inmueble.amenidades), REFERENCIA_AMENIDADES),
+        float(inmueble.atractivos_turisticos),
+        float(inmueble.espacios_publicos),
+        float(inmueble.paradas_transporte_publico),
+        float(inmueble.establecimientos_comerciales),
+        float(inmueble.establecimientos_educativos),
+    ], dtype=np.float32)
+
+
+def empaquetar(vector):
+    """
+    Serializes a feature vector into its fixed-width binary form (10 little-endian float32).
+    """
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def desempaquetar(datos):
+    """
+    Rebuilds the feature vectors from one or more concatenated binary rows.
+    """
+    return np.frombuffer(datos, dtype='<f4').reshape(-1, NUM_CARACTERISTICAS)
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import weakref
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from web3 import Web3, HTTPProvider, AsyncWeb3, AsyncHTTPProvider
+from web3.providers.rpc.utils import ExceptionRetryConfiguration, REQUEST_RETRY_ALLOWLIST
+from .metricas import medir_externo
+
+_lock = threading.Lock()
+_w3 = None
+# Async clients per event loop: an aiohttp session or asyncio lock only works on the loop it was created in
+_lock_bucles = threading.Lock()
+_w3_async = weakref.WeakKeyDictionary()
+_locks_async = weakref.WeakKeyDictionary()
+
+
+class ProveedorMedido(HTTPProvider):
+    """
+    HTTP provider that charges every RPC call, retries included, to the request's external time.
+    """
+
+    def make_request(self, method, params):
+        with medir_externo('web3'):
+            return super().make_request(method, params)
+
+
+class ProveedorAsyncMedido(AsyncHTTPProvider):
+    """
+    Async HTTP provider that charges every RPC call, retries included, to the request's external time.
+    """
+
+    async def make_request(self, method, params):
+        with medir_externo('web3'):
+            return await super().make_request(method, params)
+
+
+def por_bucle(almacen, crear):
+    """
+    Returns the object kept in `almacen` (a WeakKeyDictionary) for the running event loop, creating it
+    with `crear()` on first use. Entries go away with their loop.
+    """
+    bucle = asyncio.get_running_loop()
+    with _lock_bucles:
+        objeto = almacen.get(bucle)
+        if objeto is None:
+            objeto = almacen[bucle] = crear()
+        return objeto
+
+
+def _crear_sesion():
+    # Keep-alive session with a bounded connection pool, so RPC calls reuse TCP/TLS connections
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=settings.WEB3_POOL_CONEXIONES)
+    sesion = requests.Session()
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
+
+
+def obtener_w3():
+    """
+    Returns the process-wide Web3 client, creating it on first use instead of at import time.
+    Read-only RPC calls are retried with exponential backoff on connection errors and timeouts.
+    """
+    global _w3
+    if _w3 is None:
+        with _lock:
+            if _w3 is None:
+                proveedor = ProveedorMedido(
+                    settings.AVALANCHE_RPC_URL,
+                    request_kwargs={'timeout': settings.WEB3_TIMEOUT},
+                    session=_crear_sesion(),
+                    exception_retry_configuration=ExceptionRetryConfiguration(
+                        errors=(requests.ConnectionError, requests.Timeout, requests.HTTPError),
+                        retries=settings.WEB3_REINTENTOS,
+                        backoff_factor=settings.WEB3_BACKOFF,
+                        method_allowlist=REQUEST_RETRY_ALLOWLIST,
+                    ),
+                )
+                _w3 = Web3(proveedor)
+    return _w3
+
+
+async def obtener_w3_async():
+    """
+    Returns the AsyncWeb3 client of the running event loop. Its aiohttp session keeps up to
+    WEB3_POOL_CONEXIONES_ASYNC keep-alive connections, so many RPC calls can be in flight at once.
+    """
+    bucle = asyncio.get_running_loop()
+    w3 = _w3_async.get(bucle)
+    if w3 is None:
+        async with por_bucle(_locks_async, asyncio.Lock):
+            w3 = _w3_async.get(bucle)
+            if w3 is None:
+                proveedor = ProveedorAsyncMedido(
+                    settings.AVALANCHE_RPC_URL,
+                    request_kwargs={'timeout': aiohttp.ClientTimeout(total=settings.WEB3_TIMEOUT)},
+                    exception_retry_configuration=ExceptionRetryConfiguration(
+                        errors=(aiohttp.ClientError, asyncio.TimeoutError),
+                        retries=settings.WEB3_REINTENTOS,
+                        backoff_factor=settings.WEB3_BACKOFF,
+                        method_allowlist=REQUEST_RETRY_ALLOWLIST,
+                    ),
+                )
+                await proveedor.cache_async_session(
+                    aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=settings.WEB3_POOL_CONEXIONES_ASYNC))
+                )
+                w3 = _w3_async[bucle] = AsyncWeb3(proveedor)
+    return w3
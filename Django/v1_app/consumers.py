@@ -1,7 +1,52 @@
+import asyncio
 import json
+import time
+from collections import deque
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from .models import Inmueble, Subasta
+from .difusion import grupo_pujas
+
+# Price ticks of the subscribed properties are sent at most once per interval (seconds)
+INTERVALO_TICK = 0.5
+
+# Largest number of properties a single connection can watch
+MAX_SUSCRIPCIONES = 50
+
+# Messages a client may relay per second, and the burst it may send at once
+MENSAJES_POR_SEGUNDO = 10
+RAFAGA_MENSAJES = 20
+
+# Largest incoming frame accepted from a client, in characters
+TAMANO_MAXIMO_MENSAJE = 4096
+
+# Outgoing group messages are batched into one frame per interval (seconds)
+INTERVALO_LOTE = 0.05
+
+# Outgoing messages buffered per connection; a client too slow to drain them loses the oldest ones
+COLA_MAXIMA = 100
+
+
+class LimiteTasa:
+    """
+    Token bucket: `tasa` tokens per second, holding at most `rafaga`.
+    """
+
+    def __init__(self, tasa, rafaga):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.tokens = rafaga
+        self.ultimo = time.monotonic()
+
+    def permitir(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.rafaga, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
 
 # Define a WebSocket consumer class for handling asynchronous connections
 class AnalysisConsumer(AsyncWebsocketConsumer):
@@ -12,6 +57,10 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
         if self.scope["user"] == AnonymousUser():
             await self.close()
         else:
+            self.limite = LimiteTasa(MENSAJES_POR_SEGUNDO, RAFAGA_MENSAJES)
+            self.cola = deque()
+            self.descartados = 0
+            self.tarea_envio = None
             # Add the user to the analysis group and notifications group if authenticated
             await self.channel_layer.group_add("analysis_group", self.channel_name)
             await self.channel_layer.group_add("notifications", self.channel_name)
@@ -19,12 +68,21 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
 
     # Function that runs when the WebSocket connection is closed
     async def disconnect(self, close_code):
+        if getattr(self, 'tarea_envio', None) is not None:
+            self.tarea_envio.cancel()
         # Remove the user from the analysis and notifications groups upon disconnection
         await self.channel_layer.group_discard("analysis_group", self.channel_name)
         await self.channel_layer.group_discard("notifications", self.channel_name)
 
     # Function to handle messages received from the WebSocket
     async def receive(self, text_data):
+        # Oversized frames and clients above their rate are answered with an error and not relayed
+        if len(text_data) > TAMANO_MAXIMO_MENSAJE:
+            await self.send(text_data=json.dumps({'error': 'Message too large'}))
+            return
+        if not self.limite.permitir():
+            await self.send(text_data=json.dumps({'error': 'Rate limit exceeded'}))
+            return
         try:
             # Parse the incoming text data into a JSON object
             text_data_json = json.loads(text_data)
@@ -79,30 +137,125 @@ class AnalysisConsumer(AsyncWebsocketConsumer):
 
     # Function to send analysis messages to the WebSocket
     async def analysis_message(self, event):
-        try:
-            # Retrieve the message from the event and send it back to the WebSocket
-            message = event['message']
-            await self.send(text_data=json.dumps({
-                'message': message
-            }))
-        # Handle invalid JSON errors
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({'error': 'Invalid JSON format'}))
-        # Handle any other exceptions
-        except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+        self.encolar(event['message'])
 
     # Function to send notification messages to the WebSocket
     async def send_notification(self, event):
+        self.encolar(event['message'])
+
+    # Buffers an outgoing message and schedules the next batch; the buffer is bounded so a slow client cannot grow it
+    def encolar(self, message):
+        if len(self.cola) >= COLA_MAXIMA:
+            self.cola.popleft()
+            self.descartados += 1
+        self.cola.append(message)
+        if self.tarea_envio is None:
+            self.tarea_envio = asyncio.ensure_future(self.enviar_lote())
+
+    # Sends every buffered message in a single frame; a lone message keeps the original {'message': ...} format
+    async def enviar_lote(self):
+        await asyncio.sleep(INTERVALO_LOTE)
+        mensajes, descartados = list(self.cola), self.descartados
+        self.cola.clear()
+        self.descartados = 0
+        self.tarea_envio = None
+        if len(mensajes) == 1 and not descartados:
+            await self.send(text_data=json.dumps({'message': mensajes[0]}))
+            return
+        payload = {'messages': mensajes}
+        if descartados:
+            payload['dropped'] = descartados
+        await self.send(text_data=json.dumps(payload))
+
+
+# WebSocket consumer streaming the live price of the properties a client subscribes to
+class PujasConsumer(AsyncWebsocketConsumer):
+
+    async def connect(self):
+        if self.scope["user"] == AnonymousUser():
+            await self.close()
+            return
+        self.suscripciones = set()
+        # Latest bid of each property since the last tick; a bidding war collapses into one update per property
+        self.pendientes = {}
+        self.tarea_tick = None
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if getattr(self, 'tarea_tick', None) is not None:
+            self.tarea_tick.cancel()
+        for inmueble_id in getattr(self, 'suscripciones', ()):
+            await self.channel_layer.group_discard(grupo_pujas(inmueble_id), self.channel_name)
+
+    # Clients send {"action": "subscribe" | "unsubscribe", "inmueble_id": <id>}
+    async def receive(self, text_data):
         try:
-            # Retrieve the message from the event and send it back to the WebSocket
-            message = event['message']
-            await self.send(text_data=json.dumps({
-                'message': message
-            }))
-        # Handle invalid JSON errors
+            data = json.loads(text_data)
+            action = data['action']
+            inmueble_id = int(data['inmueble_id'])
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({'error': 'Invalid JSON format'}))
-        # Handle any other exceptions
-        except Exception as e:
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            return
+        except (KeyError, TypeError, ValueError):
+            await self.send(text_data=json.dumps({'error': 'Expected action and a numeric inmueble_id'}))
+            return
+
+        if action == 'subscribe':
+            await self.suscribir(inmueble_id)
+        elif action == 'unsubscribe':
+            self.suscripciones.discard(inmueble_id)
+            self.pendientes.pop(inmueble_id, None)
+            await self.channel_layer.group_discard(grupo_pujas(inmueble_id), self.channel_name)
+        else:
+            await self.send(text_data=json.dumps({'error': 'Unknown action'}))
+
+    async def suscribir(self, inmueble_id):
+        if inmueble_id in self.suscripciones:
+            return
+        if len(self.suscripciones) >= MAX_SUSCRIPCIONES:
+            await self.send(text_data=json.dumps({'error': f'At most {MAX_SUSCRIPCIONES} subscriptions per connection'}))
+            return
+        existe, precio = await self.precio_actual(inmueble_id)
+        if not existe:
+            await self.send(text_data=json.dumps({'error': 'Property not found'}))
+            return
+
+        await self.channel_layer.group_add(grupo_pujas(inmueble_id), self.channel_name)
+        self.suscripciones.add(inmueble_id)
+        # Snapshot of the current price, so the client does not wait for the next bid
+        await self.send(text_data=json.dumps({'type': 'precio', 'inmueble_id': inmueble_id, **precio}))
+
+    @database_sync_to_async
+    def precio_actual(self, inmueble_id):
+        # Returns whether the property exists and its current best bid, if any
+        if not Inmueble.objects.filter(pk=inmueble_id).exists():
+            return False, None
+        subasta = Subasta.objects.filter(inmueble_id=inmueble_id).order_by('-apertura', '-id').values('mejor_monto', 'moneda').first()
+        if subasta is None or subasta['mejor_monto'] is None:
+            return True, {'monto': None, 'moneda': None}
+        return True, {'monto': str(subasta['mejor_monto']), 'moneda': subasta['moneda']}
+
+    # Handler of the 'puja_nueva' group messages published by difusion.publicar_puja
+    async def puja_nueva(self, event):
+        pendiente = self.pendientes.get(event['inmueble_id'])
+        self.pendientes[event['inmueble_id']] = {
+            'monto': event['monto'],
+            'moneda': event['moneda'],
+            'pujas': pendiente['pujas'] + 1 if pendiente else 1,
+        }
+        if self.tarea_tick is None:
+            self.tarea_tick = asyncio.ensure_future(self.enviar_tick())
+
+    async def enviar_tick(self):
+        # Waits for the tick interval, then sends the latest price of every property that got bids
+        await asyncio.sleep(INTERVALO_TICK)
+        # Bids arriving while this tick is being sent schedule the next one
+        pendientes, self.pendientes = self.pendientes, {}
+        self.tarea_tick = None
+        await self.send(text_data=json.dumps({
+            'type': 'precios',
+            'precios': [
+                {'inmueble_id': inmueble_id, **precio}
+                for inmueble_id, precio in pendientes.items()
+            ],
+        }))
@@ -0,0 +1,25 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def grupo_pujas(inmueble_id):
+    """
+    Name of the Channels group that receives the bids of one property.
+    """
+    return f'pujas_inmueble_{inmueble_id}'
+
+
+def publicar_puja(puja):
+    """
+    Publishes a new bid to the subscribers of its property only.
+    Every accepted bid is the auction's new best bid, so it carries the property's current price.
+    """
+    async_to_sync(get_channel_layer().group_send)(
+        grupo_pujas(puja.inmueble_id),
+        {
+            'type': 'puja_nueva',
+            'inmueble_id': puja.inmueble_id,
+            'monto': str(puja.monto),
+            'moneda': puja.moneda,
+        },
+    )
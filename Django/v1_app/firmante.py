@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from eth_account import Account
+
+# Account of each signing pool process, set once by the pool initializer
+_cuenta_proceso = None
+
+
+def _iniciar_proceso(clave_privada):
+    global _cuenta_proceso
+    _cuenta_proceso = Account.from_key(clave_privada)
+
+
+def _firmar_en_proceso(tx):
+    return _cuenta_proceso.sign_transaction(tx)
+
+
+class Firmante:
+    """
+    Holds the server's key material in memory, loaded once, and signs transactions with it.
+    With `procesos` > 0, batches are signed in parallel by a process pool; each pool process
+    loads the key once at start-up.
+    """
+
+    def __init__(self, clave_privada, procesos=0):
+        self._cuenta = Account.from_key(clave_privada)
+        self.address = self._cuenta.address
+        self._pool = None
+        if procesos:
+            self._pool = ProcessPoolExecutor(
+                max_workers=procesos, initializer=_iniciar_proceso, initargs=(clave_privada,)
+            )
+
+    def firmar(self, tx):
+        """
+        Signs one transaction in the calling thread.
+        """
+        return self._cuenta.sign_transaction(tx)
+
+    def firmar_lote(self, txs):
+        """
+        Signs several transactions, in the process pool when one is configured. Results keep the input order.
+        """
+        if self._pool is None or len(txs) < 2:
+            return [self.firmar(tx) for tx in txs]
+        return list(self._pool.map(_firmar_en_proceso, txs))
+
+
+_firmante = None
+_lock = threading.Lock()
+
+
+def obtener_firmante():
+    """
+    Returns the process-wide signer for settings.PRIVATE_KEY (read from credentials.env at start-up).
+    """
+    global _firmante
+    if _firmante is None:
+        with _lock:
+            if _firmante is None:
+                if not settings.PRIVATE_KEY:
+                    raise RuntimeError("PRIVATE_KEY is not configured.")
+                _firmante = Firmante(settings.PRIVATE_KEY, settings.FIRMANTE_PROCESOS)
+    return _firmante
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+from .models import InmuebleFoto
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Uploads are hashed and copied to storage in chunks of this size, never read whole into memory
+TAMANO_BLOQUE = 256 * 1024
+
+# Renditions built for every original: field -> longest side in pixels
+VERSIONES = {'miniatura': 320, 'mediana': 1024}
+CALIDAD_JPEG = 85
+
+_pool = None
+_lock = threading.Lock()
+
+
+def obtener_pool():
+    """
+    Returns the process-wide thread pool that builds the renditions (settings.FOTOS_HILOS threads).
+    """
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=settings.FOTOS_HILOS, thread_name_prefix='fotos')
+    return _pool
+
+
+def _almacenamiento():
+    return InmuebleFoto._meta.get_field('imagen').storage
+
+
+class ArchivoPorBloques:
+    """
+    File-like view of an upload whose chunks() always uses TAMANO_BLOQUE, so the storage copies it block by block.
+    """
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+        self.name = archivo.name
+        self.size = archivo.size
+
+    def chunks(self, chunk_size=None):
+        self._archivo.seek(0)
+        return self._archivo.chunks(TAMANO_BLOQUE)
+
+    def __getattr__(self, nombre):
+        return getattr(self._archivo, nombre)
+
+
+def hash_contenido(archivo):
+    """
+    SHA-256 of an upload, read in chunks.
+    """
+    digest = hashlib.sha256()
+    for bloque in archivo.chunks(TAMANO_BLOQUE):
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+def guardar_originales(archivos):
+    """
+    Streams the uploaded photos to storage under names derived from their content hash and returns unsaved
+    InmuebleFoto rows (without property) plus the storage names this call wrote. Content already stored, by an
+    earlier upload or twice in this one, is not written again: the new row shares the file and its renditions.
+    """
+    storage = _almacenamiento()
+    hashes = [hash_contenido(archivo) for archivo in archivos]
+    existentes = {
+        fila['hash_contenido']: fila
+        for fila in InmuebleFoto.objects.filter(hash_contenido__in=set(hashes)).values('hash_contenido', 'imagen', 'miniatura', 'mediana')
+    }
+    fotos, escritos = [], []
+    try:
+        for archivo, digest in zip(archivos, hashes):
+            if digest not in existentes:
+                extension = os.path.splitext(archivo.name)[1].lower()
+                nombre = storage.save(f'inmuebles_fotos/{digest}{extension}', ArchivoPorBloques(archivo))
+                escritos.append(nombre)
+                existentes[digest] = {'hash_contenido': digest, 'imagen': nombre, 'miniatura': '', 'mediana': ''}
+            fotos.append(InmuebleFoto(**existentes[digest]))
+    except Exception:
+        eliminar_archivos(escritos)
+        raise
+    return fotos, escritos
+
+
+def eliminar_archivos(nombres):
+    """
+    Removes stored files, e.g. the originals of a request whose rows were not saved.
+    """
+    storage = _almacenamiento()
+    for nombre in nombres:
+        storage.delete(nombre)
+
+
+def generar_versiones(fotos):
+    """
+    Queues the renditions of the photos that lack them; they are built by the thread pool once the
+    current transaction commits, so the request never waits on image decoding.
+    """
+    hashes = {foto.hash_contenido for foto in fotos if foto.hash_contenido and not foto.miniatura}
+    if hashes:
+        transaction.on_commit(lambda: [obtener_pool().submit(_generar_versiones, digest) for digest in hashes])
+
+
+def _generar_versiones(digest):
+    # Runs in a pool thread: builds every rendition of one original and stores it on all the rows sharing it
+    try:
+        foto = InmuebleFoto.objects.filter(hash_contenido=digest).exclude(imagen='').first()
+        if foto is None:
+            return
+        storage = _almacenamiento()
+        campos = {}
+        with foto.imagen.open('rb') as original, Image.open(original) as imagen:
+            imagen = ImageOps.exif_transpose(imagen).convert('RGB')
+            for campo, lado in VERSIONES.items():
+                version = imagen.copy()
+                version.thumbnail((lado, lado))
+                buffer = BytesIO()
+                version.save(buffer, 'JPEG', quality=CALIDAD_JPEG, optimize=True)
+                campos[campo] = storage.save(f'inmuebles_fotos/{campo}s/{digest}.jpg', ContentFile(buffer.getvalue()))
+        InmuebleFoto.objects.filter(hash_contenido=digest).update(**campos)
+    except Exception:
+        logger.exception("Could not build the renditions of photo %s", digest)
+    finally:
+        # Pool threads outlive the request; their connection is not reused across tasks
+        connection.close()
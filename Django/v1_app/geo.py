@@ -0,0 +1,277 @@
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Polygon
+from django.contrib.gis.measure import D
+from django.db.models import BooleanField, Exists, F, Func, OuterRef, Value
+from django.db.models.functions import Cast
+from django.utils import timezone
+from .models import Inmueble, PuntoInteres, InmuebleCaracteristicas
+from .almacen import (
+    recalcular_caracteristicas, huella_caracteristicas, MARGEN_REFRESCO, INTERVALO_VERIFICACION_S, RECARGA_COMPLETA_S,
+)
+from . import cache_ranking
+
+# Largest search radius accepted by the API
+RADIO_MAXIMO_KM = 100
+
+# Largest bounding box accepted by the API, in square degrees (about 550 x 550 km at the equator)
+AREA_MAXIMA_BBOX_GRADOS2 = 25
+
+# Radius of the sphere both backends measure distances on: the WGS84 mean radius (2a + b) / 3, the one PostGIS
+# uses for geography distances computed without the spheroid
+RADIO_TIERRA_M = 6371008.7714
+
+# Cell size of the in-memory grid (about 5.5 km of latitude)
+TAMANO_CELDA_GRADOS = 0.05
+
+# Multiplier packing a cell's row and column into one key (there are 7200 columns at the default cell size)
+FACTOR_FILA = 100000
+
+# Distance under which a point of interest counts as "nearby" a property
+DISTANCIA_CERCANIA_M = 500
+
+
+def leer_filtro_espacial(params):
+    """
+    Parses the spatial filter of a request: either lat/lng/radio_km or bbox=min_lng,min_lat,max_lng,max_lat.
+    Returns ('radio', (lng, lat, radio_m)), ('bbox', (min_lng, min_lat, max_lng, max_lat)) or None.
+    Raises ValueError on malformed, out-of-range or oversized values.
+    """
+    if params.get('bbox'):
+        min_lng, min_lat, max_lng, max_lat = (float(valor) for valor in params['bbox'].split(','))
+        if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+            raise ValueError('Invalid bbox')
+        if (max_lng - min_lng) * (max_lat - min_lat) > AREA_MAXIMA_BBOX_GRADOS2:
+            raise ValueError(f'bbox must cover at most {AREA_MAXIMA_BBOX_GRADOS2} square degrees')
+        return 'bbox', (min_lng, min_lat, max_lng, max_lat)
+
+    if params.get('lat') is not None and params.get('lng') is not None:
+        lat, lng = float(params['lat']), float(params['lng'])
+        radio_km = float(params.get('radio_km', 5))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radio_km <= RADIO_MAXIMO_KM):
+            raise ValueError('Invalid radius search')
+        return 'radio', (lng, lat, radio_km * 1000)
+
+    return None
+
+
+class PuntoGeografico(Func):
+    """
+    Geography point built in SQL from a longitude and a latitude.
+    """
+    template = 'ST_SetSRID(ST_MakePoint(%(expressions)s), 4326)::geography'
+    output_field = PointField(geography=True, srid=4326)
+
+
+class DentroDeRadio(Func):
+    """
+    ST_DWithin on the sphere (use_spheroid = false), the same Earth model as the in-memory grid,
+    so both backends agree on points near the edge of a radius. It still uses the geography index.
+    """
+    function = 'ST_DWithin'
+    template = '%(function)s(%(expressions)s, false)'
+    output_field = BooleanField()
+
+    def __init__(self, campo, lng, lat, radio_m):
+        super().__init__(F(campo), PuntoGeografico(Value(float(lng)), Value(float(lat))), Value(float(radio_m)))
+
+
+class IndiceBaseDatos:
+    """
+    Spatial search delegated to the database's spatial index (PostGIS).
+    A bounding box is a plain longitude/latitude rectangle, tested on the location cast to geometry (served by
+    inmueble_ubicacion_plana_idx); as a geography its edges would be great-circle arcs instead.
+    """
+
+    def filtrar(self, inmuebles, filtro):
+        tipo, valores = filtro
+        if tipo == 'radio':
+            lng, lat, radio_m = valores
+            return inmuebles.filter(DentroDeRadio('ubicacion', lng, lat, radio_m))
+        caja = Polygon.from_bbox(valores)
+        caja.srid = 4326
+        return inmuebles.alias(ubicacion_plana=Cast('ubicacion', PointField(srid=4326))).filter(ubicacion_plana__intersects=caja)
+
+
+class IndiceGrilla:
+    """
+    Pure NumPy spatial search that does not use the database's spatial index.
+    Property coordinates are read from the feature table and bucketed into a uniform lon/lat grid;
+    a query scans only the cells overlapping its bounding box and then applies the exact test.
+    Distances use the haversine formula on the same sphere as IndiceBaseDatos, so both return the same properties.
+    The models still declare GeoDjango geometry columns, so the database must be spatial (PostGIS) either way.
+    """
+
+    def __init__(self, tamano_celda=TAMANO_CELDA_GRADOS, intervalo_verificacion=INTERVALO_VERIFICACION_S):
+        self.tamano_celda = tamano_celda
+        self.intervalo_verificacion = intervalo_verificacion
+        self._lock = threading.Lock()
+        self._marca = None
+        self._construido = None
+        self._verificado = None
+        vacio = np.empty(0)
+        self.cargar(vacio, vacio, vacio)
+
+    def cargar(self, ids, lng, lat):
+        """
+        Replaces the indexed points with the given property ids and coordinates.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        lng, lat = np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+        celdas = self._celdas(lng, lat)
+
+        # Points sorted by cell, so every cell is a contiguous slice of the arrays
+        orden = np.argsort(celdas, kind='stable')
+        claves, inicios, cuentas = np.unique(celdas[orden], return_index=True, return_counts=True)
+        # One tuple swapped in at once, so a concurrent query never mixes two versions
+        self._datos = (ids[orden], lng[orden], lat[orden], claves, inicios, inicios + cuentas)
+
+    def _construir(self):
+        filas = list(
+            InmuebleCaracteristicas.objects
+            .filter(eliminado=False, longitud__isnull=False, latitud__isnull=False)
+            .values_list('inmueble_id', 'longitud', 'latitud')
+        )
+        datos = np.array(filas, dtype=np.float64).reshape(-1, 3)
+        self.cargar(datos[:, 0], datos[:, 1], datos[:, 2])
+
+    def _celdas(self, lng, lat):
+        # Cell key packing the column (longitude) and row (latitude) indexes
+        columnas = np.floor((np.asarray(lng) + 180) / self.tamano_celda).astype(np.int64)
+        filas = np.floor((np.asarray(lat) + 90) / self.tamano_celda).astype(np.int64)
+        return filas * FACTOR_FILA + columnas
+
+    def _asegurar_vigente(self):
+        # The fingerprint (live rows, latest change) of the shared feature table moves with every insert, move
+        # or deletion made by any worker process; it is read at most once per intervalo_verificacion. A move
+        # committed long after its timestamp leaves it unchanged, so the grid is also rebuilt every RECARGA_COMPLETA_S
+        ahora = time.monotonic()
+        if self._verificado is not None and ahora - self._verificado < self.intervalo_verificacion:
+            return
+        marca = huella_caracteristicas()
+        with self._lock:
+            if marca != self._marca or self._construido is None or ahora - self._construido >= RECARGA_COMPLETA_S:
+                self._construir()
+                self._construido = ahora
+                # Rows stamped just before the latest one may still be committing; rebuild again on the next check
+                reciente = marca[1] is not None and timezone.now() - marca[1] < MARGEN_REFRESCO
+                self._marca = None if reciente else marca
+            self._verificado = ahora
+
+    def _candidatos(self, datos, min_lng, min_lat, max_lng, max_lat):
+        # Indexes of the points in every cell overlapping the bounding box
+        _, _, _, claves, inicios, fines = datos
+        col_min, col_max = (int(np.floor((v + 180) / self.tamano_celda)) for v in (min_lng, max_lng))
+        fila_min, fila_max = (int(np.floor((v + 90) / self.tamano_celda)) for v in (min_lat, max_lat))
+
+        if (fila_max - fila_min + 1) * (col_max - col_min + 1) > len(claves):
+            # The box spans more cells than are occupied: test the occupied cells instead of walking the box
+            filas, columnas = claves // FACTOR_FILA, claves % FACTOR_FILA
+            seleccion = np.flatnonzero(
+                (filas >= fila_min) & (filas <= fila_max) & (columnas >= col_min) & (columnas <= col_max)
+            )
+        else:
+            buscadas = (np.arange(fila_min, fila_max + 1)[:, None] * FACTOR_FILA + np.arange(col_min, col_max + 1)).ravel()
+            posiciones = np.minimum(np.searchsorted(claves, buscadas), max(len(claves) - 1, 0))
+            seleccion = posiciones[claves[posiciones] == buscadas] if len(claves) else posiciones[:0]
+
+        trozos = [np.arange(inicios[i], fines[i]) for i in seleccion]
+        return np.concatenate(trozos) if trozos else np.empty(0, dtype=np.int64)
+
+    def consultar(self, filtro):
+        """
+        Returns the ids of the indexed points matching the spatial filter, without checking the database.
+        """
+        datos = self._datos
+        ids, lngs, lats = datos[:3]
+        tipo, valores = filtro
+        if tipo == 'bbox':
+            min_lng, min_lat, max_lng, max_lat = valores
+            candidatos = self._candidatos(datos, min_lng, min_lat, max_lng, max_lat)
+            lng, lat = lngs[candidatos], lats[candidatos]
+            dentro = (lng >= min_lng) & (lng <= max_lng) & (lat >= min_lat) & (lat <= max_lat)
+            return ids[candidatos[dentro]]
+
+        lng0, lat0, radio_m = valores
+        delta_lat = np.degrees(radio_m / RADIO_TIERRA_M)
+        min_lat, max_lat = max(lat0 - delta_lat, -90), min(lat0 + delta_lat, 90)
+        polo = abs(lat0) + delta_lat >= 90
+        delta_lng = 180 if polo else delta_lat / max(np.cos(np.radians(abs(lat0) + delta_lat)), 1e-6)
+        if delta_lng >= 180:
+            # A circle covering a pole reaches every longitude, so its whole latitude band is searched
+            cajas = [(-180, min_lat, 180, max_lat)]
+        else:
+            # A circle crossing the antimeridian also covers the opposite edge of the grid
+            cajas = [(max(lng0 - delta_lng, -180), min_lat, min(lng0 + delta_lng, 180), max_lat)]
+            if lng0 - delta_lng < -180:
+                cajas.append((lng0 - delta_lng + 360, min_lat, 180, max_lat))
+            if lng0 + delta_lng > 180:
+                cajas.append((-180, min_lat, lng0 + delta_lng - 360, max_lat))
+        candidatos = np.unique(np.concatenate([self._candidatos(datos, *caja) for caja in cajas]))
+        distancias = distancia_haversine(lng0, lat0, lngs[candidatos], lats[candidatos])
+        return ids[candidatos[distancias <= radio_m]]
+
+    def buscar(self, filtro):
+        """
+        Returns the ids of the properties matching the spatial filter, reloading the grid when the catalog changed.
+        """
+        self._asegurar_vigente()
+        return self.consultar(filtro)
+
+    def filtrar(self, inmuebles, filtro):
+        return inmuebles.filter(id__in=self.buscar(filtro).tolist())
+
+
+def distancia_haversine(lng0, lat0, lng, lat):
+    """
+    Great-circle distance in meters from one point to arrays of points.
+    """
+    lng0, lat0, lng, lat = np.radians(lng0), np.radians(lat0), np.radians(lng), np.radians(lat)
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lng - lng0) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# Spatial index backends selectable through settings.SPATIAL_INDEX_BACKEND
+INDICES_ESPACIALES = {
+    'db': IndiceBaseDatos,
+    'memoria': IndiceGrilla,
+}
+_indices = {}
+
+
+def obtener_indice(nombre=None):
+    """
+    Returns the shared instance of the configured spatial index backend.
+    """
+    nombre = nombre or getattr(settings, 'SPATIAL_INDEX_BACKEND', 'db')
+    if nombre not in _indices:
+        _indices[nombre] = INDICES_ESPACIALES[nombre]()
+    return _indices[nombre]
+
+
+def filtrar_inmuebles(inmuebles, filtro):
+    """
+    Restricts a property queryset to the given spatial filter using the configured spatial index.
+    """
+    return obtener_indice().filtrar(inmuebles, filtro)
+
+
+def calcular_cercanias(distancia_m=DISTANCIA_CERCANIA_M):
+    """
+    Derives the "nearby" booleans of every located property from the points of interest,
+    with one spatial UPDATE per category, then refreshes the feature store.
+    """
+    inmuebles = Inmueble.objects.filter(ubicacion__isnull=False)
+    for categoria, _ in PuntoInteres.CATEGORIA_CHOICES:
+        cercanos = PuntoInteres.objects.filter(
+            categoria=categoria,
+            ubicacion__dwithin=(OuterRef('ubicacion'), D(m=distancia_m)),
+        )
+        inmuebles.update(**{categoria: Exists(cercanos)})
+
+    # Queryset updates bypass the model signals
+    recalcular_caracteristicas(inmuebles)
+    cache_ranking.invalidar_catalogo()
@@ -0,0 +1,153 @@
+import csv
+import json
+import time
+from collections.abc import Mapping
+from django.contrib.gis.geos import Point
+from django.core.exceptions import ValidationError, NON_FIELD_ERRORS
+from django.db import DatabaseError, transaction
+from .models import Inmueble
+from .almacen import actualizar_caracteristicas
+from .busqueda import actualizar_vector_busqueda
+from . import cache_ranking
+
+# Property fields accepted from the API and the import files; lat/lng columns set the location
+CAMPOS = (
+    'nombre', 'direccion', 'descripcion', 'precio_base',
+    'metros_cuadrados', 'habitaciones', 'baños', 'estado_conservacion', 'amenidades',
+    'atractivos_turisticos', 'paradas_transporte_publico', 'establecimientos_comerciales',
+    'establecimientos_educativos', 'espacios_publicos',
+)
+CAMPOS_BOOLEANOS = {
+    'atractivos_turisticos', 'paradas_transporte_publico', 'establecimientos_comerciales',
+    'establecimientos_educativos', 'espacios_publicos',
+}
+VERDADEROS = {'true', 't', '1', 'si', 'sí', 'yes', 'y'}
+FALSOS = {'false', 'f', '0', 'no', 'n'}
+
+# Supported import formats
+FORMATOS = ('csv', 'jsonl')
+
+# Rows validated and inserted per transaction, and the largest batch a client may ask for
+TAMANO_LOTE = 500
+TAMANO_LOTE_MAXIMO = 5000
+
+# Per-row errors listed in a summary; the total count is always reported
+MAX_ERRORES_REPORTADOS = 1000
+
+
+def construir_inmueble(datos):
+    """
+    Builds and validates an unsaved Inmueble from one input row.
+    Raises ValidationError with the messages of every invalid field.
+    """
+    if not isinstance(datos, Mapping):
+        raise ValidationError({NON_FIELD_ERRORS: ['Row must be a JSON object.']})
+
+    campos = {}
+    for campo in CAMPOS:
+        valor = datos.get(campo)
+        if valor in (None, ''):
+            continue  # Missing optional fields take the model default; missing required ones fail full_clean
+        if campo in CAMPOS_BOOLEANOS and isinstance(valor, str):
+            texto = valor.strip().lower()
+            valor = True if texto in VERDADEROS else False if texto in FALSOS else valor
+        campos[campo] = valor
+    inmueble = Inmueble(**campos)
+
+    if datos.get('lat') not in (None, '') or datos.get('lng') not in (None, ''):
+        try:
+            lat, lng = float(datos.get('lat')), float(datos.get('lng'))
+        except (TypeError, ValueError):
+            raise ValidationError({'ubicacion': ['lat and lng must both be numbers.']})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({'ubicacion': ['lat/lng out of range.']})
+        inmueble.ubicacion = Point(lng, lat, srid=4326)
+
+    inmueble.full_clean()
+    return inmueble
+
+
+def leer_filas(lineas, formato):
+    """
+    Streams the rows of a CSV (with a header line) or JSONL text source as (line number, row) pairs.
+    Lines that are not valid JSON yield None, which fails validation like any other bad row.
+    """
+    if formato == 'csv':
+        lector = csv.DictReader(lineas)
+        for fila in lector:
+            yield lector.line_num, fila
+        return
+
+    for numero, linea in enumerate(lineas, start=1):
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except ValueError:
+            yield numero, None
+
+
+def importar(filas, tamano_lote=TAMANO_LOTE, arrendador=None):
+    """
+    Validates and inserts (line number, row) pairs in batches of `tamano_lote`, one transaction per batch,
+    as properties of `arrendador` (a landlord user, or None).
+    Invalid rows are skipped and reported; a batch the database rejects is retried row by row, so only the
+    offending rows are left out, each with its own error.
+    Returns a summary with the row, created and error counts, the per-row errors and the throughput.
+    """
+    inicio = time.perf_counter()
+    resumen = {'filas': 0, 'creados': 0, 'num_errores': 0, 'errores': []}
+
+    def registrar_error(numero, errores):
+        resumen['num_errores'] += 1
+        if len(resumen['errores']) < MAX_ERRORES_REPORTADOS:
+            resumen['errores'].append({'fila': numero, 'errores': errores})
+
+    lote = []
+    for numero, fila in filas:
+        resumen['filas'] += 1
+        try:
+            inmueble = construir_inmueble(fila)
+        except ValidationError as e:
+            registrar_error(numero, e.message_dict)
+        else:
+            inmueble.arrendador = arrendador
+            lote.append((numero, inmueble))
+        if len(lote) == tamano_lote:
+            _guardar_lote(lote, resumen, registrar_error)
+            lote = []
+    _guardar_lote(lote, resumen, registrar_error)
+
+    # One invalidation for the whole import instead of one per row
+    if resumen['creados']:
+        cache_ranking.invalidar_catalogo()
+
+    segundos = time.perf_counter() - inicio
+    resumen['segundos'] = round(segundos, 3)
+    resumen['filas_por_segundo'] = round(resumen['filas'] / segundos, 1) if segundos else None
+    return resumen
+
+
+def _guardar_lote(lote, resumen, registrar_error):
+    if not lote:
+        return
+    try:
+        resumen['creados'] += _insertar([inmueble for _, inmueble in lote])
+    except DatabaseError:
+        # One bad row rolls back the whole batch; the rows are retried one by one so each reports its own error
+        for numero, inmueble in lote:
+            inmueble.pk = None  # Set by the rolled-back insert
+            try:
+                resumen['creados'] += _insertar([inmueble])
+            except DatabaseError as e:
+                registrar_error(numero, {NON_FIELD_ERRORS: [str(e)]})
+
+
+def _insertar(inmuebles):
+    # Inserts the properties with their feature rows and search vectors in one transaction; returns how many
+    with transaction.atomic():
+        creados = Inmueble.objects.bulk_create(inmuebles, batch_size=len(inmuebles))
+        # bulk_create does not fire post_save, so the feature rows and search vectors are written here
+        actualizar_caracteristicas(creados)
+        actualizar_vector_busqueda(Inmueble.objects.filter(pk__in=[inmueble.pk for inmueble in creados]))
+    return len(creados)
@@ -0,0 +1,65 @@
+import json
+import statistics
+import time
+import environ
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from eth_account import Account
+from v1_app.firmante import Firmante
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+class Command(BaseCommand):
+    help = 'Measures the per-request signing overhead: re-reading credentials.env on every request versus the in-memory signer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=500, help='Transactions signed by each variant.')
+
+    def handle(self, *args, **options):
+        # A throwaway key keeps the benchmark runnable without real credentials
+        clave = settings.PRIVATE_KEY or Account.create().key.hex()
+        tx = {
+            'to': Account.create().address,
+            'value': 1,
+            'gas': 21000,
+            'gasPrice': 50 * 10 ** 9,
+            'nonce': 0,
+            'chainId': settings.BLOCKCHAIN_CHAIN_ID,
+        }
+
+        def por_peticion():
+            # What every request used to do: parse credentials.env, derive the account, sign
+            env = environ.Env()
+            environ.Env.read_env(env_file='credentials.env')
+            env('PRIVATE_KEY', default=None)
+            Account.from_key(clave).sign_transaction(tx)
+
+        firmante = Firmante(clave)
+
+        def en_memoria():
+            firmante.firmar(tx)
+
+        resultados = {
+            'por_peticion': self._medir(por_peticion, options['iteraciones']),
+            'en_memoria': self._medir(en_memoria, options['iteraciones']),
+        }
+        resultados['ahorro_ms_por_peticion'] = round(
+            resultados['por_peticion']['media_ms'] - resultados['en_memoria']['media_ms'], 3
+        )
+        self.stdout.write(json.dumps(resultados, indent=2))
+
+    def _medir(self, funcion, iteraciones):
+        tiempos = []
+        for _ in range(iteraciones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return {
+            'media_ms': round(statistics.mean(tiempos), 3),
+            'p50_ms': round(_percentil(tiempos, 50), 3),
+            'p99_ms': round(_percentil(tiempos, 99), 3),
+        }
@@ -0,0 +1,120 @@
+import json
+import random
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from v1_app.models import Inmueble, Puja, Subasta
+from v1_app.subastas import abrir_subasta, registrar_puja, subasta_actual, PujaInsuficiente
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] if ordenados else 0
+
+
+def _registrar_sin_bloqueo(inmueble, arrendatario, wallet, monto, moneda):
+    # Naive read-compare-write without locking, kept only as a baseline that exposes lost updates
+    subasta = abrir_subasta(inmueble, moneda)
+    if subasta.mejor_monto is not None and monto <= subasta.mejor_monto:
+        raise PujaInsuficiente(subasta.mejor_monto)
+    with transaction.atomic():
+        puja = Puja.objects.create(inmueble=inmueble, subasta=subasta, arrendatario=arrendatario, wallet_arrendatario=wallet, monto=monto, moneda=moneda)
+        Subasta.objects.filter(pk=subasta.pk).update(mejor_puja=puja, mejor_monto=monto)
+    return puja
+
+
+class Command(BaseCommand):
+    help = (
+        'Fires N concurrent bidders at one property and reports throughput, latency percentiles and lost updates. '
+        'No chain call is involved: the bids stay pending because no worker runs, and bid broadcasts go to the '
+        'in-memory channel layer. Runs only against the project database (PostgreSQL with PostGIS); the data is '
+        'removed at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pujadores', type=int, default=20, help='Concurrent bidder threads.')
+        parser.add_argument('--pujas', type=int, default=50, help='Bids placed by each bidder.')
+        parser.add_argument('--modo', choices=['bloqueo', 'sin_bloqueo'], default='bloqueo', help='Locked placement or the naive baseline.')
+        parser.add_argument('--semilla', type=int, default=0, help='Random seed for the bid amounts.')
+
+    def handle(self, *args, **options):
+        # Out of scope: SQLite ignores SELECT ... FOR UPDATE, so the locking under test would not exist there,
+        # and without PostGIS neither SQLite nor plain PostgreSQL can create Inmueble's geometry column
+        if not getattr(connection.ops, 'postgis', False):
+            raise CommandError('bench_pujas needs the PostgreSQL/PostGIS database; the configured one is '
+                               f'{connection.vendor}.')
+        # Accepted bids are broadcast on commit; the in-memory layer keeps Redis out of the measured latency
+        capas = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        with override_settings(CHANNEL_LAYERS=capas):
+            # The bidder threads use their own connections, so the data must be committed; it is deleted afterwards
+            inmueble = Inmueble.objects.create(
+                nombre='Benchmark de pujas', direccion='N/A', descripcion='', precio_base=Decimal('1000'),
+                metros_cuadrados=Decimal('50'), habitaciones=1, baños=1, estado_conservacion='bueno', amenidades='',
+            )
+            try:
+                reporte = self.medir(inmueble, options)
+            finally:
+                # Removes the auction and the bids with the property
+                inmueble.delete()
+        self.stdout.write(json.dumps(reporte, indent=2))
+
+    def medir(self, inmueble, options):
+        colocar = registrar_puja if options['modo'] == 'bloqueo' else _registrar_sin_bloqueo
+
+        latencias, aceptadas = [], []
+        contadores = {'rechazadas': 0, 'errores': 0}
+        lock = threading.Lock()
+
+        def pujador(indice):
+            rng = random.Random(options['semilla'] * 1000 + indice)
+            propias, tiempos, rechazos, fallos = [], [], 0, 0
+            try:
+                for _ in range(options['pujas']):
+                    monto = Decimal(rng.randint(1, 10 ** 7)) / 100
+                    inicio = time.perf_counter()
+                    try:
+                        colocar(inmueble, f'bench-{indice}', '', monto, 'COP')
+                        propias.append(monto)
+                    except PujaInsuficiente:
+                        rechazos += 1
+                    except Exception:
+                        fallos += 1
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connection.close()  # Each thread has its own connection
+            with lock:
+                latencias.extend(tiempos)
+                aceptadas.extend(propias)
+                contadores['rechazadas'] += rechazos
+                contadores['errores'] += fallos
+
+        hilos = [threading.Thread(target=pujador, args=(i,)) for i in range(options['pujadores'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        # A lost update is an accepted bid higher than the best bid the auction ended up recording
+        final = subasta_actual(inmueble.id).mejor_monto or Decimal(0)
+        perdidas = sum(1 for monto in aceptadas if monto > final)
+
+        return {
+            'modo': options['modo'],
+            'base_de_datos': connection.vendor,
+            'pujadores': options['pujadores'],
+            'pujas': len(latencias),
+            'aceptadas': len(aceptadas),
+            'rechazadas': contadores['rechazadas'],
+            'errores': contadores['errores'],
+            'pujas_por_segundo': round(len(latencias) / duracion, 1) if duracion else None,
+            'p50_ms': round(_percentil(latencias, 50), 3),
+            'p99_ms': round(_percentil(latencias, 99), 3),
+            'mejor_monto_final': str(final),
+            'mejor_monto_aceptado': str(max(aceptadas, default=Decimal(0))),
+            'actualizaciones_perdidas': perdidas,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from v1_app.consumers import AnalysisConsumer
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] if ordenados else 0
+
+
+def _con_usuario(aplicacion, usuario):
+    # Stands in for AuthMiddlewareStack: every connection is authenticated as the same user
+    async def envoltura(scope, receive, send):
+        return await aplicacion({**scope, 'user': usuario}, receive, send)
+    return envoltura
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures AnalysisConsumer fan-out on the in-memory channel layer: messages per second and delivery latency '
+        'as the number of connections grows. No Redis or ASGI server is involved, so it is an upper bound per worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexiones', default='100,1000,10000', help='Comma-separated connection counts to test.')
+        parser.add_argument('--emisores', type=int, default=5, help='Connections that send messages.')
+        parser.add_argument('--mensajes', type=int, default=10, help='Messages sent by each sender, within its burst allowance.')
+        parser.add_argument('--espera', type=float, default=30.0, help='Seconds to wait for deliveries before giving up.')
+
+    def handle(self, *args, **options):
+        capas = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 1000}}}
+        resultados = []
+        with override_settings(CHANNEL_LAYERS=capas):
+            for conexiones in (int(n) for n in options['conexiones'].split(',')):
+                resultados.append(asyncio.run(self.medir(conexiones, options)))
+        self.stdout.write(json.dumps(resultados, indent=2))
+
+    async def medir(self, conexiones, options):
+        aplicacion = _con_usuario(AnalysisConsumer.as_asgi(), SimpleNamespace(username='bench'))
+        clientes = [WebsocketCommunicator(aplicacion, '/ws/analysis/') for _ in range(conexiones)]
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente.connect() for cliente in clientes))
+        tiempo_conexion = time.perf_counter() - inicio
+
+        emisores = clientes[:min(options['emisores'], conexiones)]
+        enviados = len(emisores) * options['mensajes']
+        # 'analysis' messages go to one group only, so each one reaches every connection exactly once
+        esperadas = enviados * conexiones
+        latencias, contadores = [], {'entregas': 0, 'descartados': 0, 'tramas': 0}
+
+        async def leer(cliente):
+            limite = time.perf_counter() + options['espera']
+            recibidos = 0
+            while recibidos < enviados and time.perf_counter() < limite:
+                try:
+                    trama = json.loads(await cliente.receive_from(timeout=max(limite - time.perf_counter(), 0.01)))
+                except asyncio.TimeoutError:
+                    break
+                if 'error' in trama:
+                    continue
+                mensajes = trama['messages'] if 'messages' in trama else [trama['message']]
+                ahora = time.perf_counter()
+                latencias.extend(ahora - mensaje['t'] for mensaje in mensajes)
+                recibidos += len(mensajes) + trama.get('dropped', 0)
+                contadores['entregas'] += len(mensajes)
+                contadores['descartados'] += trama.get('dropped', 0)
+                contadores['tramas'] += 1
+
+        async def emitir(cliente):
+            for n in range(options['mensajes']):
+                await cliente.send_to(text_data=json.dumps({'type': 'analysis', 'message': {'t': time.perf_counter(), 'n': n}}))
+
+        lectores = [asyncio.ensure_future(leer(cliente)) for cliente in clientes]
+        inicio = time.perf_counter()
+        await asyncio.gather(*(emitir(cliente) for cliente in emisores))
+        await asyncio.gather(*lectores)
+        duracion = time.perf_counter() - inicio
+
+        await asyncio.gather(*(cliente.disconnect() for cliente in clientes))
+        return {
+            'conexiones': conexiones,
+            'conexion_s': round(tiempo_conexion, 3),
+            'mensajes_enviados': enviados,
+            'entregas_esperadas': esperadas,
+            'entregas': contadores['entregas'],
+            'descartados': contadores['descartados'],
+            'tramas': contadores['tramas'],
+            'entregas_por_segundo': round(contadores['entregas'] / duracion, 1) if duracion else None,
+            'p50_ms': round(_percentil(latencias, 50) * 1000, 3),
+            'p99_ms': round(_percentil(latencias, 99) * 1000, 3),
+        }
@@ -0,0 +1,289 @@
+import json
+import platform
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from v1_app import tasas, views
+from v1_app.almacen import recalcular_caracteristicas
+from v1_app.busqueda import actualizar_vector_busqueda
+from v1_app.models import CustomUser, Inmueble, ArrendatarioCriterios, Puja, Subasta
+from v1_app.preferencias import CRITERIOS_LIKERT
+from v1_app import cache_ranking
+
+# Prefix of the names of every synthetic row
+PREFIJO = 'bench'
+
+ESTADOS = ('nuevo', 'excelente', 'muy bueno', 'bueno', 'regular', 'malo')
+AMENIDADES = ('piscina', 'gimnasio', 'parqueadero', 'ascensor', 'balcón', 'terraza', 'vigilancia', 'bbq', 'jardín', 'lavandería')
+
+# Rows per INSERT while seeding
+TAMANO_LOTE = 2000
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))] if ordenados else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds synthetic users, properties, criteria and bids at a given scale and drives the matching, bidding and '
+        'payment views in-process, with fixed exchange rates and no chain calls. Prints throughput, latency percentiles '
+        'and queries per request as JSON. The data is rolled back at the end unless --conservar is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=1000, help='Number of properties (e.g. 1000, 10000, 100000).')
+        parser.add_argument('--arrendatarios', type=int, help='Number of tenants; defaults to 1 per 100 properties (at least 10).')
+        parser.add_argument('--criterios', type=int, default=200, help='Properties rated by each tenant.')
+        parser.add_argument('--subastas', type=int, default=1000, help='Closed auctions seeded for the payment view (at most half the properties).')
+        parser.add_argument('--iteraciones', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--calentamiento', type=int, default=20, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--semilla', type=int, default=0, help='Random seed of the data and the requests.')
+        parser.add_argument('--salida', help='Also write the JSON report to this file.')
+        parser.add_argument('--conservar', action='store_true', help='Commit the synthetic data instead of rolling it back.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        escala = options['escala']
+        num_arrendatarios = options['arrendatarios'] or max(10, escala // 100)
+
+        # Local stubs: fixed exchange rates, in-memory channel layer; no view in the suite calls the chain
+        cache_original = tasas._cache
+        tasas._cache = tasas.CacheTasas(tasas.FuenteFija(), ttl=settings.TASA_CAMBIO_TTL)
+        capas = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+        try:
+            with override_settings(CHANNEL_LAYERS=capas), transaction.atomic():
+                inicio = time.perf_counter()
+                datos = self.sembrar(rng, escala, num_arrendatarios, options)
+                tiempo_siembra = time.perf_counter() - inicio
+
+                resultados = {
+                    nombre: self.medir(peticion, options)
+                    for nombre, peticion in self.peticiones(rng, datos).items()
+                }
+                if not options['conservar']:
+                    transaction.set_rollback(True)
+        finally:
+            tasas._cache = cache_original
+
+        reporte = {
+            'escala': escala,
+            'arrendatarios': num_arrendatarios,
+            'criterios_por_arrendatario': min(options['criterios'], escala),
+            'subastas_cerradas': len(datos['ganadores']),
+            'semilla': options['semilla'],
+            'base_de_datos': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'siembra_s': round(tiempo_siembra, 3),
+            'endpoints': resultados,
+        }
+        salida = json.dumps(reporte, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida + '\n')
+        self.stdout.write(salida)
+
+    def sembrar(self, rng, escala, num_arrendatarios, options):
+        # Run tag, so the rows of a run kept with --conservar never collide with a later one
+        etiqueta = f'{PREFIJO}{time.time_ns()}'
+
+        # Properties; bulk_create skips the signals, so features and search vectors are derived afterwards
+        creados = Inmueble.objects.bulk_create(
+            [
+                Inmueble(
+                    nombre=f'{etiqueta} inmueble {i}',
+                    direccion=f'Calle {rng.randint(1, 200)} # {rng.randint(1, 99)}-{rng.randint(1, 99)}',
+                    descripcion='Inmueble sintético para benchmark',
+                    precio_base=Decimal(rng.randint(500, 10000)),
+                    metros_cuadrados=Decimal(rng.randint(25, 400)),
+                    habitaciones=rng.randint(1, 6),
+                    baños=rng.randint(1, 4),
+                    estado_conservacion=rng.choice(ESTADOS),
+                    amenidades=', '.join(rng.sample(AMENIDADES, rng.randint(0, len(AMENIDADES)))),
+                    atractivos_turisticos=rng.random() < 0.3,
+                    paradas_transporte_publico=rng.random() < 0.6,
+                    establecimientos_comerciales=rng.random() < 0.5,
+                    establecimientos_educativos=rng.random() < 0.4,
+                    espacios_publicos=rng.random() < 0.5,
+                )
+                for i in range(escala)
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+        ids = sorted(inmueble.pk for inmueble in creados)
+        inmuebles = Inmueble.objects.filter(nombre__startswith=f'{etiqueta} ')
+        recalcular_caracteristicas(inmuebles)
+        actualizar_vector_busqueda(inmuebles)
+        cache_ranking.invalidar_catalogo()
+
+        # Tenants with valid (lowercase hex) wallet addresses
+        arrendatarios = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    username=f'{etiqueta}_{i}',
+                    password='!',
+                    user_type='arrendatario',
+                    direccion_wallet='0x' + format(i + 1, '040x'),
+                )
+                for i in range(num_arrendatarios)
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+
+        # Each tenant rates a random sample of the catalog
+        por_arrendatario = min(options['criterios'], escala)
+        pares = []
+        filas = []
+        for arrendatario in arrendatarios:
+            for inmueble_id in rng.sample(ids, por_arrendatario):
+                pares.append((arrendatario.id, inmueble_id))
+                filas.append(ArrendatarioCriterios(
+                    arrendatario_id=arrendatario.id,
+                    inmueble_id=inmueble_id,
+                    **{criterio: rng.randint(1, 5) for criterio in CRITERIOS_LIKERT},
+                ))
+            if len(filas) >= TAMANO_LOTE:
+                ArrendatarioCriterios.objects.bulk_create(filas, batch_size=TAMANO_LOTE)
+                filas = []
+        ArrendatarioCriterios.objects.bulk_create(filas, batch_size=TAMANO_LOTE)
+
+        # Closed auctions with a winning bid, for the payment view
+        # At most half the catalog, so the bidding view always has properties without a closed auction
+        cerradas = ids[:min(options['subastas'], escala // 2)]
+        ganadores = {inmueble_id: rng.choice(arrendatarios) for inmueble_id in cerradas}
+        subastas = Subasta.objects.bulk_create(
+            [Subasta(inmueble_id=i, moneda='COP', cierre=timezone.now() - timedelta(hours=1), estado='cerrada') for i in cerradas],
+            batch_size=TAMANO_LOTE,
+        )
+        pujas = Puja.objects.bulk_create(
+            [
+                Puja(
+                    inmueble_id=subasta.inmueble_id,
+                    subasta=subasta,
+                    arrendatario=ganadores[subasta.inmueble_id].username,
+                    wallet_arrendatario=ganadores[subasta.inmueble_id].direccion_wallet,
+                    monto=Decimal(rng.randint(1000, 100000)),
+                    moneda='COP',
+                )
+                for subasta in subastas
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+        mejor = {puja.inmueble_id: puja for puja in pujas}
+        for subasta in subastas:
+            subasta.mejor_puja = mejor[subasta.inmueble_id]
+            subasta.mejor_monto = mejor[subasta.inmueble_id].monto
+        Subasta.objects.bulk_update(subastas, ['mejor_puja', 'mejor_monto'], batch_size=TAMANO_LOTE)
+
+        return {
+            'ids': ids,
+            'abiertos': ids[len(cerradas):],
+            'arrendatarios': arrendatarios,
+            'pares': pares,
+            'ganadores': ganadores,
+            'precio_mediano': sorted(inmueble.precio_base for inmueble in creados)[escala // 2],
+        }
+
+    def peticiones(self, rng, datos):
+        # Every entry builds one request: (view, request) with a random tenant and target
+        fabrica = APIRequestFactory()
+        arrendatarios = datos['arrendatarios']
+        por_id = {arrendatario.id: arrendatario for arrendatario in arrendatarios}
+        montos = {}
+
+        def autenticada(peticion, usuario):
+            force_authenticate(peticion, user=usuario)
+            return peticion
+
+        def rankeados():
+            usuario = rng.choice(arrendatarios)
+            return views.buscar_inmuebles_rankeados, autenticada(
+                fabrica.get('/inmuebles/rankeados/', {'arrendatario_id': usuario.id, 'limit': 20}), usuario
+            )
+
+        def rankeados_filtrado():
+            usuario = rng.choice(arrendatarios)
+            parametros = {'arrendatario_id': usuario.id, 'limit': 20, 'precio_max': str(datos['precio_mediano']), 'habitaciones_min': 2}
+            return views.buscar_inmuebles_rankeados, autenticada(fabrica.get('/inmuebles/rankeados/', parametros), usuario)
+
+        def calcular_score():
+            arrendatario_id, inmueble_id = rng.choice(datos['pares'])
+            return views.calcular_score, autenticada(
+                fabrica.post('/inmuebles/score/', {'arrendatario_id': arrendatario_id, 'inmueble_id': inmueble_id}, format='json'),
+                por_id[arrendatario_id],
+            )
+
+        def crear_puja():
+            # Strictly increasing amounts per property, so every bid beats the current best one
+            inmueble_id = rng.choice(datos['abiertos'])
+            montos[inmueble_id] = montos.get(inmueble_id, 1000) + 1
+            usuario = rng.choice(arrendatarios)
+            cuerpo = {'inmueble_id': inmueble_id, 'monto': str(montos[inmueble_id]), 'moneda': 'COP'}
+            return views.crear_puja, autenticada(fabrica.post('/pujas/', cuerpo, format='json'), usuario)
+
+        def procesar_pago():
+            inmueble_id, ganador = rng.choice(list(datos['ganadores'].items()))
+            cuerpo = {'inmueble_id': inmueble_id, 'arrendatario_id': ganador.id}
+            if rng.random() < 0.5:
+                cuerpo.update(metodo_pago='crypto', cripto=rng.choice(('AVAX', 'USDT')))
+            else:
+                cuerpo['metodo_pago'] = 'conventional'
+            return views.procesar_pago, autenticada(fabrica.post('/pagos/', cuerpo, format='json'), ganador)
+
+        return {
+            'buscar_inmuebles_rankeados': rankeados,
+            'buscar_inmuebles_rankeados_filtrado': rankeados_filtrado,
+            'calcular_score': calcular_score,
+            'crear_puja': crear_puja,
+            'procesar_pago': procesar_pago,
+        }
+
+    def medir(self, construir, options):
+        for _ in range(options['calentamiento']):
+            vista, peticion = construir()
+            with transaction.atomic():
+                vista(peticion).render()
+
+        latencias, consultas, estados, errores = [], [], {}, 0
+        inicio_total = time.perf_counter()
+        for _ in range(options['iteraciones']):
+            vista, peticion = construir()
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                try:
+                    # Savepoint per request, so a failing request does not break the enclosing transaction
+                    with transaction.atomic():
+                        respuesta = vista(peticion)
+                        respuesta.render()
+                    estado = respuesta.status_code
+                except Exception:
+                    estado = 'excepcion'
+                latencias.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            estados[str(estado)] = estados.get(str(estado), 0) + 1
+            if estado == 'excepcion' or estado >= 500:
+                errores += 1
+        duracion = time.perf_counter() - inicio_total
+
+        return {
+            'peticiones': len(latencias),
+            'estados': estados,
+            'errores': errores,
+            'peticiones_por_segundo': round(len(latencias) / duracion, 1) if duracion else None,
+            'p50_ms': round(_percentil(latencias, 50) * 1000, 3),
+            'p90_ms': round(_percentil(latencias, 90) * 1000, 3),
+            'p99_ms': round(_percentil(latencias, 99) * 1000, 3),
+            'max_ms': round(max(latencias, default=0) * 1000, 3),
+            'consultas_promedio': round(sum(consultas) / len(consultas), 2) if consultas else 0,
+        }
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from v1_app.geo import calcular_cercanias, DISTANCIA_CERCANIA_M
+
+
+class Command(BaseCommand):
+    help = 'Derives the "nearby" attributes of every located property from the points of interest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--distancia', type=float, default=DISTANCIA_CERCANIA_M, help='Distance in meters that counts as nearby.')
+
+    def handle(self, *args, **options):
+        calcular_cercanias(options['distancia'])
+        self.stdout.write(self.style.SUCCESS('Nearby attributes updated.'))
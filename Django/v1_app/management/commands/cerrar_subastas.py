@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from v1_app.subastas import cerrar_subastas_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Closes every auction past its closing time, in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=30.0, help='Seconds between passes.')
+        parser.add_argument('--una-vez', action='store_true', help='Run a single pass and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            cerradas = cerrar_subastas_vencidas()
+            if cerradas:
+                self.stdout.write(f'{cerradas} auctions closed.')
+            if options['una_vez']:
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,33 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from v1_app.models import CustomUser
+from v1_app.importacion import leer_filas, importar, FORMATOS, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Imports properties from a CSV (with header) or JSONL file in batches and reports throughput and per-row errors.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Path of the CSV or JSONL file.')
+        parser.add_argument('--formato', choices=FORMATOS, help='File format; guessed from the extension by default.')
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE, help='Rows validated and inserted per transaction.')
+        parser.add_argument('--arrendador', help='Username of the landlord who owns the imported properties.')
+
+    def handle(self, *args, **options):
+        if options['tamano_lote'] < 1:
+            raise CommandError('--tamano-lote must be positive.')
+        arrendador = None
+        if options['arrendador']:
+            try:
+                arrendador = CustomUser.objects.get(username=options['arrendador'], user_type='arrendador')
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"No landlord named {options['arrendador']}.")
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.json')) else 'csv')
+        try:
+            with open(options['archivo'], encoding='utf-8', newline='') as archivo:
+                resumen = importar(leer_filas(archivo, formato), options['tamano_lote'], arrendador)
+        except OSError as e:
+            raise CommandError(f"Could not read {options['archivo']}: {e}")
+        except UnicodeDecodeError:
+            raise CommandError('The file must be UTF-8 encoded.')
+        self.stdout.write(json.dumps(resumen, indent=2, ensure_ascii=False))
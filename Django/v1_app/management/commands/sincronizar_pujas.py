@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from v1_app.blockchain import sincronizar_eventos, pujas_sin_registro, BLOQUES_POR_CONSULTA, CONFIRMACIONES
+
+
+class Command(BaseCommand):
+    help = 'Mirrors the PujaRegistrada events of the Pujas contract into the local database, from the stored checkpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloques', type=int, default=BLOQUES_POR_CONSULTA, help='Blocks scanned per eth_getLogs call.')
+        parser.add_argument('--confirmaciones', type=int, default=CONFIRMACIONES, help='Blocks left behind the chain head.')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Seconds between syncs.')
+        parser.add_argument('--una-vez', action='store_true', help='Run a single sync and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            nuevas = sincronizar_eventos(options['bloques'], options['confirmaciones'])
+            if nuevas:
+                self.stdout.write(f'{nuevas} on-chain bids stored.')
+            if options['una_vez']:
+                faltantes = pujas_sin_registro().count()
+                if faltantes:
+                    self.stderr.write(f'{faltantes} confirmed bids have no on-chain event yet.')
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,57 @@
+import random
+from django.core.management.base import BaseCommand, CommandError
+from v1_app.geo import obtener_indice
+from v1_app.models import Inmueble, InmuebleCaracteristicas
+
+
+class Command(BaseCommand):
+    help = 'Runs random radius and bounding box searches on both spatial index backends and reports any mismatch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', type=int, default=200, help='Number of random searches of each kind.')
+        parser.add_argument('--semilla', type=int, default=0, help='Random seed, for reproducible runs.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        base_datos, memoria = obtener_indice('db'), obtener_indice('memoria')
+
+        puntos = list(
+            InmuebleCaracteristicas.objects
+            .filter(eliminado=False, longitud__isnull=False)
+            .values_list('inmueble_id', 'longitud', 'latitud')
+        )
+        if not puntos:
+            raise CommandError('No located properties to compare.')
+        lngs = [lng for _, lng, _ in puntos]
+        lats = [lat for _, _, lat in puntos]
+
+        errores = 0
+        for _ in range(options['consultas']):
+            # Radius search centered near a random property
+            _, lng, lat = rng.choice(puntos)
+            radio_m = rng.uniform(100, 20000)
+            filtro = ('radio', (lng + rng.uniform(-0.01, 0.01), lat + rng.uniform(-0.01, 0.01), radio_m))
+            errores += self._reportar(filtro, self._comparar(base_datos, memoria, filtro))
+
+            # Bounding box search inside the extent of the catalog
+            lng_a, lng_b = sorted(rng.uniform(min(lngs), max(lngs)) for _ in range(2))
+            lat_a, lat_b = sorted(rng.uniform(min(lats), max(lats)) for _ in range(2))
+            filtro = ('bbox', (lng_a, lat_a, lng_b, lat_b))
+            errores += self._reportar(filtro, self._comparar(base_datos, memoria, filtro))
+
+        if errores:
+            raise CommandError(f'{errores} searches returned different results.')
+        self.stdout.write(self.style.SUCCESS(f"{2 * options['consultas']} searches returned identical results."))
+
+    def _comparar(self, base_datos, memoria, filtro):
+        # Ids returned by only one of the two backends
+        todos = Inmueble.objects.all()
+        esperados = set(base_datos.filtrar(todos, filtro).values_list('id', flat=True))
+        obtenidos = set(memoria.buscar(filtro).tolist())
+        return esperados ^ obtenidos
+
+    def _reportar(self, filtro, diferencia):
+        if not diferencia:
+            return 0
+        self.stderr.write(f'{filtro}: {len(diferencia)} mismatched ids, e.g. {sorted(diferencia)[:10]}')
+        return 1
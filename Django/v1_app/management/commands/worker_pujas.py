@@ -0,0 +1,44 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from v1_app.blockchain import procesar_pujas, LOTE_MAXIMO, LOTES_POR_PASADA
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between passes while the node or the database keeps failing
+ESPERA_MAXIMA_ERROR = 60.0
+
+
+class Command(BaseCommand):
+    help = 'Registers pending bids on the blockchain and tracks their confirmation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_MAXIMO, help='Maximum number of bids registered per transaction.')
+        parser.add_argument('--lotes', type=int, default=LOTES_POR_PASADA, help='Maximum number of transactions submitted per pass.')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Seconds to wait when no batch is ready.')
+        parser.add_argument('--una-vez', action='store_true', help='Run a single pass and exit.')
+
+    def handle(self, *args, **options):
+        fallos = 0
+        while True:
+            try:
+                # A connection broken by a database restart is replaced instead of failing every later pass
+                close_old_connections()
+                enviadas = procesar_pujas(options['lote'], options['lotes'])
+            except Exception:
+                if options['una_vez']:
+                    raise
+                # Node or database unavailable: log, back off exponentially and keep the worker alive
+                fallos += 1
+                espera = min(options['intervalo'] * 2 ** fallos, ESPERA_MAXIMA_ERROR)
+                logger.exception("Bid worker pass failed (%s in a row), retrying in %.1fs", fallos, espera)
+                time.sleep(espera)
+                continue
+            fallos = 0
+            if enviadas:
+                self.stdout.write(f'{enviadas} bids submitted.')
+            if options['una_vez']:
+                return
+            if not enviadas:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,274 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.test.utils import CaptureQueriesContext
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request latency histogram buckets
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Measurements of the request being served by the current thread or task
+_peticion_actual = ContextVar('metricas_peticion', default=None)
+
+
+class MedicionPeticion:
+    """
+    Counters of a single request: SQL queries, database time and time spent in external services.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_externo = {}
+
+
+class RegistroMetricas:
+    """
+    Process-wide aggregates rendered in the Prometheus text format.
+    Every worker process keeps its own registry, so each one must be scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = {}  # (vista, metodo, estado) -> count
+        self.latencia = {}  # vista -> [bucket counts..., sum, count]
+        self.consultas = {}  # vista -> queries
+        self.tiempo_db = {}  # vista -> seconds
+        self.tiempo_externo = {}  # (vista, servicio) -> seconds
+        self.llamadas_externas = {}  # servicio -> [calls, seconds]
+        self.presupuesto_excedido = {}  # vista -> count
+
+    def registrar_peticion(self, vista, metodo, estado, duracion, medicion, excedido):
+        with self._lock:
+            clave = (vista, metodo, str(estado))
+            self.peticiones[clave] = self.peticiones.get(clave, 0) + 1
+
+            histograma = self.latencia.setdefault(vista, [0] * len(BUCKETS_LATENCIA) + [0.0, 0])
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+                if duracion <= limite:
+                    histograma[i] += 1
+            histograma[-2] += duracion
+            histograma[-1] += 1
+
+            self.consultas[vista] = self.consultas.get(vista, 0) + medicion.consultas
+            self.tiempo_db[vista] = self.tiempo_db.get(vista, 0.0) + medicion.tiempo_db
+            for servicio, segundos in medicion.tiempo_externo.items():
+                self.tiempo_externo[(vista, servicio)] = self.tiempo_externo.get((vista, servicio), 0.0) + segundos
+            if excedido:
+                self.presupuesto_excedido[vista] = self.presupuesto_excedido.get(vista, 0) + 1
+
+    def registrar_llamada(self, servicio, duracion):
+        with self._lock:
+            totales = self.llamadas_externas.setdefault(servicio, [0, 0.0])
+            totales[0] += 1
+            totales[1] += duracion
+
+    def formato_prometheus(self):
+        """
+        Renders every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            lineas = [
+                '# HELP homematch_peticiones_total HTTP requests served.',
+                '# TYPE homematch_peticiones_total counter',
+            ]
+            for (vista, metodo, estado), total in sorted(self.peticiones.items()):
+                lineas.append(f'homematch_peticiones_total{{vista="{vista}",metodo="{metodo}",estado="{estado}"}} {total}')
+
+            lineas += [
+                '# HELP homematch_peticion_segundos Request latency.',
+                '# TYPE homematch_peticion_segundos histogram',
+            ]
+            for vista, histograma in sorted(self.latencia.items()):
+                for limite, cuenta in zip(BUCKETS_LATENCIA, histograma):
+                    lineas.append(f'homematch_peticion_segundos_bucket{{vista="{vista}",le="{limite}"}} {cuenta}')
+                lineas.append(f'homematch_peticion_segundos_bucket{{vista="{vista}",le="+Inf"}} {histograma[-1]}')
+                lineas.append(f'homematch_peticion_segundos_sum{{vista="{vista}"}} {histograma[-2]}')
+                lineas.append(f'homematch_peticion_segundos_count{{vista="{vista}"}} {histograma[-1]}')
+
+            lineas += [
+                '# HELP homematch_consultas_sql_total SQL queries executed by requests.',
+                '# TYPE homematch_consultas_sql_total counter',
+            ]
+            lineas += [f'homematch_consultas_sql_total{{vista="{vista}"}} {total}' for vista, total in sorted(self.consultas.items())]
+
+            lineas += [
+                '# HELP homematch_db_segundos_total Time spent executing SQL queries.',
+                '# TYPE homematch_db_segundos_total counter',
+            ]
+            lineas += [f'homematch_db_segundos_total{{vista="{vista}"}} {total}' for vista, total in sorted(self.tiempo_db.items())]
+
+            lineas += [
+                '# HELP homematch_externo_segundos_total Time requests spent waiting on external services.',
+                '# TYPE homematch_externo_segundos_total counter',
+            ]
+            lineas += [
+                f'homematch_externo_segundos_total{{vista="{vista}",servicio="{servicio}"}} {total}'
+                for (vista, servicio), total in sorted(self.tiempo_externo.items())
+            ]
+
+            lineas += [
+                '# HELP homematch_llamadas_externas_total Calls to external services, including background ones.',
+                '# TYPE homematch_llamadas_externas_total counter',
+            ]
+            lineas += [f'homematch_llamadas_externas_total{{servicio="{servicio}"}} {llamadas}' for servicio, (llamadas, _) in sorted(self.llamadas_externas.items())]
+            lineas += [
+                '# HELP homematch_llamadas_externas_segundos_total Time spent in calls to external services.',
+                '# TYPE homematch_llamadas_externas_segundos_total counter',
+            ]
+            lineas += [f'homematch_llamadas_externas_segundos_total{{servicio="{servicio}"}} {segundos}' for servicio, (_, segundos) in sorted(self.llamadas_externas.items())]
+
+            lineas += [
+                '# HELP homematch_presupuesto_consultas_excedido_total Requests that exceeded their view query budget.',
+                '# TYPE homematch_presupuesto_consultas_excedido_total counter',
+            ]
+            lineas += [f'homematch_presupuesto_consultas_excedido_total{{vista="{vista}"}} {total}' for vista, total in sorted(self.presupuesto_excedido.items())]
+        return '\n'.join(lineas) + '\n'
+
+
+# Registry of this worker process
+registro = RegistroMetricas()
+
+
+@contextmanager
+def medir_externo(servicio):
+    """
+    Times a call to an external service (web3, coingecko) and charges it to the current request, if any.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        registro.registrar_llamada(servicio, duracion)
+        medicion = _peticion_actual.get()
+        if medicion is not None:
+            medicion.tiempo_externo[servicio] = medicion.tiempo_externo.get(servicio, 0.0) + duracion
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declares the most SQL queries a view may run per request; place it above @api_view.
+    `maximo` is a number, or a function of (request, response) for views whose query count grows with the payload.
+    The middleware counts every request over budget, and raises PresupuestoExcedido when
+    settings.METRICAS_PRESUPUESTO_ESTRICTO is set (as in tests).
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+class PresupuestoExcedido(AssertionError):
+    """
+    A view or block ran more SQL queries than its budget allows.
+    """
+
+
+@contextmanager
+def verificar_presupuesto(maximo, using='default'):
+    """
+    Test helper: fails with PresupuestoExcedido if the block runs more than `maximo` queries,
+    listing the queries that were executed.
+    """
+    with CaptureQueriesContext(connections[using]) as capturadas:
+        yield capturadas
+    if len(capturadas) > maximo:
+        detalle = '\n'.join(consulta['sql'] for consulta in capturadas.captured_queries)
+        raise PresupuestoExcedido(f'{len(capturadas)} queries executed, budget is {maximo}:\n{detalle}')
+
+
+def contar_consulta(execute, sql, params, many, context):
+    """
+    Execute wrapper charging every SQL query to the current request, if any.
+    It is installed once per database connection (see instalar_contador), so it also sees the queries
+    the async ORM runs in its worker thread, which inherits the request's context.
+    """
+    medicion = _peticion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.tiempo_db += time.perf_counter() - inicio
+
+
+def instalar_contador(conexion):
+    """
+    Adds the query counter to a database connection; connections are reused, so it is added only once.
+    It goes first in the list because connection.execute_wrapper() blocks pop the last wrapper on exit.
+    """
+    if contar_consulta not in conexion.execute_wrappers:
+        conexion.execute_wrappers.insert(0, contar_consulta)
+
+
+class MiddlewareMetricas:
+    """
+    Records per-request SQL query count, database time, external service time and total latency,
+    and checks the query budget declared by the view. Works in front of both sync and async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = MedicionPeticion()
+        token = _peticion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _peticion_actual.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, medicion)
+        return response
+
+    async def __acall__(self, request):
+        medicion = MedicionPeticion()
+        token = _peticion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _peticion_actual.reset(token)
+        self._registrar(request, response, time.perf_counter() - inicio, medicion)
+        return response
+
+    def _registrar(self, request, response, duracion, medicion):
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = (coincidencia.url_name or coincidencia.view_name) if coincidencia else 'sin_ruta'
+        presupuesto = getattr(coincidencia.func, 'presupuesto_consultas', None) if coincidencia else None
+        if callable(presupuesto):
+            presupuesto = presupuesto(request, response)
+        excedido = presupuesto is not None and medicion.consultas > presupuesto
+        registro.registrar_peticion(vista, request.method, response.status_code, duracion, medicion, excedido)
+
+        if excedido:
+            mensaje = f'{vista} ran {medicion.consultas} SQL queries, budget is {presupuesto}'
+            if getattr(settings, 'METRICAS_PRESUPUESTO_ESTRICTO', False):
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+
+
+def vista_metricas(request):
+    """
+    Exposes the metrics of this worker process in the Prometheus text format, to local scrapers only.
+    """
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICAS_IPS_PERMITIDAS', ('127.0.0.1', '::1')):
+        return HttpResponseForbidden()
+    return HttpResponse(registro.formato_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
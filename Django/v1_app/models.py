@@ -1,7 +1,10 @@
-from django.db import models
+from django.contrib.gis.db import models
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Cast
 
 # Extended user model to allow roles for landlord and tenant
 class CustomUser(AbstractUser):
@@ -33,19 +36,67 @@ class Inmueble(models.Model):
     baños = models.PositiveIntegerField()  # Number of bathrooms
     estado_conservacion = models.CharField(max_length=255)  # Conservation state
     amenidades = models.TextField()  # Amenities of the property
+
+    # Landlord who published the property; rent payments go to their wallet
+    arrendador = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='inmuebles')
     
     # Added value criteria
     atractivos_turisticos = models.BooleanField(default=False)  # Tourist attractions nearby
     paradas_transporte_publico = models.BooleanField(default=False)  # Public transport stops nearby
     establecimientos_comerciales = models.BooleanField(default=False)  # Commercial establishments nearby
     establecimientos_educativos = models.BooleanField(default=False)  # Educational institutions nearby
+    espacios_publicos = models.BooleanField(default=False)  # Public spaces nearby
+
+    # Location of the property (WGS84 longitude/latitude) with a spatial index for radius and bounding box searches
+    ubicacion = models.PointField(geography=True, srid=4326, null=True, blank=True)
 
     # Additional information
     fecha_publicacion = models.DateTimeField(auto_now_add=True)  # Date of publication
 
+    # Precomputed full-text vector of nombre, amenidades and descripcion, maintained by the post_save signal
+    vector_busqueda = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Composite indexes for the structured search filters (equality columns first, range column last)
+        indexes = [
+            models.Index(fields=['habitaciones', 'baños', 'precio_base'], name='inmueble_hab_ban_precio_idx'),
+            models.Index(fields=['precio_base', 'metros_cuadrados'], name='inmueble_precio_metros_idx'),
+            models.Index(fields=['fecha_publicacion', 'precio_base'], name='inmueble_fecha_precio_idx'),
+            GinIndex(fields=['vector_busqueda'], name='inmueble_vector_busqueda_idx'),
+            # Bounding box searches test the location as a plain lon/lat geometry (see geo.IndiceBaseDatos)
+            GistIndex(Cast('ubicacion', models.PointField(srid=4326)), name='inmueble_ubicacion_plana_idx'),
+        ]
+
     def __str__(self):
         return self.nombre  # Return the property name as string representation
 
+# Model to store points of interest used to derive the "nearby" attributes of properties
+class PuntoInteres(models.Model):
+    # Each category matches the boolean attribute of Inmueble it feeds
+    CATEGORIA_CHOICES = (
+        ('atractivos_turisticos', 'Tourist attraction'),
+        ('espacios_publicos', 'Public space'),
+        ('paradas_transporte_publico', 'Public transport stop'),
+        ('establecimientos_comerciales', 'Commercial establishment'),
+        ('establecimientos_educativos', 'Educational institution'),
+    )
+    nombre = models.CharField(max_length=255)  # Name of the place
+    categoria = models.CharField(max_length=40, choices=CATEGORIA_CHOICES, db_index=True)  # Category of the place
+    ubicacion = models.PointField(geography=True, srid=4326)  # Location of the place (spatially indexed)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.categoria})"  # Return name and category as string representation
+
+# Compact feature table: one fixed-width row per property, kept in sync by the post_save/post_delete signals
+class InmuebleCaracteristicas(models.Model):
+    # Plain id instead of a foreign key so the deletion tombstone outlives the property
+    inmueble_id = models.BigIntegerField(primary_key=True)
+    vector = models.BinaryField()  # Normalized feature vector (10 packed float32 values)
+    longitud = models.FloatField(null=True)  # Copy of the property location for the in-memory spatial index
+    latitud = models.FloatField(null=True)
+    eliminado = models.BooleanField(default=False)  # Tombstone set when the property is deleted
+    actualizado = models.DateTimeField(db_index=True)  # Watermark used for incremental refresh
+
 # Model to store criteria selected by the tenant using a Likert scale (1-5)
 class ArrendatarioCriterios(models.Model):
     arrendatario = models.ForeignKey(CustomUser, on_delete=models.CASCADE)  # Tenant (foreign key to CustomUser)
@@ -64,11 +115,29 @@ class ArrendatarioCriterios(models.Model):
     paradas_transporte_publico = models.IntegerField()  # Public transport stops rating
     establecimientos_comerciales = models.IntegerField()  # Commercial establishments rating
     establecimientos_educativos = models.IntegerField()  # Educational institutions rating
-    
+
+    class Meta:
+        # One criteria row per tenant and property; also the conflict target of the bulk upsert
+        constraints = [
+            models.UniqueConstraint(fields=['arrendatario', 'inmueble'], name='criterios_arrendatario_inmueble_uniq'),
+        ]
+
+# Default preferences of a tenant, applied to every property without its own ArrendatarioCriterios row
+class PerfilPreferencias(models.Model):
+    arrendatario = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='perfil_preferencias')  # Tenant
+    likert = models.PositiveIntegerField()  # The 10 Likert ratings (1-5) packed 3 bits each, in CARACTERISTICAS order
+    actualizado = models.DateTimeField(auto_now=True)  # Last change of the profile
+
+    def __str__(self):
+        return f"Preferences of {self.arrendatario}"
+
 # Model to store property images
 class InmuebleFoto(models.Model):
     inmueble = models.ForeignKey(Inmueble, related_name='fotos', on_delete=models.CASCADE)  # Property (foreign key to Inmueble)
     imagen = models.ImageField(upload_to='inmuebles_fotos/')  # Image field to upload photos
+    hash_contenido = models.CharField(max_length=64, blank=True, default='', db_index=True)  # SHA-256 of the original; equal uploads share one file
+    miniatura = models.ImageField(upload_to='inmuebles_fotos/miniaturas/', blank=True)  # Thumbnail rendition, built in the background
+    mediana = models.ImageField(upload_to='inmuebles_fotos/medianas/', blank=True)  # Medium rendition for listing pages, built in the background
 
     def __str__(self):
         return f"Photo of {self.inmueble.direccion}"  # Return the property's address as string representation of the image
@@ -80,10 +149,91 @@ class Puja(models.Model):
     monto = models.DecimalField(max_digits=10, decimal_places=2)  # Bid amount
     moneda = models.CharField(max_length=3, choices=[('USD', 'Dollars'), ('COP', 'Colombian Pesos')], default='COP')  # Currency (default is COP)
     fecha_puja = models.DateTimeField(auto_now_add=True)  # Date of the bid
+
+    # Blockchain registration, done in the background by the bid worker
+    ESTADO_CHOICES = (
+        ('pendiente', 'Pending'),
+        ('enviando', 'Submitting'),
+        ('enviada', 'Submitted'),
+        ('confirmada', 'Confirmed'),
+        ('fallida', 'Failed'),
+    )
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente', db_index=True)  # Registration state
+    wallet_arrendatario = models.CharField(max_length=255, blank=True, default='')  # Tenant's wallet address at bid time
+    tx_hash = models.CharField(max_length=66, null=True, blank=True)  # Hash of the registration transaction
+    error = models.TextField(blank=True, default='')  # Last submission error, if any
+    intentos = models.PositiveIntegerField(default=0)  # Failed submission attempts; the bid fails after PUJAS_MAX_INTENTOS
+    actualizado = models.DateTimeField(auto_now=True)  # Last state change
+    subasta = models.ForeignKey('Subasta', on_delete=models.CASCADE, null=True, blank=True, related_name='pujas')  # Auction the bid was placed in
     
-    # Define bid closing time after 12 hours
+    # Closing time of the auction this bid belongs to; bids older than auctions keep the 12-hour rule.
+    # Use select_related('subasta') when calling it over a list of bids
     def cierre_puja(self):
-        return self.fecha_puja + timedelta(hours=12)  # Bid closes 12 hours after placement
+        if self.subasta_id is not None:
+            return self.subasta.cierre
+        return self.fecha_puja + timedelta(hours=12)
     
     def __str__(self):
         return f"Bid by {self.arrendatario} for {self.monto} {self.moneda} on {self.inmueble}"  # Return a formatted string describing the bid
+
+# Auction of a property: explicit closing time and the current best bid, maintained on every insert.
+# A property can be auctioned again once its last auction has closed; the newest one is its current auction
+class Subasta(models.Model):
+    ESTADO_CHOICES = (
+        ('abierta', 'Open'),
+        ('cerrada', 'Closed'),
+    )
+    inmueble = models.ForeignKey(Inmueble, on_delete=models.CASCADE, related_name='subastas')  # Property being auctioned
+    moneda = models.CharField(max_length=3, choices=[('USD', 'Dollars'), ('COP', 'Colombian Pesos')], default='COP')  # Currency of every bid
+    apertura = models.DateTimeField(auto_now_add=True)  # Opening time
+    cierre = models.DateTimeField()  # Closing time
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='abierta')  # Auction state
+    mejor_puja = models.ForeignKey(Puja, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')  # Current best bid
+    mejor_monto = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # Amount of the best bid
+
+    class Meta:
+        get_latest_by = ['apertura', 'id']
+        # The scheduler closes auctions by (estado, cierre); a property's current auction is its newest one
+        indexes = [
+            models.Index(fields=['estado', 'cierre'], name='subasta_estado_cierre_idx'),
+            models.Index(fields=['inmueble', '-apertura', '-id'], name='subasta_inmueble_reciente_idx'),
+        ]
+        # At most one open auction per property
+        constraints = [
+            models.UniqueConstraint(fields=['inmueble'], condition=models.Q(estado='abierta'), name='subasta_abierta_unica'),
+        ]
+
+    def esta_abierta(self):
+        return self.estado == 'abierta' and self.cierre > timezone.now()  # Past its closing time counts as closed
+
+    def __str__(self):
+        return f"Auction of {self.inmueble} ({self.estado})"
+
+# Local mirror of the PujaRegistrada events emitted by the Pujas contract
+class PujaCadena(models.Model):
+    contrato = models.CharField(max_length=42)  # Address of the contract that emitted the event
+    indice = models.BigIntegerField()  # Position of the bid in that contract's array
+    arrendatario = models.CharField(max_length=42, db_index=True)  # Tenant's wallet address
+    monto = models.DecimalField(max_digits=78, decimal_places=0)  # Amount as stored on chain (uint256)
+    moneda = models.CharField(max_length=10)  # Currency
+    tx_hash = models.CharField(max_length=66, db_index=True)  # Transaction that registered the bid
+    bloque = models.BigIntegerField(db_index=True)  # Block number of the event
+    indice_log = models.PositiveIntegerField()  # Position of the event inside its block
+
+    class Meta:
+        # Indices restart at 0 in every deployment of the contract
+        constraints = [
+            models.UniqueConstraint(fields=['contrato', 'indice'], name='puja_cadena_contrato_indice_uniq'),
+        ]
+
+    def __str__(self):
+        return f"On-chain bid #{self.indice} by {self.arrendatario} for {self.monto} {self.moneda}"
+
+# Last block scanned by the event sync, per contract
+class SincronizacionCadena(models.Model):
+    contrato = models.CharField(max_length=42, unique=True)  # Contract address
+    ultimo_bloque = models.BigIntegerField()  # Last block whose events are stored locally
+    actualizado = models.DateTimeField(auto_now=True)  # Time of the last sync
+
+    def __str__(self):
+        return f"{self.contrato} synced up to block {self.ultimo_bloque}"
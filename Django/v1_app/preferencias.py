@@ -0,0 +1,98 @@
+import numpy as np
+from django.db import transaction
+from .models import Inmueble, ArrendatarioCriterios, PerfilPreferencias
+from .caracteristicas import CARACTERISTICAS, NUM_CARACTERISTICAS
+from . import cache_ranking
+
+# Likert columns of ArrendatarioCriterios, aligned with the property feature vector
+CRITERIOS_LIKERT = CARACTERISTICAS
+
+# Bounds of the Likert scale
+LIKERT_MIN = 1
+LIKERT_MAX = 5
+
+# Bits used by each rating in a packed profile; 10 ratings take 30 bits
+BITS_LIKERT = 3
+MASCARA_LIKERT = (1 << BITS_LIKERT) - 1
+
+# Criteria rows written per INSERT by the bulk upsert, and the most accepted per request
+TAMANO_LOTE_CRITERIOS = 1000
+MAX_CRITERIOS = 50000
+
+
+def empaquetar_likert(valores):
+    """
+    Packs the 10 ratings (CARACTERISTICAS order) into one integer, 3 bits each.
+    """
+    return sum(int(valor) << (BITS_LIKERT * i) for i, valor in enumerate(valores))
+
+
+def desempaquetar_likert(entero):
+    """
+    Unpacks a profile integer into its float32 weight vector.
+    """
+    return np.array(
+        [(entero >> (BITS_LIKERT * i)) & MASCARA_LIKERT for i in range(NUM_CARACTERISTICAS)],
+        dtype=np.float32,
+    )
+
+
+def leer_likert(datos):
+    """
+    Reads the 10 ratings of a request object in CARACTERISTICAS order.
+    Raises ValueError naming the first missing or out-of-range rating.
+    """
+    valores = []
+    for criterio in CRITERIOS_LIKERT:
+        valor = datos.get(criterio)
+        if isinstance(valor, bool) or not isinstance(valor, (int, str)) or not str(valor).isdigit():
+            raise ValueError(f"{criterio} must be an integer between {LIKERT_MIN} and {LIKERT_MAX}.")
+        valor = int(valor)
+        if not LIKERT_MIN <= valor <= LIKERT_MAX:
+            raise ValueError(f"{criterio} must be an integer between {LIKERT_MIN} and {LIKERT_MAX}.")
+        valores.append(valor)
+    return valores
+
+
+def cargar_perfil(arrendatario_id):
+    """
+    Returns the tenant's default weight vector, or None if they have no profile.
+    """
+    likert = PerfilPreferencias.objects.filter(arrendatario_id=arrendatario_id).values_list('likert', flat=True).first()
+    return None if likert is None else desempaquetar_likert(likert)
+
+
+def guardar_criterios(arrendatario_id, perfil=None, criterios=(), eliminar=()):
+    """
+    Stores a tenant's preferences in one transaction: the default profile (list of 10 ratings), the per-property
+    overrides as {inmueble_id: ratings} upserted in batches, and the ids of overrides to delete.
+    Raises ValueError if an override names an unknown property. Returns the number of overrides written.
+    """
+    existentes = set(Inmueble.objects.filter(id__in=list(criterios)).values_list('id', flat=True))
+    desconocidos = set(criterios) - existentes
+    if desconocidos:
+        raise ValueError(f"Unknown properties: {sorted(desconocidos)[:10]}")
+
+    with transaction.atomic():
+        if perfil is not None:
+            PerfilPreferencias.objects.update_or_create(
+                arrendatario_id=arrendatario_id, defaults={'likert': empaquetar_likert(perfil)}
+            )
+        if criterios:
+            # One INSERT ... ON CONFLICT per batch instead of a read and a write per property
+            ArrendatarioCriterios.objects.bulk_create(
+                [
+                    ArrendatarioCriterios(arrendatario_id=arrendatario_id, inmueble_id=inmueble_id, **dict(zip(CRITERIOS_LIKERT, valores)))
+                    for inmueble_id, valores in criterios.items()
+                ],
+                batch_size=TAMANO_LOTE_CRITERIOS,
+                update_conflicts=True,
+                unique_fields=['arrendatario', 'inmueble'],
+                update_fields=list(CRITERIOS_LIKERT),
+            )
+        if eliminar:
+            ArrendatarioCriterios.objects.filter(arrendatario_id=arrendatario_id, inmueble_id__in=list(eliminar)).delete()
+
+    # bulk_create does not fire post_save, so the cached ranking is dropped here
+    cache_ranking.invalidar_arrendatario(arrendatario_id)
+    return len(criterios)
@@ -0,0 +1,215 @@
+import base64
+import numpy as np
+from .models import Inmueble, ArrendatarioCriterios
+from .caracteristicas import NUM_CARACTERISTICAS
+from .almacen import almacen
+from .preferencias import cargar_perfil, CRITERIOS_LIKERT, LIKERT_MAX
+from . import cache_ranking
+
+# Share of the final score given to text relevance when a text query is present
+PESO_TEXTO = 0.4
+
+# Page size used when the client does not send a limit, and the largest page allowed
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+
+def cargar_criterios(criterios):
+    """
+    Loads the given criteria rows in a single query and reads the matching rows of the feature store.
+    Returns the property ids (ascending), the (n, 10) Likert weight matrix and the (n, 10) feature matrix.
+    """
+    filas = list(
+        criterios
+        .order_by('inmueble_id')
+        .values_list('inmueble_id', *CRITERIOS_LIKERT)
+    )
+    if not filas:
+        vacia = np.empty((0, NUM_CARACTERISTICAS), dtype=np.float32)
+        return np.empty(0, dtype=np.int64), vacia, vacia
+
+    ids = np.fromiter((fila[0] for fila in filas), dtype=np.int64, count=len(filas))
+    pesos = np.array([fila[1:] for fila in filas], dtype=np.float32)
+
+    # Feature rows come from the contiguous in-process buffer; properties not in the table contribute no features
+    caracteristicas = almacen.obtener(ids)
+    return ids, pesos, caracteristicas
+
+
+def calcular_scores(pesos, caracteristicas):
+    """
+    Scores every row in one vectorized pass: the dot product of the tenant's Likert weights with the
+    property's normalized features, divided by the total weight and scaled back to the 1-5 range.
+    """
+    if pesos.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    total_pesos = np.maximum(pesos.sum(axis=1), 1.0)
+    return LIKERT_MAX * np.einsum('ij,ij->i', pesos, caracteristicas) / total_pesos
+
+
+def codificar_cursor(score, inmueble_id):
+    """
+    Encodes the position of the last returned result as an opaque cursor.
+    """
+    return base64.urlsafe_b64encode(f'{score!r}:{inmueble_id}'.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """
+    Decodes a cursor into its (score, inmueble_id) pair. Raises ValueError if it is malformed.
+    """
+    try:
+        score, inmueble_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return float(score), int(inmueble_id)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def seleccionar_top_k(ids, scores, limite, despues_de=None):
+    """
+    Returns the row indexes of the next `limite` results in (score desc, id asc) order.
+    Uses a partial selection (np.partition) instead of sorting the whole catalog; only the page itself is sorted.
+    Rows with equal scores must appear in ascending id order, as returned by cargar_criterios or by the cache.
+    """
+    candidatos = np.arange(len(ids))
+    if despues_de is not None:
+        # Keyset condition: strictly after the cursor in the ranking order
+        score_cursor, id_cursor = np.float32(despues_de[0]), despues_de[1]
+        candidatos = np.flatnonzero((scores < score_cursor) | ((scores == score_cursor) & (ids > id_cursor)))
+
+    if limite < len(candidatos):
+        valores = scores[candidatos]
+        # Score of the k-th best candidate; everything above it is in, ties on it are taken in id order
+        umbral = -np.partition(-valores, limite - 1)[limite - 1]
+        mayores = candidatos[valores > umbral]
+        iguales = candidatos[valores == umbral]
+        candidatos = np.concatenate([mayores, iguales[:limite - len(mayores)]])
+
+    orden = np.lexsort((ids[candidatos], -scores[candidatos]))
+    return candidatos[orden]
+
+
+def calcular_scores_perfil(perfil, caracteristicas):
+    """
+    Scores many properties against a single weight vector: one matrix-vector product over the feature rows.
+    """
+    return (LIKERT_MAX * (caracteristicas @ perfil) / max(float(perfil.sum()), 1.0)).astype(np.float32)
+
+
+def puntuar_arrendatario(arrendatario_id, inmuebles=None):
+    """
+    Scores the tenant's properties, optionally restricted to a property queryset. Returns the ids (ascending) and scores.
+    Properties with a criteria row use it; with a preference profile, every other property of the catalog
+    is scored with the profile, otherwise only the properties with criteria rows are ranked.
+    """
+    # The feature store is checked against its table once here, not on every read below
+    almacen.refrescar()
+    criterios = ArrendatarioCriterios.objects.filter(arrendatario_id=arrendatario_id)
+    if inmuebles is not None:
+        criterios = criterios.filter(inmueble__in=inmuebles.values('id'))
+    ids, pesos, caracteristicas = cargar_criterios(criterios)
+    scores = calcular_scores(pesos, caracteristicas)
+
+    perfil = cargar_perfil(arrendatario_id)
+    if perfil is None:
+        return ids, scores
+
+    if inmuebles is None:
+        ids_catalogo, matriz = almacen.todos()
+    else:
+        ids_catalogo = np.fromiter(inmuebles.order_by('id').values_list('id', flat=True), dtype=np.int64)
+        matriz = almacen.obtener(ids_catalogo)
+    sin_criterios = ~np.isin(ids_catalogo, ids)
+    scores_perfil = calcular_scores_perfil(perfil, matriz[sin_criterios])
+
+    todos_ids = np.concatenate([ids, ids_catalogo[sin_criterios]])
+    orden = np.argsort(todos_ids, kind='stable')
+    return todos_ids[orden], np.concatenate([scores, scores_perfil])[orden]
+
+
+def combinar_relevancia(ids, scores, relevancia):
+    """
+    Blends the Likert match score with text relevance (normalized to the best match) on the same 1-5 scale.
+    `relevancia` maps an array of property ids to their text relevance, and is only asked for the scored ids.
+    """
+    texto = np.asarray(relevancia(ids), dtype=np.float32)
+    if len(texto) and texto.max() > 0:
+        texto /= texto.max()
+    return ((1 - PESO_TEXTO) * scores + PESO_TEXTO * LIKERT_MAX * texto).astype(np.float32)
+
+
+def rankear_inmuebles(arrendatario_id, limite=LIMITE_POR_DEFECTO, despues_de=None, inmuebles=None, relevancia=None):
+    """
+    Returns one page of the tenant's rated properties sorted by matching score (highest first),
+    plus the cursor of the next page (None on the last page).
+    `despues_de` is the decoded (score, inmueble_id) cursor of the previous page's last result.
+    `inmuebles` is an optional prefiltered queryset; the candidate set is cut in the database before scoring.
+    `relevancia` optionally maps an array of property ids to their text relevance, which is blended into the score.
+    Properties without a criteria row for this tenant are scored with their preference profile, or left out without one.
+    """
+    if inmuebles is not None:
+        # Prefiltered searches are small and vary per request, so they bypass the cache
+        ids, scores = puntuar_arrendatario(arrendatario_id, inmuebles)
+        if relevancia is not None:
+            scores = combinar_relevancia(ids, scores, relevancia)
+        return _pagina(ids, scores, seleccionar_top_k(ids, scores, limite, despues_de), limite)
+
+    # Serve the page from the tenant's cached top results when they cover it
+    clave = cache_ranking.clave(arrendatario_id)
+    cacheado = cache_ranking.obtener(clave)
+    if cacheado is not None:
+        ids, scores, completo = cacheado
+        pagina = seleccionar_top_k(ids, scores, limite, despues_de)
+        if len(pagina) < limite and not completo:
+            cacheado = None
+
+    if cacheado is None:
+        ids, scores = puntuar_arrendatario(arrendatario_id)
+        mejores = seleccionar_top_k(ids, scores, cache_ranking.TOP_N)
+        cache_ranking.guardar(clave, ids[mejores], scores[mejores], completo=len(mejores) == len(ids))
+        pagina = seleccionar_top_k(ids, scores, limite, despues_de)
+
+    return _pagina(ids, scores, pagina, limite)
+
+
+def _pagina(ids, scores, pagina, limite):
+    # Only the properties on this page are read from the catalog
+    datos = {
+        inmueble_id: (nombre, direccion)
+        for inmueble_id, nombre, direccion
+        in Inmueble.objects.filter(id__in=ids[pagina].tolist()).values_list('id', 'nombre', 'direccion')
+    }
+    resultados = [
+        {
+            'inmueble_id': int(ids[i]),
+            'inmueble': datos[int(ids[i])][0],
+            'direccion': datos[int(ids[i])][1],
+            'score': float(scores[i]),
+        }
+        for i in pagina
+        if int(ids[i]) in datos
+    ]
+
+    siguiente_cursor = None
+    if len(pagina) == limite and len(pagina) > 0:
+        ultimo = pagina[-1]
+        siguiente_cursor = codificar_cursor(float(scores[ultimo]), int(ids[ultimo]))
+    return resultados, siguiente_cursor
+
+
+def calcular_score_inmueble(arrendatario_id, inmueble_id):
+    """
+    Scores a single tenant/property pair through the same code path as the ranking.
+    Returns None when the tenant has neither criteria for the property nor a preference profile.
+    """
+    almacen.refrescar()
+    _, pesos, caracteristicas = cargar_criterios(
+        ArrendatarioCriterios.objects.filter(arrendatario_id=arrendatario_id, inmueble_id=inmueble_id)
+    )
+    if pesos.shape[0] > 0:
+        return float(calcular_scores(pesos, caracteristicas)[0])
+
+    perfil = cargar_perfil(arrendatario_id)
+    if perfil is None or not Inmueble.objects.filter(pk=inmueble_id).exists():
+        return None
+    return float(calcular_scores_perfil(perfil, almacen.obtener([inmueble_id]))[0])
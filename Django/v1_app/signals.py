@@ -0,0 +1,43 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .models import Inmueble, ArrendatarioCriterios, PerfilPreferencias, Puja
+from .almacen import actualizar_caracteristicas, eliminar_caracteristicas
+from .busqueda import actualizar_vector_busqueda
+from .difusion import publicar_puja
+from .metricas import instalar_contador
+from . import cache_ranking
+
+# Count the SQL queries of every request on each new database connection
+@receiver(connection_created)
+def conexion_creada(sender, connection, **kwargs):
+    instalar_contador(connection)
+
+# Refresh the stored feature and search vectors whenever a property is created or edited
+@receiver(post_save, sender=Inmueble)
+def inmueble_guardado(sender, instance, **kwargs):
+    actualizar_caracteristicas([instance])
+    # Queryset update, so it does not fire post_save again
+    actualizar_vector_busqueda(Inmueble.objects.filter(pk=instance.pk))
+    cache_ranking.invalidar_catalogo()
+
+# Leave a tombstone in the feature table when a property is deleted
+@receiver(post_delete, sender=Inmueble)
+def inmueble_eliminado(sender, instance, **kwargs):
+    eliminar_caracteristicas([instance.pk])
+    cache_ranking.invalidar_catalogo()
+
+# A tenant's ranking changes whenever one of their criteria rows or their preference profile changes
+@receiver(post_save, sender=ArrendatarioCriterios)
+@receiver(post_delete, sender=ArrendatarioCriterios)
+@receiver(post_save, sender=PerfilPreferencias)
+@receiver(post_delete, sender=PerfilPreferencias)
+def criterios_modificados(sender, instance, **kwargs):
+    cache_ranking.invalidar_arrendatario(instance.arrendatario_id)
+
+# Broadcast new bids to their property's subscribers once committed; a channel layer outage must not fail the bid
+@receiver(post_save, sender=Puja)
+def puja_creada(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publicar_puja(instance), robust=True)
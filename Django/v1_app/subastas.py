@@ -0,0 +1,175 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .models import Puja, Subasta
+
+# An auction closes this long after it is opened by its first bid
+DURACION_SUBASTA = timedelta(hours=12)
+
+
+class SubastaCerrada(Exception):
+    """
+    The auction of the property is closed, so it no longer accepts bids.
+    """
+
+
+class SubastaAbierta(Exception):
+    """
+    The auction of the property has not closed yet, so it has no winner.
+    """
+
+
+class PujaInsuficiente(Exception):
+    """
+    The bid does not beat the auction's current best bid.
+    """
+
+    def __init__(self, mejor_monto):
+        super().__init__(mejor_monto)
+        self.mejor_monto = mejor_monto
+
+
+class MonedaInvalida(Exception):
+    """
+    The bid's currency differs from the currency of the auction.
+    """
+
+
+def validar_puja(monto, moneda):
+    """
+    Checks a bid's input against the Puja columns before anything is written: a finite, positive amount that fits
+    the column's digits and decimal places, and one of the currency choices (the first bid also fixes the auction's).
+    Returns the amount as a Decimal; raises ValidationError with the messages of every invalid field.
+    """
+    errores = {}
+    try:
+        monto = Decimal(str(monto))
+    except InvalidOperation:
+        errores['monto'] = ['monto must be a number.']
+    else:
+        if not monto.is_finite():
+            errores['monto'] = ['monto must be a finite number.']
+        elif monto <= 0:
+            errores['monto'] = ['monto must be positive.']
+        else:
+            try:
+                Puja._meta.get_field('monto').run_validators(monto)
+            except ValidationError as e:
+                errores['monto'] = e.messages
+    try:
+        Puja._meta.get_field('moneda').clean(moneda, None)
+    except ValidationError as e:
+        errores['moneda'] = e.messages
+    if errores:
+        raise ValidationError(errores)
+    return monto
+
+
+def subasta_actual(inmueble_id):
+    """
+    Newest auction of a property, i.e. its current one. Raises Subasta.DoesNotExist if it was never auctioned.
+    """
+    return Subasta.objects.filter(inmueble_id=inmueble_id).latest()
+
+
+def abrir_subasta(inmueble, moneda):
+    """
+    Returns the current auction of a property, opening its first one if this is its first bid.
+    """
+    try:
+        return subasta_actual(inmueble.id)
+    except Subasta.DoesNotExist:
+        # Concurrent first bids collide on the one-open-auction constraint and all get the same row
+        subasta, _ = Subasta.objects.get_or_create(
+            inmueble=inmueble,
+            estado='abierta',
+            defaults={'cierre': timezone.now() + DURACION_SUBASTA, 'moneda': moneda},
+        )
+        return subasta
+
+
+def reabrir_subasta(inmueble, moneda, duracion=DURACION_SUBASTA):
+    """
+    Opens a new auction for a property whose current auction has closed; earlier auctions and their bids are kept.
+    Raises SubastaAbierta if the current auction still accepts bids. Returns the new Subasta.
+    """
+    with transaction.atomic():
+        try:
+            anterior = Subasta.objects.select_for_update().filter(inmueble=inmueble).latest()
+        except Subasta.DoesNotExist:
+            anterior = None
+        if anterior is not None:
+            if anterior.esta_abierta():
+                raise SubastaAbierta()
+            # Past its closing time but not yet swept by the scheduler
+            if anterior.estado == 'abierta':
+                anterior.estado = 'cerrada'
+                anterior.save(update_fields=['estado'])
+        return Subasta.objects.create(inmueble=inmueble, moneda=moneda, cierre=timezone.now() + duracion)
+
+
+def registrar_puja(inmueble, arrendatario, wallet, monto, moneda):
+    """
+    Stores a bid if it beats the current auction's best bid, and makes it the new best bid.
+    The auction row is locked (SELECT ... FOR UPDATE) for the whole check-and-insert, so concurrent bids
+    on the same property are serialized and none of them can overwrite a higher one.
+    The first bid on a property opens its auction. Returns the new Puja.
+    """
+    abrir_subasta(inmueble, moneda)
+    with transaction.atomic():
+        subasta = Subasta.objects.select_for_update().filter(inmueble=inmueble).latest()
+        if not subasta.esta_abierta():
+            raise SubastaCerrada()
+        if moneda != subasta.moneda:
+            raise MonedaInvalida()
+        if subasta.mejor_monto is not None and monto <= subasta.mejor_monto:
+            raise PujaInsuficiente(subasta.mejor_monto)
+
+        puja = Puja.objects.create(
+            inmueble=inmueble,
+            subasta=subasta,
+            arrendatario=arrendatario,
+            wallet_arrendatario=wallet,
+            monto=monto,
+            moneda=moneda,
+        )
+        subasta.mejor_puja = puja
+        subasta.mejor_monto = monto
+        subasta.save(update_fields=['mejor_puja', 'mejor_monto'])
+    return puja
+
+
+def cerrar_subastas_vencidas():
+    """
+    Closes every open auction past its closing time with a single UPDATE on the (estado, cierre) index.
+    Returns the number of auctions closed.
+    """
+    return Subasta.objects.filter(estado='abierta', cierre__lte=timezone.now()).update(estado='cerrada')
+
+
+def puja_ganadora(inmueble_id):
+    """
+    Returns the winning bid of the property's current auction once it has closed, read from the auction record.
+    Raises Subasta.DoesNotExist if the property was never auctioned, SubastaAbierta if it is still open,
+    and Puja.DoesNotExist if it closed without bids.
+    """
+    subasta = Subasta.objects.select_related('mejor_puja').filter(inmueble_id=inmueble_id).latest()
+    if subasta.esta_abierta():
+        raise SubastaAbierta()
+    if subasta.mejor_puja is None:
+        raise Puja.DoesNotExist()
+    return subasta.mejor_puja
+
+
+async def apuja_ganadora(inmueble_id):
+    """
+    Async version of puja_ganadora, through the async ORM.
+    """
+    subasta = await Subasta.objects.select_related('mejor_puja').filter(inmueble_id=inmueble_id).alatest()
+    if subasta.esta_abierta():
+        raise SubastaAbierta()
+    if subasta.mejor_puja is None:
+        raise Puja.DoesNotExist()
+    return subasta.mejor_puja
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+import aiohttp
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .metricas import medir_externo
+from .cliente_web3 import por_bucle
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+URL_COINGECKO = 'https://api.coingecko.com/api/v3/simple/price'
+
+
+class FuenteCoinGecko:
+    """
+    Reads the AVAX and USDT prices from CoinGecko over a pooled keep-alive session,
+    with a blocking (requests) and an async (aiohttp) client.
+    """
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self.sesion = requests.Session()
+        self._sesiones_async = weakref.WeakKeyDictionary()  # event loop -> aiohttp session
+
+    def _parametros(self, moneda):
+        return {'ids': 'avalanche-2,tether', 'vs_currencies': moneda.lower()}
+
+    def _tasas(self, data, moneda):
+        return {
+            'AVAX': data['avalanche-2'][moneda.lower()],
+            'USDT': data['tether'][moneda.lower()],
+        }
+
+    def obtener(self, moneda):
+        with medir_externo('coingecko'):
+            respuesta = self.sesion.get(URL_COINGECKO, params=self._parametros(moneda), timeout=self.timeout)
+        respuesta.raise_for_status()
+        return self._tasas(respuesta.json(), moneda)
+
+    def _crear_sesion_async(self):
+        return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def aobtener(self, moneda):
+        # An aiohttp session only works on the loop it was created in, so each loop gets its own
+        sesion = por_bucle(self._sesiones_async, self._crear_sesion_async)
+        if sesion.closed:
+            sesion = self._sesiones_async[asyncio.get_running_loop()] = self._crear_sesion_async()
+        with medir_externo('coingecko'):
+            async with sesion.get(URL_COINGECKO, params=self._parametros(moneda)) as respuesta:
+                respuesta.raise_for_status()
+                data = await respuesta.json()
+        return self._tasas(data, moneda)
+
+
+class FuenteFija:
+    """
+    Local stub returning the rates configured in settings.TASAS_CAMBIO_FIJAS, for tests and benchmarks.
+    """
+
+    def __init__(self, tasas=None):
+        self.tasas = tasas if tasas is not None else getattr(settings, 'TASAS_CAMBIO_FIJAS', {})
+
+    def obtener(self, moneda):
+        return dict(self.tasas[moneda.upper()])
+
+    async def aobtener(self, moneda):
+        return self.obtener(moneda)
+
+
+class CacheTasas:
+    """
+    Exchange rates cached per fiat currency for `ttl` seconds.
+    Concurrent misses on the same currency wait for a single fetch instead of each calling the source.
+    If the source fails, a stale rate up to `max_antiguedad` seconds old is served instead.
+    A background thread can keep the currencies already requested warm.
+    """
+
+    def __init__(self, fuente, ttl=60, max_antiguedad=600):
+        self.fuente = fuente
+        self.ttl = ttl
+        self.max_antiguedad = max_antiguedad
+        self._tasas = {}
+        self._locks = {}
+        self._locks_async = weakref.WeakKeyDictionary()  # event loop -> {currency: asyncio lock}
+        self._lock = threading.Lock()
+        self._refresco = None
+
+    def _lock_moneda(self, moneda):
+        with self._lock:
+            return self._locks.setdefault(moneda, threading.Lock())
+
+    def _vigente(self, moneda, edad_maxima):
+        entrada = self._tasas.get(moneda)
+        if entrada is not None and time.monotonic() - entrada[1] < edad_maxima:
+            return entrada[0]
+        return None
+
+    def _actualizar(self, moneda):
+        tasas = self.fuente.obtener(moneda)
+        self._tasas[moneda] = (tasas, time.monotonic())
+        return tasas
+
+    def obtener(self, moneda):
+        """
+        Returns {'AVAX': rate, 'USDT': rate} for the given fiat currency.
+        """
+        moneda = moneda.upper()
+        tasas = self._vigente(moneda, self.ttl)
+        if tasas is not None:
+            return tasas
+
+        # Only one thread fetches a currency; the others wait and then read its result
+        with self._lock_moneda(moneda):
+            tasas = self._vigente(moneda, self.ttl)
+            if tasas is not None:
+                return tasas
+            try:
+                return self._actualizar(moneda)
+            except Exception:
+                tasas = self._vigente(moneda, self.max_antiguedad)
+                if tasas is None:
+                    raise
+                logger.warning("Exchange rate source failed for %s, serving a stale rate", moneda, exc_info=True)
+                return tasas
+
+    async def aobtener(self, moneda):
+        """
+        Async version of `obtener` for async views: a cache hit never leaves the event loop, and a miss
+        awaits the source's async client instead of blocking a thread.
+        """
+        moneda = moneda.upper()
+        tasas = self._vigente(moneda, self.ttl)
+        if tasas is not None:
+            return tasas
+
+        # Only one task fetches a currency; the others wait and then read its result
+        async with por_bucle(self._locks_async, dict).setdefault(moneda, asyncio.Lock()):
+            tasas = self._vigente(moneda, self.ttl)
+            if tasas is not None:
+                return tasas
+            # Sources without an async client are called in a worker thread
+            aobtener = getattr(self.fuente, 'aobtener', None) or sync_to_async(self.fuente.obtener, thread_sensitive=False)
+            try:
+                tasas = await aobtener(moneda)
+            except Exception:
+                tasas = self._vigente(moneda, self.max_antiguedad)
+                if tasas is None:
+                    raise
+                logger.warning("Exchange rate source failed for %s, serving a stale rate", moneda, exc_info=True)
+                return tasas
+            self._tasas[moneda] = (tasas, time.monotonic())
+            return tasas
+
+    def iniciar_refresco(self, intervalo=None):
+        """
+        Starts a daemon thread that refreshes every cached currency before it expires.
+        """
+        with self._lock:
+            if self._refresco is not None:
+                return
+            self._refresco = threading.Thread(
+                target=self._refrescar, args=(intervalo or self.ttl / 2,), daemon=True, name='refresco-tasas'
+            )
+        self._refresco.start()
+
+    def _refrescar(self, intervalo):
+        while True:
+            time.sleep(intervalo)
+            for moneda in list(self._tasas):
+                try:
+                    with self._lock_moneda(moneda):
+                        self._actualizar(moneda)
+                except Exception:
+                    logger.warning("Background refresh of %s rates failed", moneda, exc_info=True)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """
+    Returns the process-wide rate cache built from settings (source class, TTL, background refresh).
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                fuente = import_string(settings.TASA_CAMBIO_FUENTE)()
+                cache = CacheTasas(fuente, ttl=settings.TASA_CAMBIO_TTL)
+                if settings.TASA_CAMBIO_REFRESCO:
+                    cache.iniciar_refresco()
+                _cache = cache
+    return _cache
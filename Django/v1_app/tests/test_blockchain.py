@@ -0,0 +1,234 @@
+import json
+import threading
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from web3 import Web3
+from v1_app import blockchain
+from v1_app.blockchain import GestorTransacciones, contract_abi
+from v1_app.firmante import Firmante
+from v1_app.models import Inmueble, Puja, PujaCadena
+
+try:
+    from web3 import EthereumTesterProvider
+    import eth_tester  # noqa: F401  (installed with eth-tester[py-evm])
+    HAY_NODO_LOCAL = True
+except ImportError:
+    HAY_NODO_LOCAL = False
+
+# Pujas contract compiled by Hardhat (npx hardhat compile, in hardhat/)
+ARTEFACTO = Path(settings.BASE_DIR).parent / 'hardhat' / 'artifacts' / 'contracts' / 'pujas.sol' / 'Pujas.json'
+CONTRATO = Path(settings.BASE_DIR).parent / 'hardhat' / 'contracts' / 'pujas.sol'
+VERSION_SOLC = '0.8.20'  # hardhat.config.js
+
+
+def _vigente(artefacto):
+    # An artifact older than registrarPujas/PujaRegistrada cannot run these tests
+    nombres = {entrada.get('name') for entrada in artefacto['abi']}
+    return {'registrarPujas', 'PujaRegistrada'} <= nombres
+
+
+def _compilar_contrato():
+    # Fallback while the committed artifact is stale: compile the source with a solc already installed for py-solc-x
+    try:
+        import solcx
+        if VERSION_SOLC not in {str(version) for version in solcx.get_installed_solc_versions()}:
+            return None
+        compilado = solcx.compile_files([CONTRATO], output_values=['abi', 'bin'], solc_version=VERSION_SOLC)
+    except Exception:
+        return None
+    contrato = next(valor for clave, valor in compilado.items() if clave.endswith(':Pujas'))
+    return {'abi': contrato['abi'], 'bytecode': contrato['bin']}
+
+
+def _cargar_artefacto():
+    if ARTEFACTO.exists():
+        artefacto = json.loads(ARTEFACTO.read_text())
+        if _vigente(artefacto):
+            return artefacto
+    return _compilar_contrato()
+
+
+ARTEFACTO_PUJAS = _cargar_artefacto()
+
+
+def nodo_local():
+    """
+    In-process chain (eth-tester with py-evm) that mines every transaction immediately,
+    and a signer for its first pre-funded account.
+    """
+    w3 = Web3(EthereumTesterProvider())
+    clave = w3.provider.ethereum_tester.backend.account_keys[0]
+    return w3, Firmante(clave.to_hex())
+
+
+def transferencia(w3, valor=1):
+    return {
+        'to': w3.eth.accounts[1],
+        'value': valor,
+        'gas': 21000,
+        'gasPrice': Web3.to_wei(50, 'gwei'),
+        'chainId': w3.eth.chain_id,
+    }
+
+
+@skipUnless(HAY_NODO_LOCAL, 'eth-tester[py-evm] is not installed')
+class GestorTransaccionesTests(SimpleTestCase):
+    """
+    Nonce handling and queued submission of GestorTransacciones against a local chain.
+    """
+
+    def setUp(self):
+        self.w3, self.firmante = nodo_local()
+        self.gestor = GestorTransacciones(self.w3)
+
+    def nonces(self, tx_hashes):
+        return [self.w3.eth.get_transaction(tx_hash)['nonce'] for tx_hash in tx_hashes]
+
+    def test_envios_concurrentes_no_repiten_nonce(self):
+        hashes = []
+
+        def enviar():
+            hashes.append(self.gestor.enviar(self.firmante, transferencia(self.w3)))
+
+        hilos = [threading.Thread(target=enviar) for _ in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(sorted(self.nonces(hashes)), list(range(10)))
+        self.assertEqual(self.w3.eth.get_transaction_count(self.firmante.address), 10)
+
+    def test_resincroniza_el_nonce_tras_un_envio_externo(self):
+        self.gestor.enviar(self.firmante, transferencia(self.w3))
+        # Another process sends from the same account, so the local counter falls behind
+        externa = self.firmante.firmar({**transferencia(self.w3), 'nonce': 1})
+        self.w3.eth.send_raw_transaction(externa.raw_transaction)
+
+        tx_hash = self.gestor.enviar(self.firmante, transferencia(self.w3))
+        self.assertEqual(self.nonces([tx_hash]), [2])
+
+    def test_cola_se_envia_en_orden_sin_esperar_recibos(self):
+        for referencia in ('a', 'b', 'c'):
+            self.gestor.encolar(self.firmante, transferencia(self.w3), referencia)
+
+        resultados = self.gestor.enviar_cola()
+        self.assertEqual([referencia for referencia, _, _ in resultados], ['a', 'b', 'c'])
+        self.assertEqual([error for _, _, error in resultados], [None] * 3)
+        hashes = [tx_hash for _, tx_hash, _ in resultados]
+        self.assertEqual(self.nonces(hashes), [0, 1, 2])
+        self.assertEqual(self.gestor.estado_recibos(hashes), {tx_hash: True for tx_hash in hashes})
+
+    def test_hashes_desconocidos(self):
+        tx_hash = self.gestor.enviar(self.firmante, transferencia(self.w3))
+        desconocido = '0x' + '11' * 32
+        self.assertEqual(self.gestor.estado_recibos([tx_hash, desconocido]), {tx_hash: True})
+        self.assertEqual(self.gestor.transacciones_desconocidas([tx_hash, desconocido]), [desconocido])
+
+
+@skipUnless(HAY_NODO_LOCAL, 'eth-tester[py-evm] is not installed')
+@skipUnless(ARTEFACTO_PUJAS, 'Pujas artifact outdated and no solc %s installed; run npx hardhat compile in hardhat/' % VERSION_SOLC)
+class RegistroPujasTests(TestCase):
+    """
+    Batched registration of pending bids and event sync into PujaCadena, against the Pujas contract on a local chain.
+    """
+
+    def setUp(self):
+        self.w3, self.firmante = nodo_local()
+        self.gestor = GestorTransacciones(self.w3)
+        self.contrato = self.desplegar()
+        self.inmueble = Inmueble.objects.create(
+            nombre='Casa', direccion='Calle 1', descripcion='Casa de prueba', precio_base=1000,
+            metros_cuadrados=80, habitaciones=3, baños=2, estado_conservacion='bueno', amenidades='piscina',
+        )
+        # The module-level client, signer and manager are swapped for the local chain
+        for nombre, valor in (
+            ('obtener_contrato', lambda: self.contrato),
+            ('obtener_firmante', lambda: self.firmante),
+            ('gestor', self.gestor),
+            ('CHAIN_ID', self.w3.eth.chain_id),
+        ):
+            parche = mock.patch.object(blockchain, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def desplegar(self):
+        fabrica = self.w3.eth.contract(abi=ARTEFACTO_PUJAS['abi'], bytecode=ARTEFACTO_PUJAS['bytecode'])
+        tx = fabrica.constructor().build_transaction({
+            'from': self.firmante.address,
+            'chainId': self.w3.eth.chain_id,
+            'gas': 3000000,
+            'gasPrice': Web3.to_wei(50, 'gwei'),
+            'nonce': 0,
+        })
+        recibo = self.w3.eth.wait_for_transaction_receipt(self.gestor.enviar(self.firmante, tx))
+        # The production ABI is used from here on, as the application does
+        return self.w3.eth.contract(address=recibo['contractAddress'], abi=contract_abi)
+
+    def crear_pujas(self, cantidad):
+        return [
+            Puja.objects.create(
+                inmueble=self.inmueble, arrendatario=f'arrendatario{i}', monto=100 + i, moneda='COP',
+                wallet_arrendatario=self.w3.eth.accounts[i + 1],
+            )
+            for i in range(cantidad)
+        ]
+
+    def test_lote_registrado_confirmado_y_sincronizado(self):
+        pujas = self.crear_pujas(3)
+
+        # A full batch is sent as one transaction that every bid shares
+        blockchain.enviar_pujas([blockchain.reclamar_pujas_pendientes(3)])
+        enviadas = Puja.objects.filter(id__in=[puja.id for puja in pujas])
+        self.assertEqual(set(enviadas.values_list('estado', flat=True)), {'enviada'})
+        self.assertEqual(enviadas.values('tx_hash').distinct().count(), 1)
+        self.assertEqual(self.contrato.functions.numeroDePujas().call(), 3)
+
+        # The local chain mines at once, so the receipt is there on the next check
+        blockchain.confirmar_pujas_enviadas(3)
+        self.assertEqual(set(enviadas.values_list('estado', flat=True)), {'confirmada'})
+
+        # The events are mirrored once; a second sync finds nothing new
+        self.assertEqual(blockchain.sincronizar_eventos(confirmaciones=0, contrato=self.contrato, bloque_inicial=0), 3)
+        self.assertEqual(blockchain.sincronizar_eventos(confirmaciones=0, contrato=self.contrato, bloque_inicial=0), 0)
+        self.assertEqual(
+            list(PujaCadena.objects.order_by('indice').values_list('indice', 'monto')),
+            [(0, 100), (1, 101), (2, 102)],
+        )
+        self.assertFalse(blockchain.pujas_sin_registro().exists())
+
+    def test_lote_incompleto_espera_la_ventana(self):
+        self.crear_pujas(2)
+        self.assertEqual(blockchain.procesar_pujas(limite=3), 0)
+        self.assertEqual(set(Puja.objects.values_list('estado', flat=True)), {'pendiente'})
+
+    def test_lote_lleno_se_envia_en_una_pasada(self):
+        self.crear_pujas(3)
+        self.assertEqual(blockchain.procesar_pujas(limite=3), 3)
+        self.assertEqual(set(Puja.objects.values_list('estado', flat=True)), {'confirmada'})
+
+    def test_varios_lotes_se_envian_en_cadena(self):
+        self.crear_pujas(5)
+        # A backlog is split into batches submitted back to back, each with the next nonce
+        self.assertEqual(blockchain.procesar_pujas(limite=2, lotes=3), 5)
+        hashes = list(Puja.objects.order_by('tx_hash').values_list('tx_hash', flat=True).distinct())
+        self.assertEqual(len(hashes), 3)
+        self.assertEqual(
+            sorted(self.w3.eth.get_transaction(tx_hash)['nonce'] for tx_hash in hashes), [1, 2, 3]
+        )
+        self.assertEqual(set(Puja.objects.values_list('estado', flat=True)), {'confirmada'})
+        self.assertEqual(self.contrato.functions.numeroDePujas().call(), 5)
+
+    def test_eventos_de_un_contrato_redesplegado_no_chocan(self):
+        self.contrato.functions.registrarPuja(self.w3.eth.accounts[1], 100, 'COP').transact({'from': self.firmante.address})
+        nuevo = self.desplegar()
+        nuevo.functions.registrarPuja(self.w3.eth.accounts[2], 200, 'COP').transact({'from': self.firmante.address})
+
+        blockchain.sincronizar_eventos(confirmaciones=0, contrato=self.contrato, bloque_inicial=0)
+        blockchain.sincronizar_eventos(confirmaciones=0, contrato=nuevo, bloque_inicial=0)
+        self.assertEqual(
+            set(PujaCadena.objects.values_list('contrato', 'indice', 'monto')),
+            {(self.contrato.address, 0, 100), (nuevo.address, 0, 200)},
+        )
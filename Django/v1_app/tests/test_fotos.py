@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from v1_app import fotos
+from v1_app.models import Inmueble, InmuebleFoto
+
+
+def imagen_jpeg(nombre, tamano=(2000, 1500), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', tamano, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type='image/jpeg')
+
+
+class FotosTests(TestCase):
+    """
+    Photo ingestion: originals deduplicated by content hash, renditions built once per original.
+    """
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.inmueble = Inmueble.objects.create(
+            nombre='Casa', direccion='Calle 1', descripcion='Casa de prueba', precio_base=1000,
+            metros_cuadrados=80, habitaciones=3, baños=2, estado_conservacion='bueno', amenidades='piscina',
+        )
+
+    def guardar(self, archivos):
+        nuevas, escritos = fotos.guardar_originales(archivos)
+        for foto in nuevas:
+            foto.inmueble = self.inmueble
+        InmuebleFoto.objects.bulk_create(nuevas)
+        return nuevas, escritos
+
+    def test_contenido_repetido_se_guarda_una_vez(self):
+        nuevas, escritos = self.guardar([imagen_jpeg('a.jpg'), imagen_jpeg('b.jpg'), imagen_jpeg('c.jpg', color='blue')])
+        self.assertEqual(len(escritos), 2)
+        self.assertEqual(nuevas[0].imagen.name, nuevas[1].imagen.name)
+
+        # A later upload of the same content reuses the stored file
+        repetidas, escritos = self.guardar([imagen_jpeg('otra.jpg')])
+        self.assertEqual(escritos, [])
+        self.assertEqual(repetidas[0].imagen.name, nuevas[0].imagen.name)
+
+    def test_versiones_se_generan_una_vez_por_original(self):
+        nuevas, _ = self.guardar([imagen_jpeg('a.jpg'), imagen_jpeg('b.jpg')])
+        with mock.patch.object(fotos, 'obtener_pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            fotos.generar_versiones(nuevas)
+        self.assertEqual(pool.return_value.submit.call_count, 1)
+
+        with mock.patch.object(fotos, 'connection'):
+            fotos._generar_versiones(nuevas[0].hash_contenido)
+        for foto in InmuebleFoto.objects.all():
+            with foto.miniatura.open('rb') as miniatura, foto.mediana.open('rb') as mediana:
+                self.assertEqual(Image.open(miniatura).size, (320, 240))
+                self.assertEqual(Image.open(mediana).size, (1024, 768))
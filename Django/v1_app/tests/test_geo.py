@@ -0,0 +1,148 @@
+import math
+import random
+import time
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase
+from v1_app.almacen import recalcular_caracteristicas
+from v1_app.geo import IndiceBaseDatos, IndiceGrilla, leer_filtro_espacial, RADIO_TIERRA_M, AREA_MAXIMA_BBOX_GRADOS2
+from v1_app.models import Inmueble
+
+
+def haversine(lng0, lat0, lng, lat):
+    # Brute-force oracle, written independently of geo.distancia_haversine
+    lng0, lat0, lng, lat = map(math.radians, (lng0, lat0, lng, lat))
+    a = math.sin((lat - lat0) / 2) ** 2 + math.cos(lat0) * math.cos(lat) * math.sin((lng - lng0) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class IndiceGrillaTests(SimpleTestCase):
+    """
+    The in-memory grid must return exactly the points a brute-force scan returns. No database is used.
+    """
+
+    def setUp(self):
+        rng = random.Random(0)
+        puntos = []
+        # A dense city, a few scattered points worldwide, and points near the antimeridian and the poles
+        puntos += [(-75.57 + rng.gauss(0, 0.1), 6.25 + rng.gauss(0, 0.1)) for _ in range(2000)]
+        puntos += [(rng.uniform(-180, 180), rng.uniform(-90, 90)) for _ in range(500)]
+        puntos += [(rng.choice((-1, 1)) * rng.uniform(179.5, 180), rng.uniform(-10, 10)) for _ in range(200)]
+        puntos += [(rng.uniform(-180, 180), rng.choice((-1, 1)) * rng.uniform(89, 90)) for _ in range(200)]
+        # Across the south pole from (134.44, -89.95), about 10.9 km away
+        puntos.append((-49.76, -89.95))
+        self.puntos = {i + 1: punto for i, punto in enumerate(puntos)}
+        self.id_polo_sur = len(puntos)
+        self.indice = IndiceGrilla()
+        ids = list(self.puntos)
+        self.indice.cargar(ids, [self.puntos[i][0] for i in ids], [self.puntos[i][1] for i in ids])
+        self.rng = rng
+
+    def esperados_radio(self, lng0, lat0, radio_m):
+        return {i for i, (lng, lat) in self.puntos.items() if haversine(lng0, lat0, lng, lat) <= radio_m}
+
+    def esperados_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        return {i for i, (lng, lat) in self.puntos.items() if min_lng <= lng <= max_lng and min_lat <= lat <= max_lat}
+
+    def test_radio_coincide_con_fuerza_bruta(self):
+        centros = [self.puntos[self.rng.randint(1, len(self.puntos))] for _ in range(200)]
+        centros += [(179.99, 0.0), (-179.99, 0.0), (0.0, 89.99), (0.0, -89.99), (-75.57, 6.25)]
+        for lng0, lat0 in centros:
+            radio_m = self.rng.uniform(50, 100000)
+            obtenidos = set(self.indice.consultar(('radio', (lng0, lat0, radio_m))).tolist())
+            self.assertEqual(obtenidos, self.esperados_radio(lng0, lat0, radio_m), (lng0, lat0, radio_m))
+
+    def test_radio_sobre_un_polo_coincide_con_fuerza_bruta(self):
+        # A circle covering a pole reaches every longitude, including the far side of the pole
+        centros = [(134.44, -89.95)]
+        centros += [(self.rng.uniform(-180, 180), self.rng.choice((-1, 1)) * self.rng.uniform(89, 90)) for _ in range(300)]
+        for lng0, lat0 in centros:
+            radio_m = self.rng.uniform(1000, 100000)
+            obtenidos = set(self.indice.consultar(('radio', (lng0, lat0, radio_m))).tolist())
+            self.assertEqual(obtenidos, self.esperados_radio(lng0, lat0, radio_m), (lng0, lat0, radio_m))
+        cerca_del_polo = self.indice.consultar(('radio', (134.44, -89.95, 32000))).tolist()
+        self.assertIn(self.id_polo_sur, cerca_del_polo)
+
+    def test_bbox_coincide_con_fuerza_bruta(self):
+        cajas = [(-76.0, 6.0, -75.0, 7.0), (-180, -90, 180, 90), (179.0, -5.0, 180, 5.0)]
+        for _ in range(200):
+            lng_a, lng_b = sorted(self.rng.uniform(-180, 180) for _ in range(2))
+            lat_a, lat_b = sorted(self.rng.uniform(-90, 90) for _ in range(2))
+            cajas.append((lng_a, lat_a, lng_b, lat_b))
+        for caja in cajas:
+            obtenidos = set(self.indice.consultar(('bbox', caja)).tolist())
+            self.assertEqual(obtenidos, self.esperados_bbox(*caja), caja)
+
+    def test_indice_vacio(self):
+        indice = IndiceGrilla()
+        self.assertEqual(len(indice.consultar(('bbox', (-180, -90, 180, 90)))), 0)
+        self.assertEqual(len(indice.consultar(('radio', (0.0, 0.0, 100000)))), 0)
+
+    def test_bbox_del_mundo_no_recorre_cada_celda(self):
+        # About 26M cells; only the occupied ones may be visited
+        inicio = time.perf_counter()
+        resultado = self.indice.consultar(('bbox', (-180, -90, 180, 90)))
+        self.assertEqual(len(resultado), len(self.puntos))
+        self.assertLess(time.perf_counter() - inicio, 0.5)
+
+
+class ParidadIndicesTests(TestCase):
+    """
+    The PostGIS backend and the in-memory grid must return the same properties for the same filter.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(1)
+        puntos = [(-75.57 + rng.gauss(0, 0.1), 6.25 + rng.gauss(0, 0.1)) for _ in range(400)]
+        puntos += [(rng.uniform(-180, 180), rng.uniform(-90, 90)) for _ in range(200)]
+        puntos += [(rng.choice((-1, 1)) * rng.uniform(179.5, 180), rng.uniform(-10, 10)) for _ in range(100)]
+        puntos += [(rng.uniform(-180, 180), rng.choice((-1, 1)) * rng.uniform(89, 90)) for _ in range(100)]
+        Inmueble.objects.bulk_create([
+            Inmueble(
+                nombre=f'Inmueble {i}', direccion='Calle 1', descripcion='', precio_base=1000,
+                metros_cuadrados=50, habitaciones=2, baños=1, estado_conservacion='bueno', amenidades='',
+                ubicacion=Point(lng, lat, srid=4326),
+            )
+            for i, (lng, lat) in enumerate(puntos)
+        ])
+        # bulk_create skips the signals that write the feature rows the grid reads
+        recalcular_caracteristicas(Inmueble.objects.all())
+        cls.puntos = puntos
+
+    def setUp(self):
+        self.rng = random.Random(2)
+        self.base_datos = IndiceBaseDatos()
+        self.memoria = IndiceGrilla(intervalo_verificacion=0)
+
+    def comparar(self, filtro):
+        esperados = set(self.base_datos.filtrar(Inmueble.objects.all(), filtro).values_list('id', flat=True))
+        self.assertEqual(set(self.memoria.buscar(filtro).tolist()), esperados, filtro)
+
+    def test_radio(self):
+        centros = [self.rng.choice(self.puntos) for _ in range(100)]
+        centros += [(179.99, 0.0), (-179.99, 0.0), (134.44, -89.95), (0.0, 89.99), (-75.57, 6.25)]
+        for lng, lat in centros:
+            self.comparar(('radio', (lng, lat, self.rng.uniform(50, 100000))))
+
+    def test_bbox(self):
+        cajas = [(-76.0, 6.0, -75.0, 7.0), (-180, -90, 180, 90), (179.0, -5.0, 180, 5.0)]
+        for _ in range(100):
+            lng_a, lng_b = sorted(self.rng.uniform(-180, 180) for _ in range(2))
+            lat_a, lat_b = sorted(self.rng.uniform(-90, 90) for _ in range(2))
+            cajas.append((lng_a, lat_a, lng_b, lat_b))
+        for caja in cajas:
+            self.comparar(('bbox', caja))
+
+
+class LeerFiltroEspacialTests(SimpleTestCase):
+
+    def test_bbox_demasiado_grande(self):
+        with self.assertRaises(ValueError):
+            leer_filtro_espacial({'bbox': '-180,-90,180,90'})
+        lado = math.sqrt(AREA_MAXIMA_BBOX_GRADOS2)
+        self.assertEqual(leer_filtro_espacial({'bbox': f'0,0,{lado},{lado}'}), ('bbox', (0.0, 0.0, lado, lado)))
+
+    def test_radio_fuera_de_rango(self):
+        with self.assertRaises(ValueError):
+            leer_filtro_espacial({'lat': '0', 'lng': '0', 'radio_km': '1000'})
+        self.assertEqual(leer_filtro_espacial({'lat': '1', 'lng': '2', 'radio_km': '3'}), ('radio', (2.0, 1.0, 3000.0)))
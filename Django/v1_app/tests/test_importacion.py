@@ -0,0 +1,35 @@
+from unittest import mock
+from django.db import IntegrityError
+from django.test import TestCase
+from v1_app import importacion
+from v1_app.models import Inmueble
+
+
+def fila(nombre):
+    return {
+        'nombre': nombre, 'direccion': 'Calle 1', 'descripcion': 'Casa', 'precio_base': '1000',
+        'metros_cuadrados': '80', 'habitaciones': '3', 'baños': '2', 'estado_conservacion': 'bueno', 'amenidades': '',
+    }
+
+
+class ImportarTests(TestCase):
+    """
+    Batched import: invalid rows are skipped, and a batch the database rejects is retried row by row.
+    """
+
+    def test_lote_rechazado_reporta_solo_la_fila_culpable(self):
+        original = importacion.actualizar_caracteristicas
+
+        def rechazar(creados):
+            if any(inmueble.nombre == 'mala' for inmueble in creados):
+                raise IntegrityError('fila rechazada por la base de datos')
+            return original(creados)
+
+        filas = [(1, fila('a')), (2, fila('mala')), (3, {'nombre': 'incompleta'}), (4, fila('b'))]
+        with mock.patch.object(importacion, 'actualizar_caracteristicas', rechazar):
+            resumen = importacion.importar(filas, tamano_lote=10)
+
+        self.assertEqual((resumen['filas'], resumen['creados'], resumen['num_errores']), (4, 2, 2))
+        self.assertEqual([error['fila'] for error in resumen['errores']], [3, 2])
+        self.assertIn('fila rechazada', resumen['errores'][1]['errores']['__all__'][0])
+        self.assertEqual(sorted(Inmueble.objects.values_list('nombre', flat=True)), ['a', 'b'])
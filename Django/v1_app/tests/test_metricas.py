@@ -0,0 +1,76 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from v1_app.busqueda import actualizar_vector_busqueda
+from v1_app.metricas import verificar_presupuesto, PresupuestoExcedido
+from v1_app.models import CustomUser, Inmueble, ArrendatarioCriterios
+from v1_app.preferencias import guardar_criterios, CRITERIOS_LIKERT
+
+
+class PresupuestoConsultasTests(TestCase):
+    """
+    Query budgets: the helper itself, the criteria upsert, whose budget grows with its payload, and the ranked search.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.arrendatario = CustomUser.objects.create_user('inquilino', password='clave', user_type='arrendatario')
+        cls.inmuebles = Inmueble.objects.bulk_create([
+            Inmueble(
+                nombre=f'Inmueble {i}', direccion='Calle 1', descripcion='', precio_base=1000,
+                metros_cuadrados=50, habitaciones=2, baños=1, estado_conservacion='bueno', amenidades='',
+            )
+            for i in range(2500)
+        ])
+
+    def setUp(self):
+        # An existing override, removed by the requests below
+        ArrendatarioCriterios.objects.create(
+            arrendatario=self.arrendatario, inmueble=self.inmuebles[0], **dict.fromkeys(CRITERIOS_LIKERT, 3)
+        )
+
+    def test_verificar_presupuesto_detecta_el_exceso(self):
+        with self.assertRaises(PresupuestoExcedido):
+            with verificar_presupuesto(1):
+                Inmueble.objects.count()
+                CustomUser.objects.count()
+        with verificar_presupuesto(2):
+            Inmueble.objects.count()
+            CustomUser.objects.count()
+
+    def test_guardar_criterios_cabe_en_su_presupuesto(self):
+        criterios = {inmueble.id: [4] * len(CRITERIOS_LIKERT) for inmueble in self.inmuebles[1:]}
+        eliminar = [self.inmuebles[0].id]
+        # Fixed part (12), three INSERT batches of 1000 criteria and one DELETE
+        with verificar_presupuesto(16):
+            guardar_criterios(self.arrendatario.id, [2] * len(CRITERIOS_LIKERT), criterios, eliminar)
+        self.assertEqual(ArrendatarioCriterios.objects.filter(arrendatario=self.arrendatario).count(), len(criterios))
+
+    @override_settings(METRICAS_PRESUPUESTO_ESTRICTO=True)
+    def test_endpoint_de_criterios_no_excede_su_presupuesto(self):
+        # With the strict setting, going over budget fails the request instead of only counting it
+        cliente = APIClient()
+        cliente.force_authenticate(self.arrendatario)
+        likert = dict.fromkeys(CRITERIOS_LIKERT, 4)
+        respuesta = cliente.post('/criterios/', {
+            'perfil': likert,
+            'criterios': [{'inmueble_id': inmueble.id, **likert} for inmueble in self.inmuebles[1:]],
+            'eliminar': [self.inmuebles[0].id],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data, {'perfil': True, 'criterios': 2499, 'eliminados': 1})
+
+    @override_settings(METRICAS_PRESUPUESTO_ESTRICTO=True)
+    def test_busqueda_rankeada_no_excede_su_presupuesto(self):
+        # bulk_create skips the signal that fills the search vector
+        actualizar_vector_busqueda(Inmueble.objects.all())
+        guardar_criterios(self.arrendatario.id, [3] * len(CRITERIOS_LIKERT), {self.inmuebles[1].id: [5] * len(CRITERIOS_LIKERT)})
+        cliente = APIClient()
+        # Session authentication, the most expensive kind: the session and the user rows
+        cliente.force_login(self.arrendatario)
+        # Text query, structured filter and a profile: every optional query of the view runs, twice in a row
+        for _ in range(2):
+            respuesta = cliente.get('/inmuebles/rankeados/', {
+                'arrendatario_id': self.arrendatario.id, 'q': 'inmueble', 'habitaciones_min': 1,
+            })
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(len(respuesta.data['results']), 20)
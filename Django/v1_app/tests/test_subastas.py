@@ -0,0 +1,69 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from v1_app.models import Inmueble, Puja, Subasta
+from v1_app.subastas import (
+    validar_puja, registrar_puja, reabrir_subasta, puja_ganadora, SubastaAbierta, SubastaCerrada,
+)
+
+
+class ValidarPujaTests(SimpleTestCase):
+    """
+    Bid input is rejected before it reaches the database.
+    """
+
+    def test_puja_valida(self):
+        self.assertEqual(validar_puja('1500.50', 'COP'), Decimal('1500.50'))
+        self.assertEqual(validar_puja(100.1, 'USD'), Decimal('100.1'))
+
+    def test_montos_invalidos(self):
+        for monto in (None, 'abc', 'NaN', 'Infinity', '-Infinity', '0', '-5', '1e20', '123456789', '10.001'):
+            with self.subTest(monto=monto), self.assertRaises(ValidationError) as contexto:
+                validar_puja(monto, 'COP')
+            self.assertIn('monto', contexto.exception.message_dict)
+
+    def test_monedas_invalidas(self):
+        for moneda in (None, '', 'EUR', 'cop'):
+            with self.subTest(moneda=moneda), self.assertRaises(ValidationError) as contexto:
+                validar_puja('100', moneda)
+            self.assertEqual(list(contexto.exception.message_dict), ['moneda'])
+
+
+class ReabrirSubastaTests(TestCase):
+    """
+    A property can be auctioned again once its last auction has closed; its bids go to the newest auction.
+    """
+
+    def setUp(self):
+        self.inmueble = Inmueble.objects.create(
+            nombre='Casa', direccion='Calle 1', descripcion='Casa de prueba', precio_base=1000,
+            metros_cuadrados=80, habitaciones=3, baños=2, estado_conservacion='bueno', amenidades='piscina',
+        )
+
+    def cerrar(self):
+        Subasta.objects.filter(inmueble=self.inmueble).update(cierre=timezone.now() - timedelta(seconds=1))
+
+    def test_segunda_subasta(self):
+        primera = registrar_puja(self.inmueble, 'ana', '', Decimal('100'), 'COP')
+        with self.assertRaises(SubastaAbierta):
+            reabrir_subasta(self.inmueble, 'COP')
+        self.cerrar()
+        with self.assertRaises(SubastaCerrada):
+            registrar_puja(self.inmueble, 'luis', '', Decimal('200'), 'COP')
+        self.assertEqual(puja_ganadora(self.inmueble.id), primera)
+
+        nueva = reabrir_subasta(self.inmueble, 'USD')
+        # The new auction starts without a best bid, so a lower amount is accepted
+        segunda = registrar_puja(self.inmueble, 'luis', '', Decimal('50'), 'USD')
+        self.assertEqual(segunda.subasta, nueva)
+        self.assertEqual(list(Subasta.objects.filter(inmueble=self.inmueble).values_list('estado', flat=True).order_by('id')), ['cerrada', 'abierta'])
+        with self.assertRaises(SubastaAbierta):
+            puja_ganadora(self.inmueble.id)
+
+        # Each bid keeps the closing time of its own auction, read without a query per bid
+        pujas = list(Puja.objects.select_related('subasta').order_by('id'))
+        with self.assertNumQueries(0):
+            cierres = [puja.cierre_puja() for puja in pujas]
+        self.assertEqual(cierres, list(Subasta.objects.order_by('id').values_list('cierre', flat=True)))
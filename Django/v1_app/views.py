@@ -1,5 +1,5 @@
 import os
-import environ
+import codecs
 import logging
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes
@@ -17,23 +17,37 @@ from django.core.exceptions import ObjectDoesNotExist
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.views.generic.list import ListView
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.contrib.auth.models import User
 from rest_framework.response import Response
 from .forms import CustomUser
 from django.core.exceptions import ValidationError
-from .models import Inmueble, Puja, InmuebleFoto, ArrendatarioCriterios
+from .models import Inmueble, Puja, InmuebleFoto, ArrendatarioCriterios, Subasta
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from .preferencias import leer_likert, guardar_criterios, MAX_CRITERIOS, TAMANO_LOTE_CRITERIOS
+from .ranking import rankear_inmuebles, calcular_score_inmueble, decodificar_cursor, LIMITE_POR_DEFECTO, LIMITE_MAXIMO
+from .geo import leer_filtro_espacial, filtrar_inmuebles
+from .busqueda import leer_filtros, buscar_texto
+from .importacion import construir_inmueble, leer_filas, importar, FORMATOS, TAMANO_LOTE, TAMANO_LOTE_MAXIMO
 from django.utils import timezone
 import json
 from django.db.models import Q
 from django.conf import settings
-import requests
 from decimal import Decimal
 from web3 import Web3
+from .tasas import obtener_cache
+from .subastas import validar_puja, registrar_puja, reabrir_subasta, puja_ganadora, SubastaCerrada, SubastaAbierta, PujaInsuficiente, MonedaInvalida
+from .blockchain import gestor, parametros_tx
+from .firmante import obtener_firmante
+from .metricas import presupuesto_consultas
+from .fotos import guardar_originales, eliminar_archivos, generar_versiones
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# Largest number of photos per property
+MAX_FOTOS_INMUEBLE = 10
+
 # Property creation logic
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # Only authenticated users can create properties
@@ -45,31 +59,71 @@ def crear_inmueble(request):
     if request.user.user_type != 'arrendador':
         return Response({"error": "Only landlords can create properties."}, status=403)
 
-    data = request.data
-    # Create the property using the provided data
-    nuevo_inmueble = Inmueble.objects.create(
-        nombre=data['nombre'],
-        direccion=data['direccion'],
-        metros_cuadrados=data['metros_cuadrados'],
-        habitaciones=data['habitaciones'],
-        baños=data['baños'],
-        estado_conservacion=data['estado_conservacion'],
-        amenidades=data['amenidades'],
-        fecha_publicacion=data['fecha_publicacion'],
-    )
-
-    # Verify that no more than 10 images are uploaded
+    # Validate everything before writing, so a rejected request leaves no orphan property
     imagenes = request.FILES.getlist('imagenes')
-    if len(imagenes) > 10:
-        return Response({"error": "Cannot upload more than 10 images"}, status=400)
+    if len(imagenes) > MAX_FOTOS_INMUEBLE:
+        return Response({"error": f"Cannot upload more than {MAX_FOTOS_INMUEBLE} images"}, status=400)
+    try:
+        nuevo_inmueble = construir_inmueble(request.data)
+    except ValidationError as e:
+        return Response({"error": e.message_dict}, status=400)
+    nuevo_inmueble.arrendador = request.user
+
+    # Photo files are streamed to storage before the transaction, so a slow upload never holds it open
+    # (other workers only see the property's feature row once it commits); new files are removed if the rows fail
+    fotos, escritos = guardar_originales(imagenes)
+    try:
+        # The property and its photo rows are stored together or not at all
+        with transaction.atomic():
+            nuevo_inmueble.save()
+            for foto in fotos:
+                foto.inmueble = nuevo_inmueble
+            InmuebleFoto.objects.bulk_create(fotos)
+            generar_versiones(fotos)
+    except Exception:
+        eliminar_archivos(escritos)
+        raise
+
+    return JsonResponse({"message": "Property created successfully and photos uploaded.", "inmueble_id": nuevo_inmueble.id})
+
+# Bulk property creation for landlord agencies
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importar_inmuebles(request):
+    """
+    Creates many properties at once from an uploaded CSV/JSONL file (`archivo`) or a JSON list (`inmuebles`).
+    Valid rows are stored even if others fail; the response lists the failed rows.
+    """
+    if request.user.user_type != 'arrendador':
+        return Response({"error": "Only landlords can create properties."}, status=403)
 
-    # Upload images if everything is correct
-    for imagen in imagenes:
-        InmuebleFoto.objects.create(inmueble=nuevo_inmueble, imagen=imagen)
+    try:
+        tamano_lote = int(request.query_params.get('batch_size', TAMANO_LOTE))
+    except ValueError:
+        return Response({"error": "batch_size must be an integer."}, status=400)
+    if not 1 <= tamano_lote <= TAMANO_LOTE_MAXIMO:
+        return Response({"error": f"batch_size must be between 1 and {TAMANO_LOTE_MAXIMO}."}, status=400)
+
+    archivo = request.FILES.get('archivo')
+    if archivo is not None:
+        # The upload is decoded and parsed line by line instead of being read whole
+        formato = request.data.get('formato') or ('jsonl' if archivo.name.endswith(('.jsonl', '.json')) else 'csv')
+        if formato not in FORMATOS:
+            return Response({"error": f"formato must be one of {', '.join(FORMATOS)}."}, status=400)
+        filas = leer_filas(codecs.iterdecode(archivo, 'utf-8'), formato)
+    elif isinstance(request.data.get('inmuebles'), list):
+        filas = enumerate(request.data['inmuebles'], start=1)
+    else:
+        return Response({"error": "Send a CSV/JSONL file in 'archivo' or a list in 'inmuebles'."}, status=400)
 
-    return JsonResponse({"message": "Property created successfully and photos uploaded."})
+    try:
+        resumen = importar(filas, tamano_lote, arrendador=request.user)
+    except UnicodeDecodeError:
+        return Response({"error": "The file must be UTF-8 encoded."}, status=400)
+    return Response(resumen, status=201 if resumen['creados'] else 400)
 
 # Matching and property ranking logic
+@presupuesto_consultas(6)
 @api_view(['POST'])
 def calcular_score(request):
     """
@@ -78,248 +132,231 @@ def calcular_score(request):
     arrendatario_id = request.data.get('arrendatario_id')
     inmueble_id = request.data.get('inmueble_id')
 
-    try:
-        # Get the selected scores for the tenant
-        criterios = ArrendatarioCriterios.objects.get(arrendatario_id=arrendatario_id, inmueble_id=inmueble_id)
-
-        # Define weights for each criterion on a scale of 1 to 5
-        pesos = {
-            'metros_cuadrados': criterios.metros_cuadrados,
-            'habitaciones': criterios.habitaciones,
-            'baños': criterios.baños,
-            'estado_conservacion': criterios.estado_conservacion,
-            'amenidades': criterios.amenidades,
-            'riesgos_de_avenida': criterios.riesgos_de_avenida,
-            'atractivos_turisticos': criterios.atractivos_turisticos,
-            'espacios_publicos': criterios.espacios_publicos,
-            'paradas_transporte_publico': criterios.paradas_transporte_publico,
-            'establecimientos_comerciales': criterios.establecimientos_comerciales,
-            'establecimientos_educativos': criterios.establecimientos_educativos,
-        }
-
-        # Calculate the weighted average (multiply each criterion by its weight)
-        total_puntuacion = 0
-        total_pesos = 0
-        for key, value in pesos.items():
-            total_puntuacion += value * 5  # 5 is the maximum Likert scale value
-            total_pesos += 5  # All weights sum to 5 (customizable)
-
-        # Calculate the score as a weighted average
-        score = total_puntuacion / total_pesos
-
-        return Response({'score': score})
-
-    except ArrendatarioCriterios.DoesNotExist:
+    # Score the pair through the same vectorized path used by the ranking
+    score = calcular_score_inmueble(arrendatario_id, inmueble_id)
+    if score is None:
         return Response({"error": "No criteria found for this tenant and property."}, status=404)
 
-# Searching and ranking properties based on matches
+    return Response({'score': score})
+
+# Query budgets, from what each view is meant to run. Authentication reads up to 2 rows (session and user), and a
+# refresh of an in-process index up to 2 (its table's fingerprint, then the changed rows or a full reload)
+CONSULTAS_AUTENTICACION = 2
+CONSULTAS_REFRESCO = 2
+
+# The criteria upsert has a fixed part (property check, profile upsert, lookup of the overrides to remove and the
+# transaction's savepoints), plus one INSERT per batch of criteria and one DELETE per chunk of removed overrides
+CONSULTAS_CRITERIOS_FIJAS = 12
+
+
+def _presupuesto_criterios(request, response):
+    datos = getattr(response, 'data', None)
+    if response.status_code != 200 or not isinstance(datos, dict):
+        # Rejected before writing: at most the property check
+        return CONSULTAS_AUTENTICACION + 1
+    return (
+        CONSULTAS_AUTENTICACION + CONSULTAS_CRITERIOS_FIJAS
+        + -(-datos['criterios'] // TAMANO_LOTE_CRITERIOS)
+        + -(-datos['eliminados'] // GET_ITERATOR_CHUNK_SIZE)
+    )
+
+# Bulk upsert of a tenant's matching criteria
+@presupuesto_consultas(_presupuesto_criterios)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def guardar_criterios_arrendatario(request):
+    """
+    Stores the authenticated tenant's preferences in one request: an optional default profile (`perfil`, the 10
+    Likert ratings) applied across the catalog, per-property overrides (`criterios`, each with `inmueble_id`
+    and the 10 ratings) and override ids to remove (`eliminar`).
+    """
+    if request.user.user_type != 'arrendatario':
+        return Response({"error": "Only tenants can set matching criteria."}, status=403)
+
+    data = request.data
+    criterios = data.get('criterios', [])
+    eliminar = data.get('eliminar', [])
+    if not isinstance(criterios, list) or not isinstance(eliminar, list):
+        return Response({"error": "criterios and eliminar must be lists."}, status=400)
+    if len(criterios) > MAX_CRITERIOS:
+        return Response({"error": f"At most {MAX_CRITERIOS} criteria per request."}, status=400)
+
+    try:
+        perfil = leer_likert(data['perfil']) if data.get('perfil') is not None else None
+        # A repeated property keeps its last ratings
+        overrides = {int(fila['inmueble_id']): leer_likert(fila) for fila in criterios}
+        eliminar = [int(inmueble_id) for inmueble_id in eliminar]
+        escritos = guardar_criterios(request.user.id, perfil, overrides, eliminar)
+    except (KeyError, TypeError, AttributeError):
+        return Response({"error": "Every criteria entry needs an inmueble_id and the 10 ratings."}, status=400)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+
+    return Response({"perfil": perfil is not None, "criterios": escritos, "eliminados": len(eliminar)})
+
+# Reads the limit/cursor pagination parameters shared by the search endpoints
+def _leer_paginacion(request):
+    try:
+        limite = int(request.query_params.get('limit', LIMITE_POR_DEFECTO))
+    except ValueError:
+        raise ValueError("limit must be an integer.")
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValueError(f"limit must be between 1 and {LIMITE_MAXIMO}.")
+    cursor = request.query_params.get('cursor')
+    try:
+        despues_de = decodificar_cursor(cursor) if cursor else None
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+    return limite, despues_de
+
+# Reads the tenant id shared by the search endpoints
+def _leer_arrendatario(request):
+    arrendatario_id = request.query_params.get('arrendatario_id')
+    if not arrendatario_id:
+        raise ValueError("arrendatario_id is required.")
+    try:
+        return int(arrendatario_id)
+    except ValueError:
+        raise ValueError("arrendatario_id must be an integer.")
+
+# Searching and ranking properties based on matches. Budget: criteria, profile, prefiltered candidate ids,
+# text relevance and the page's rows, besides authentication and the feature store refresh
+@presupuesto_consultas(CONSULTAS_AUTENTICACION + CONSULTAS_REFRESCO + 5)
 @api_view(['GET'])
 def buscar_inmuebles_rankeados(request):
     """
     Searches for properties and ranks them based on the matching score using tenant criteria.
+    Optional filters: precio_min, precio_max, habitaciones, habitaciones_min, baños, baños_min,
+    metros_min, metros_max, publicado_desde, publicado_hasta, and a full-text query q
+    over nombre, amenidades and descripcion.
     """
-    arrendatario_id = request.query_params.get('arrendatario_id')
+    # Tenant, page size, cursor of the previous page's last result and structured filters
+    try:
+        arrendatario_id = _leer_arrendatario(request)
+        limite, despues_de = _leer_paginacion(request)
+        filtros = leer_filtros(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
 
-    # Get all properties and calculate the matching score for each
-    inmuebles = Inmueble.objects.all()
-    resultados = []
-
-    for inmueble in inmuebles:
-        # Calculate the score for each property
-        criterios = ArrendatarioCriterios.objects.get(arrendatario_id=arrendatario_id, inmueble_id=inmueble.id)
-        pesos = {
-            'metros_cuadrados': criterios.metros_cuadrados,
-            'habitaciones': criterios.habitaciones,
-            'baños': criterios.baños,
-            'estado_conservacion': criterios.estado_conservacion,
-            'amenidades': criterios.amenidades,
-            'riesgos_de_avenida': criterios.riesgos_de_avenida,
-            'atractivos_turisticos': criterios.atractivos_turisticos,
-            'espacios_publicos': criterios.espacios_publicos,
-            'paradas_transporte_publico': criterios.paradas_transporte_publico,
-            'establecimientos_comerciales': criterios.establecimientos_comerciales,
-            'establecimientos_educativos': criterios.establecimientos_educativos,
-        }
-        total_puntuacion = 0
-        total_pesos = 0
-        for key, value in pesos.items():
-            total_puntuacion += value * 5
-            total_pesos += 5
-
-        score = total_puntuacion / total_pesos
-
-        resultados.append({
-            'inmueble': inmueble.nombre,
-            'direccion': inmueble.direccion,
-            'score': score,
-        })
+    # Hard constraints (budget, rooms, size, date) cut the candidate set in the database before scoring
+    texto = request.query_params.get('q', '').strip()
+    inmuebles = Inmueble.objects.filter(**filtros) if filtros or texto else None
+    relevancia = None
+    if texto:
+        # Full-text matches on the precomputed search vector; their relevance is blended into the score
+        try:
+            inmuebles, relevancia = buscar_texto(inmuebles, texto)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
 
-    # Sort results by score
-    resultados_ordenados = sorted(resultados, key=lambda x: x['score'], reverse=True)
-
-    return Response(resultados_ordenados)
-
-# Connect to the Avalanche Fuji Testnet
-w3 = Web3(Web3.HTTPProvider(settings.AVALANCHE_RPC_URL))
-
-# ABI of the deployed contract
-contract_abi = [
-    {
-      "inputs": [],
-      "name": "numeroDePujas",
-      "outputs": [
-        {
-          "internalType": "uint256",
-          "name": "",
-          "type": "uint256"
-        }
-      ],
-      "stateMutability": "view",
-      "type": "function"
-    },
-    {
-      "inputs": [
-        {
-          "internalType": "uint256",
-          "name": "index",
-          "type": "uint256"
-        }
-      ],
-      "name": "obtenerPuja",
-      "outputs": [
-        {
-          "internalType": "address",
-          "name": "",
-          "type": "address"
-        },
-        {
-          "internalType": "uint256",
-          "name": "",
-          "type": "uint256"
-        },
-        {
-          "internalType": "string",
-          "name": "",
-          "type": "string"
-        }
-      ],
-      "stateMutability": "view",
-      "type": "function"
-    },
-    {
-      "inputs": [
-        {
-          "internalType": "uint256",
-          "name": "",
-          "type": "uint256"
-        }
-      ],
-      "name": "pujas",
-      "outputs": [
-        {
-          "internalType": "address",
-          "name": "arrendatario",
-          "type": "address"
-        },
-        {
-          "internalType": "uint256",
-          "name": "monto",
-          "type": "uint256"
-        },
-        {
-          "internalType": "string",
-          "name": "moneda",
-          "type": "string"
-        }
-      ],
-      "stateMutability": "view",
-      "type": "function"
-    },
-    {
-      "inputs": [
-        {
-          "internalType": "address",
-          "name": "_arrendatario",
-          "type": "address"
-        },
-        {
-          "internalType": "uint256",
-          "name": "_monto",
-          "type": "uint256"
-        },
-        {
-          "internalType": "string",
-          "name": "_moneda",
-          "type": "string"
-        }
-      ],
-      "name": "registrarPuja",
-      "outputs": [],
-      "stateMutability": "nonpayable",
-      "type": "function"
-    }
-]
-contract_address = '0x2039049ee43995AfcD86A8442610Cb70d8F860de'
-contract = w3.eth.contract(address=contract_address, abi=contract_abi)
+    # Load the tenant's criteria in one query, score every candidate in a single vectorized pass
+    # and keep only the top `limit` results after the cursor
+    resultados, siguiente_cursor = rankear_inmuebles(arrendatario_id, limite, despues_de, inmuebles=inmuebles, relevancia=relevancia)
+
+    return Response({
+        'results': resultados,
+        'next_cursor': siguiente_cursor,
+    })
+
+# Searching nearby properties and ranking them. Budget: criteria, profile, candidate ids and the page's rows,
+# besides authentication and refreshing the feature store and, with the grid backend, the spatial index
+@presupuesto_consultas(CONSULTAS_AUTENTICACION + 2 * CONSULTAS_REFRESCO + 4)
+@api_view(['GET'])
+def buscar_inmuebles_cercanos(request):
+    """
+    Ranks only the properties inside a radius (lat, lng, radio_km) or a bounding box (bbox=min_lng,min_lat,max_lng,max_lat).
+    """
+    try:
+        arrendatario_id = _leer_arrendatario(request)
+        limite, despues_de = _leer_paginacion(request)
+        filtro = leer_filtro_espacial(request.query_params)
+        filtros = leer_filtros(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if filtro is None:
+        return Response({"error": "Provide lat, lng and radio_km, or bbox."}, status=400)
+
+    # The structured filters and the spatial index cut the candidate set before any scoring work
+    inmuebles = filtrar_inmuebles(Inmueble.objects.filter(**filtros), filtro)
+    resultados, siguiente_cursor = rankear_inmuebles(arrendatario_id, limite, despues_de, inmuebles=inmuebles)
+
+    return Response({
+        'results': resultados,
+        'next_cursor': siguiente_cursor,
+    })
 
 # Bidding logic
+@presupuesto_consultas(10)
 @api_view(['POST'])
 def crear_puja(request):
+    """
+    Records a bid and returns immediately; the blockchain registration is done by the bid worker
+    (manage.py worker_pujas), which fills in the transaction hash and confirmation state.
+    """
     inmueble_id = request.data.get('inmueble_id')
     arrendatario = request.user
     monto = request.data.get('monto')
     moneda = request.data.get('moneda')
 
-    # Normal logic to create a bid in the database
-    inmueble = Inmueble.objects.get(id=inmueble_id)
-    Puja.objects.create(inmueble=inmueble, arrendatario=arrendatario.username, monto=monto, moneda=moneda)
-
-    # Now register the bid on the blockchain
-    nonce = w3.eth.getTransactionCount(arrendatario.direccion_wallet)
-    tx = contract.functions.registrarPuja(
-        arrendatario.direccion_wallet,
-        int(monto),
-        moneda
-    ).buildTransaction({
-        'chainId': 43113,  # Fuji testnet Chain ID
-        'gas': 2000000,
-        'gasPrice': w3.toWei('50', 'gwei'),
-        'nonce': nonce,
-    })
-
-    # Sign and send the transaction
-    env = environ.Env()
-    environ.Env.read_env(env_file='credentials.env')
-    private_key = env('PRIVATE_KEY')
-    DEBUG = env.bool('DEBUG', default=True)
+    if not arrendatario.direccion_wallet:
+        return Response({"error": "Tenant has no wallet address configured"}, status=400)
+    # An invalid address would make the whole registration batch revert
+    if not Web3.is_address(arrendatario.direccion_wallet):
+        return Response({"error": "Tenant wallet address is invalid"}, status=400)
+    # Amount and currency are checked against the Puja columns, so bad input is a 400 rather than a database error
+    try:
+        monto = validar_puja(monto, moneda)
+    except ValidationError as e:
+        return Response({"error": e.message_dict}, status=400)
 
+    # Fast DB write; the bid stays pending until the worker submits it to the chain
     try:
-        signed_tx = w3.eth.account.signTransaction(tx, private_key)
-        tx_hash = w3.eth.sendRawTransaction(signed_tx.rawTransaction)
-        tx_receipt = w3.eth.waitForTransactionReceipt(tx_hash)
-    except Exception as e:
-        return Response({"error": str(e)}, status=400)
+        inmueble = Inmueble.objects.get(id=inmueble_id)
+    except Inmueble.DoesNotExist:
+        return Response({"error": "Property not found"}, status=404)
+    # The auction row is locked while the bid is compared with the best one and inserted
+    try:
+        puja = registrar_puja(inmueble, arrendatario.username, arrendatario.direccion_wallet, monto, moneda)
+    except SubastaCerrada:
+        return Response({"error": "The auction for this property is closed."}, status=409)
+    except PujaInsuficiente as e:
+        return Response({"error": f"Bid must be higher than the current best bid ({e.mejor_monto})."}, status=409)
+    except MonedaInvalida:
+        return Response({"error": "Bid currency does not match the auction currency."}, status=400)
 
     return Response({
-        "message": "Bid created and registered on the blockchain.",
-        "transaction_hash": tx_receipt.transactionHash.hex(),
-    })
+        "message": "Bid created; blockchain registration pending.",
+        "puja_id": puja.id,
+        "estado": puja.estado,
+    }, status=202)
 
-# Exchange rate logic
-def obtener_tasa_cambio(moneda='USD'):
-    url = f'https://api.coingecko.com/api/v3/simple/price?ids=avalanche-2,tether&vs_currencies={moneda.lower()}'
-    response = requests.get(url)
-    data = response.json()
+# Re-auctioning: the landlord opens a new auction once the property's last one has closed
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def nueva_subasta(request):
+    moneda = request.data.get('moneda', 'COP')
+    try:
+        Puja._meta.get_field('moneda').clean(moneda, None)
+    except ValidationError as e:
+        return Response({"error": {'moneda': e.messages}}, status=400)
+    try:
+        inmueble = Inmueble.objects.get(id=request.data.get('inmueble_id'), arrendador=request.user)
+    except Inmueble.DoesNotExist:
+        return Response({"error": "Property not found"}, status=404)
+    try:
+        subasta = reabrir_subasta(inmueble, moneda)
+    except (SubastaAbierta, IntegrityError):
+        return Response({"error": "The auction for this property is still open."}, status=409)
+    return Response({"subasta_id": subasta.id, "cierre": subasta.cierre}, status=201)
 
-    return {
-        'AVAX': data['avalanche-2'][moneda.lower()],
-        'USDT': data['tether'][moneda.lower()]
-    }
+# Exchange rate logic (served from the per-currency rate cache)
+def obtener_tasa_cambio(moneda='USD'):
+    return obtener_cache().obtener(moneda)
 
 # Logic to convert amount to AVAX or USDT
 def convertir_a_crypto(monto_fiat, cripto, moneda='USD'):
     tasa = obtener_tasa_cambio(moneda)
-    return monto_fiat / tasa[cripto]
+    return Decimal(monto_fiat) / Decimal(str(tasa[cripto]))
 
 # Core wallet payment processing logic
 def procesar_pago_core_wallet(arrendatario, monto, metodo_pago):
@@ -353,50 +390,45 @@ def arrendar_ahora(request):
     arrendatario_id = request.data.get('arrendatario_id')
     metodo_pago = request.data.get('metodo_pago')
 
-    inmueble = Inmueble.objects.get(id=inmueble_id)
+    inmueble = Inmueble.objects.select_related('arrendador').get(id=inmueble_id)
     arrendatario = CustomUser.objects.get(id=arrendatario_id)
 
+    # Properties imported without a landlord, or whose landlord has no wallet, cannot be paid on chain
+    if inmueble.arrendador is None or not inmueble.arrendador.direccion_wallet:
+        return Response({"error": "Property has no landlord wallet configured."}, status=400)
+
     # Convert fiat amount to selected cryptocurrency
     monto = inmueble.precio_base
     monto_crypto = convertir_a_crypto(monto, metodo_pago)
 
-    # Configure transaction
-    nonce = w3.eth.getTransactionCount(arrendatario.direccion_wallet)
+    # Configure transaction; the nonce is assigned by the shared transaction manager
     transaction = {
+        **parametros_tx(),
         'to': inmueble.arrendador.direccion_wallet,  # Landlord's wallet address
-        'value': w3.toWei(monto_crypto, 'ether'),  # Amount in AVAX
-        'gas': 2000000,
-        'gasPrice': w3.toWei('50', 'gwei'),
-        'nonce': nonce,
-        'chainId': 43113,  # Fuji testnet
+        'value': Web3.to_wei(monto_crypto, 'ether'),  # Amount in AVAX
     }
 
-    # Sign and send the transaction
-    env = environ.Env()
-    environ.Env.read_env(env_file='credentials.env')
-    private_key = env('PRIVATE_KEY')
-    DEBUG = env.bool('DEBUG', default=True)
-    signed_tx = w3.eth.account.signTransaction(transaction, private_key)
-    tx_hash = w3.eth.sendRawTransaction(signed_tx.rawTransaction)
-    tx_receipt = w3.eth.waitForTransactionReceipt(tx_hash)
-
-    try:({
-        "message": "Payment successful.",
-        "transaction_hash": tx_receipt.transactionHash.hex(),
-    })
+    # Sign and send the transaction; the receipt is not awaited in the request
+    try:
+        tx_hash = gestor.enviar(obtener_firmante(), transaction)
     except Exception as e:
         return Response({"error": f"Transaction error: {str(e)}"}, status=500)
 
+    return Response({
+        "message": "Payment submitted.",
+        "transaction_hash": tx_hash,
+    }, status=202)
+
 # Payment processing logic
 @api_view(['POST'])
 def procesar_pago(request):
     inmueble_id = request.data.get('inmueble_id')
 
     try:
-        inmueble = Inmueble.objects.get(id=inmueble_id)
-        puja_ganadora = inmueble.pujas.latest('fecha_puja')  # Get the latest bid
-        monto_final = puja_ganadora.monto
-        moneda = puja_ganadora.moneda
+        # Winner read from the closed auction's best bid (highest amount), not the newest bid
+        ganadora = puja_ganadora(inmueble_id)
+        monto_final = ganadora.monto
+        moneda = ganadora.moneda
 
         metodo_pago = request.data.get('metodo_pago')  # 'conventional' or 'crypto'
 
@@ -420,8 +452,10 @@ def procesar_pago(request):
                 "currency": moneda,
             })
 
-    except Inmueble.DoesNotExist:
-        return Response({"error": "Property not found"}, status=404)
+    except Subasta.DoesNotExist:
+        return Response({"error": "No auction for this property"}, status=404)
+    except SubastaAbierta:
+        return Response({"error": "The auction for this property is still open."}, status=409)
     except Puja.DoesNotExist:
         return Response({"error": "No bids for this property"}, status=404)
     except CustomUser.DoesNotExist:
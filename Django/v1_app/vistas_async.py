@@ -0,0 +1,194 @@
+import json
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.authtoken.models import Token
+from web3 import Web3
+from .models import CustomUser, Inmueble, Puja, Subasta
+from .tasas import obtener_cache
+from .subastas import validar_puja, registrar_puja, apuja_ganadora, SubastaCerrada, SubastaAbierta, PujaInsuficiente, MonedaInvalida
+from .blockchain import gestor_async, parametros_tx
+from .firmante import obtener_firmante
+from .metricas import presupuesto_consultas
+
+# Async versions of the I/O-bound endpoints of views.py. They run on the event loop under ASGI: RPC calls
+# go through AsyncWeb3, exchange rates through aiohttp and reads through the async ORM, so a worker can
+# overlap many in-flight external calls instead of holding a thread for each one.
+
+
+async def _autenticar(request):
+    # Same schemes as the DRF views: "Authorization: Token <key>", otherwise the session user
+    encabezado = request.headers.get('Authorization', '')
+    if encabezado.startswith('Token '):
+        try:
+            token = await Token.objects.select_related('user').aget(key=encabezado[len('Token '):].strip())
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active else None
+
+    usuario = await request.auser()
+    if not usuario.is_authenticated:
+        return None
+    # Session-authenticated requests keep CSRF protection, as with DRF's SessionAuthentication
+    if CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {}) is not None:
+        return None
+    return usuario
+
+
+def _leer_datos(request):
+    # JSON bodies, or form-encoded ones like the DRF parsers accept
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return datos if isinstance(datos, dict) else None
+    return request.POST
+
+
+async def convertir_a_crypto(monto_fiat, cripto, moneda='USD'):
+    tasa = await obtener_cache().aobtener(moneda)
+    return Decimal(monto_fiat) / Decimal(str(tasa[cripto]))
+
+
+# Bidding logic
+@presupuesto_consultas(10)
+@csrf_exempt
+@require_POST
+async def crear_puja(request):
+    """
+    Async version of views.crear_puja: records a bid and leaves the blockchain registration to the bid worker.
+    """
+    arrendatario = await _autenticar(request)
+    if arrendatario is None:
+        return JsonResponse({"error": "Authentication credentials were not provided."}, status=401)
+    data = _leer_datos(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body."}, status=400)
+
+    if not arrendatario.direccion_wallet:
+        return JsonResponse({"error": "Tenant has no wallet address configured"}, status=400)
+    if not Web3.is_address(arrendatario.direccion_wallet):
+        return JsonResponse({"error": "Tenant wallet address is invalid"}, status=400)
+    try:
+        monto = validar_puja(data.get('monto'), data.get('moneda'))
+    except ValidationError as e:
+        return JsonResponse({"error": e.message_dict}, status=400)
+
+    try:
+        inmueble = await Inmueble.objects.aget(id=data.get('inmueble_id'))
+    except (Inmueble.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({"error": "Property not found"}, status=404)
+    # The row-locked check-and-insert needs a transaction, which the async ORM does not offer yet
+    try:
+        puja = await sync_to_async(registrar_puja)(
+            inmueble, arrendatario.username, arrendatario.direccion_wallet, monto, data.get('moneda')
+        )
+    except SubastaCerrada:
+        return JsonResponse({"error": "The auction for this property is closed."}, status=409)
+    except PujaInsuficiente as e:
+        return JsonResponse({"error": f"Bid must be higher than the current best bid ({e.mejor_monto})."}, status=409)
+    except MonedaInvalida:
+        return JsonResponse({"error": "Bid currency does not match the auction currency."}, status=400)
+
+    return JsonResponse({
+        "message": "Bid created; blockchain registration pending.",
+        "puja_id": puja.id,
+        "estado": puja.estado,
+    }, status=202)
+
+
+# Logic for renting a property immediately
+@csrf_exempt
+@require_POST
+async def arrendar_ahora(request):
+    """
+    Async version of views.arrendar_ahora: converts the base price and sends the payment to the landlord's
+    wallet without blocking a thread.
+    """
+    if await _autenticar(request) is None:
+        return JsonResponse({"error": "Authentication credentials were not provided."}, status=401)
+    data = _leer_datos(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body."}, status=400)
+    metodo_pago = data.get('metodo_pago')
+
+    try:
+        inmueble = await Inmueble.objects.select_related('arrendador').aget(id=data.get('inmueble_id'))
+        await CustomUser.objects.aget(id=data.get('arrendatario_id'))
+    except (Inmueble.DoesNotExist, CustomUser.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({"error": "Property or tenant not found."}, status=404)
+
+    # Properties imported without a landlord, or whose landlord has no wallet, cannot be paid on chain
+    if inmueble.arrendador is None or not inmueble.arrendador.direccion_wallet:
+        return JsonResponse({"error": "Property has no landlord wallet configured."}, status=400)
+
+    try:
+        monto_crypto = await convertir_a_crypto(inmueble.precio_base, metodo_pago)
+    except KeyError:
+        return JsonResponse({"error": "metodo_pago must be AVAX or USDT."}, status=400)
+
+    transaction = {
+        **parametros_tx(),
+        'to': inmueble.arrendador.direccion_wallet,  # Landlord's wallet address
+        'value': Web3.to_wei(monto_crypto, 'ether'),  # Amount in AVAX
+    }
+    try:
+        tx_hash = await gestor_async.enviar(obtener_firmante(), transaction)
+    except Exception as e:
+        return JsonResponse({"error": f"Transaction error: {str(e)}"}, status=500)
+
+    return JsonResponse({
+        "message": "Payment submitted.",
+        "transaction_hash": tx_hash,
+    }, status=202)
+
+
+# Payment processing logic
+@csrf_exempt
+@require_POST
+async def procesar_pago(request):
+    """
+    Async version of views.procesar_pago: pays the winning bid of a closed auction.
+    """
+    if await _autenticar(request) is None:
+        return JsonResponse({"error": "Authentication credentials were not provided."}, status=401)
+    data = _leer_datos(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body."}, status=400)
+
+    try:
+        ganadora = await apuja_ganadora(data.get('inmueble_id'))
+        if data.get('metodo_pago') == "crypto":
+            cripto = data.get('cripto')  # 'AVAX' or 'USDT'
+            monto_crypto = await convertir_a_crypto(ganadora.monto, cripto, ganadora.moneda)
+            arrendatario = await CustomUser.objects.aget(id=data.get('arrendatario_id'))
+            if not arrendatario.direccion_wallet:
+                return JsonResponse({"error": "Tenant has no wallet address configured"}, status=400)
+            # Simulated Core Wallet payment, as in views.procesar_pago_core_wallet
+            return JsonResponse({
+                "message": "Payment processed successfully.",
+                "transaction_id": "1234567890abcdef",  # Simulated transaction ID
+                "amount": monto_crypto,
+                "payment_method": cripto,
+            })
+
+        return JsonResponse({
+            "message": "Conventional payment processed successfully.",
+            "amount": ganadora.monto,
+            "currency": ganadora.moneda,
+        })
+    except Subasta.DoesNotExist:
+        return JsonResponse({"error": "No auction for this property"}, status=404)
+    except SubastaAbierta:
+        return JsonResponse({"error": "The auction for this property is still open."}, status=409)
+    except Puja.DoesNotExist:
+        return JsonResponse({"error": "No bids for this property"}, status=404)
+    except CustomUser.DoesNotExist:
+        return JsonResponse({"error": "Tenant not found."}, status=404)
+    except KeyError:
+        return JsonResponse({"error": "cripto must be AVAX or USDT."}, status=400)
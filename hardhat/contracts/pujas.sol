@@ -10,6 +10,8 @@ contract Pujas {
     
     Puja[] public pujas;
 
+    event PujaRegistrada(uint indexed indice, address indexed arrendatario, uint monto, string moneda);
+
     function registrarPuja(address _arrendatario, uint _monto, string memory _moneda) public {
         Puja memory nuevaPuja = Puja({
             arrendatario: _arrendatario,
@@ -17,6 +19,19 @@ contract Pujas {
             moneda: _moneda
         });
         pujas.push(nuevaPuja);
+        emit PujaRegistrada(pujas.length - 1, _arrendatario, _monto, _moneda);
+    }
+
+    function registrarPujas(address[] calldata _arrendatarios, uint[] calldata _montos, string[] calldata _monedas) public {
+        require(_arrendatarios.length == _montos.length && _montos.length == _monedas.length, "Longitudes distintas");
+        for (uint i = 0; i < _arrendatarios.length; i++) {
+            pujas.push(Puja({
+                arrendatario: _arrendatarios[i],
+                monto: _montos[i],
+                moneda: _monedas[i]
+            }));
+            emit PujaRegistrada(pujas.length - 1, _arrendatarios[i], _montos[i], _monedas[i]);
+        }
     }
 
     function obtenerPuja(uint index) public view returns (address, uint, string memory) {